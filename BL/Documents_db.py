@@ -1,55 +1,209 @@
+import collections
+import contextlib
 import functools
+import itertools
+import json
+import operator
 import os
 import re
+from datetime import datetime
 
 import BL.sql_queries as queries
+from BL.analytics import CorpusAnalytics
+from BL.boolean_query import run_query
+from BL.cooccurrence import ASSOCIATED_WORDS_LIMIT, PMI_MEASURE, CooccurrenceIndex
 from BL.db_manager import Database
-from BL.exceptions import CheckError
+from BL.exceptions import CheckError, IntegrityError
+from BL.fuzzy_words import DEFAULT_MAX_EDIT_DISTANCE, FuzzyWordIndex
+from BL.ngram_index import NgramIndex
 from BL.query_builder import build_query
-from Helpers.document_parser import parse_document
+from BL.ranking import TermPostings, top_documents
+from BL.statistics_store import StatisticsStore
+from BL.word_regex import VocabularyRegex
+from BL.word_sets import WordSets
+from Helpers.document_parser import DOCUMENT_EXTENSIONS, default_document_name, parse_document, \
+    parse_document_file
 from Helpers.constants import VALID_WORD_REGEX, DATE_FORMAT
+from Helpers.utils import cached_read, file_hash
+from Helpers.word_endings import like_pattern_suffix, prefix_range, reverse_word, rhyme_key
+
+ALL_DOCUMENTS_FILTER = "> 0"
+
+# The appearances are inserted as (document_id, word or word_id, word_index, paragraph, line, line_index, line_offset,
+# sentence, sentence_index), and only these columns are stored in word_occurrence, the others are in the spans
+OCCURRENCE_COLUMNS = operator.itemgetter(0, 1, 2, 4, 6, 7)
+SENTENCE_KEY = operator.itemgetter(0, 7)
+PARAGRAPH_KEY = operator.itemgetter(0, 3)
+LINE_KEY = operator.itemgetter(0, 4)
+
+
+def _runs(appearances, key):
+    # The first and last appearance of every run of consecutive appearances with the same key
+    for _key, run in itertools.groupby(appearances, key=key):
+        first = next(run)
+        last = collections.deque(run, maxlen=1)
+        yield first, last[0] if last else first
 
 
 class DocumentDatabase(Database):
 
     WORD_IDS_CACHE_SIZE = 1000
+    KWIC_WIDTH = 5
+    DEFAULT_QUERY_SCOPE = "document"
+    RANKED_DOCUMENTS_LIMIT = 100
 
     VALID_MULTIPLE_WORDS = rf"{VALID_WORD_REGEX}(\W+{VALID_WORD_REGEX})*"
     INVALID_GROUP_NAMES = ["None", "All"]  # These names can't be used as a group name
 
     APPEARANCES_ORDER = "COUNT(word_index)"
+
+    # The columns of the appearances that the word_appearance view computes from the spans, and the paragraph
+    # that only needs the sentence spans
+    SPAN_COLUMNS_REGEX = re.compile(r"\*|\b(?:line_index|sentence_index)\b")
+    PARAGRAPH_COLUMN_REGEX = re.compile(r"\bparagraph\b")
     LENGTH_ORDER = "length"
 
+    # The filters that narrow the appearances to few enough rows that checking their spans is faster than finding the
+    # words at an index of every sentence or line
+    SELECTIVE_APPEARANCE_FILTERS = ("document_id", "word_id")
+
+    # The filters of top_words that can be answered from the word frequencies, without the appearances
+    FREQUENCY_FILTERS = ("document_id", "group_id", "name", "name_regex")
+    TOP_WORDS_COLUMNS = ["word_id", "length", "name", APPEARANCES_ORDER]
+
+    UNKNOWN_AUTHOR = "Unknown"
+
+    # Columns that were added after the first version of the schema, for upgrading existing databases
+    ADDED_COLUMNS = {
+        "document": (("content_hash", "TEXT"), ("file_mtime", "REAL")),
+        "word": (("reversed_name", "TEXT"), ("rhyme_key", "TEXT"))
+    }
+
     class SCRIPTS:
         INITIALIZE_SCHEMA = "initialize_schema"
         SEARCH_PHRASE = "search_phrase"
 
-    def __init__(self, **kargs):
+    def __init__(self, ngram_index=False, cooccurrence_window=None, **kargs):
+        self.statistics = StatisticsStore(self)
+        self.ngrams = NgramIndex(self) if ngram_index else None
+        self.cooccurrences = CooccurrenceIndex(self, cooccurrence_window) if cooccurrence_window else None
+        self.has_word_endings = False
+        self.fuzzy_words = FuzzyWordIndex(self)
+        self.vocabulary_regex = VocabularyRegex(self)
+        self.word_sets = WordSets(self)
+        self.analytics = None
         super().__init__(**kargs)
         self.document_insert_callbacks = []
         self.group_insert_callbacks = []
         self.group_word_insert_callbacks = []
         self.phrase_insert_callbacks = []
 
+    def _prepare_connection(self, connection):
+        super()._prepare_connection(connection)
+
+        # The functions of the word_ending_insertion trigger
+        connection.create_function("REVERSE", 1, reverse_word, deterministic=True)
+        connection.create_function("RHYME_KEY", 1, rhyme_key, deterministic=True)
+
+        # A published database from before word_occurrence can't be migrated, so it is read through views
+        if self.read_only and self._has_appearance_table(connection):
+            connection.executescript(queries.LEGACY_APPEARANCE_VIEWS)
+            for table, view in queries.LEGACY_FREQUENCY_VIEWS.items():
+                if connection.execute(queries.OBJECT_TYPE, (table,)).fetchone() is None:
+                    connection.execute(view)
+
+    @staticmethod
+    def _has_appearance_table(connection):
+        # Databases from before word_occurrence have a word_appearance table instead of the view
+        return connection.execute(queries.OBJECT_TYPE, ("word_appearance",)).fetchone() == ("table",)
+
     def _initialize_schema(self):
         self._run_sql_script(DocumentDatabase.SCRIPTS.INITIALIZE_SCHEMA, multiple_statements=True)
 
+    def _upgrade_schema(self):
+        for table, columns in DocumentDatabase.ADDED_COLUMNS.items():
+            existing_columns = {name for name, in self.execute(queries.TABLE_COLUMNS, (table,))}
+
+            for column, column_type in columns:
+                if existing_columns and column not in existing_columns:
+                    self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
     def new_connection(self, always_create=False, new_path=None, commit=True):
-        if not super().new_connection(always_create, new_path, commit):
+        already_exists = super().new_connection(always_create, new_path, commit)
+
+        # A read-only database is served as it was published
+        if not self.read_only:
+            if already_exists:
+                self._upgrade_schema()
+
+            # The schema script only creates what is missing, so it also completes older databases
             self._initialize_schema()
+
+            if already_exists and self._has_appearance_table(self._conn):
+                self.executescript(queries.MIGRATE_WORD_APPEARANCES)
+                self._initialize_schema()
+
+            if already_exists and self.execute(queries.HAS_UNINDEXED_DOCUMENTS).fetchone()[0]:
+                self.executescript(queries.REBUILD_DOCUMENT_TERMS)
+
+            if already_exists and self.execute(queries.HAS_WORDS_WITHOUT_ENDINGS).fetchone()[0]:
+                with self.transaction():
+                    self.execute(queries.UPDATE_WORD_ENDINGS)
+
+            self.index_missing_documents()
+
+        # A published database from before the word endings is searched without them
+        self.has_word_endings = "reversed_name" in {name for name, in self.execute(queries.TABLE_COLUMNS, ("word",))}
+
         self.get_word_id.cache_clear()
+        self.statistics.invalidate()
+        self.word_sets.invalidate()
+        self.fuzzy_words.invalidate()
+        self.vocabulary_regex.invalidate()
+        self.drop_analytics()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        try:
+            with super().transaction():
+                yield
+        except BaseException:
+            # The rolled back inserts were already counted
+            self.statistics.invalidate()
+            self.word_sets.invalidate()
+            self.fuzzy_words.invalidate()
+            self.vocabulary_regex.invalidate()
+            self.drop_analytics()
+            raise
+
+    @contextlib.contextmanager
+    def _updating_statistics(self):
+        # A failed batch may have inserted some of its rows before failing
+        try:
+            yield self.statistics
+        except BaseException:
+            self.statistics.invalidate()
+            self.word_sets.invalidate()
+            self.fuzzy_words.invalidate()
+            self.vocabulary_regex.invalidate()
+            self.drop_analytics()
+            raise
 
     def add_document_insert_callback(self, callback):
-        self.document_insert_callbacks.append(callback)
+        if not self.read_only:
+            self.document_insert_callbacks.append(callback)
 
     def add_group_insert_callback(self, callback):
-        self.group_insert_callbacks.append(callback)
+        if not self.read_only:
+            self.group_insert_callbacks.append(callback)
 
     def add_group_word_insert_callback(self, callback):
-        self.group_word_insert_callbacks.append(callback)
+        if not self.read_only:
+            self.group_word_insert_callbacks.append(callback)
 
     def add_phrase_insert_callback(self, callback):
-        self.phrase_insert_callbacks.append(callback)
+        if not self.read_only:
+            self.phrase_insert_callbacks.append(callback)
 
     @staticmethod
     def call_all_callbacks(callbacks, *args):
@@ -81,10 +235,16 @@ class DocumentDatabase(Database):
         DocumentDatabase.assert_valid_name(name)
         return name
 
-    def insert_document(self, name, author, path, size, date):
+    def insert_document(self, name, author, path, size, date, content_hash=None, mtime=None, document_id=None):
 
-        return self.execute(queries.INSERT_DOCUMENT,
-                            (self.to_title(name), self.to_title(author), path, size, date)).lastrowid
+        values = (self.to_title(name), self.to_title(author), path, size, date, content_hash, mtime)
+        if document_id is None:
+            document_id = self.execute(queries.INSERT_DOCUMENT, values).lastrowid
+        else:
+            self.execute(queries.INSERT_DOCUMENT_WITH_ID, values + (document_id,))
+
+        self.statistics.document_inserted(size)
+        return document_id
 
     def insert_word(self, word):
 
@@ -105,11 +265,25 @@ class DocumentDatabase(Database):
 
         return self.insert_word(word) if search_result is None else search_result[0]
 
+    def _insert_appearances(self, occurrence_query, appearances):
+        # The appearances of every document are in the order of their word indexes
+        appearances = list(appearances)
+        self.executemany(occurrence_query, map(OCCURRENCE_COLUMNS, appearances))
+
+        self.executemany(queries.INSERT_SENTENCE_SPAN,
+                         ((first[0], first[7], first[3], first[2], last[2], first[4], first[6])
+                          for first, last in _runs(appearances, SENTENCE_KEY)))
+        self.executemany(queries.INSERT_PARAGRAPH_SPAN,
+                         ((first[0], first[3], first[2], last[2], first[4], first[6])
+                          for first, last in _runs(appearances, PARAGRAPH_KEY)))
+        self.executemany(queries.INSERT_LINE_SPAN,
+                         ((first[0], first[4], first[2]) for first, _last in _runs(appearances, LINE_KEY)))
+
     def insert_many_word_appearances(self, word_appearances):
-        self.executemany(queries.INSERT_WORD_APPEARANCE, word_appearances)
+        self._insert_appearances(queries.INSERT_WORD_OCCURRENCE, word_appearances)
 
     def insert_many_word_id_appearances(self, word_id_appearances):
-        self.executemany(queries.INSERT_WORD_ID_APPEARANCE, word_id_appearances)
+        self._insert_appearances(queries.INSERT_WORD_ID_OCCURRENCE, word_id_appearances)
 
     def insert_words_group(self, name):
         name = self.to_title(name)
@@ -117,6 +291,7 @@ class DocumentDatabase(Database):
             raise CheckError
 
         group_id = self.execute(queries.INSERT_WORDS_GROUP, (name,)).lastrowid
+        self.statistics.group_inserted()
 
         # Call the group insert callbacks
         self.call_all_callbacks(self.group_insert_callbacks)
@@ -124,32 +299,47 @@ class DocumentDatabase(Database):
 
     def insert_word_to_group(self, group_id, word):
         rowid = self.execute(queries.INSERT_WORD_TO_GROUP, (group_id, self.get_word_id(word))).lastrowid
+        self.statistics.group_words_inserted(group_id, 1)
+        self.word_sets.group_words_inserted(group_id)
 
         # Call the group word insert callbacks with the id of the group
         self.call_all_callbacks(self.group_word_insert_callbacks, group_id)
         return rowid
 
     def insert_many_word_ids_to_group(self, group_id, word_ids):
-        self.executemany(queries.INSERT_WORD_TO_GROUP, ((group_id, word_id) for word_id in word_ids))
+        with self._updating_statistics() as statistics:
+            cursor = self.executemany(queries.INSERT_WORD_TO_GROUP, ((group_id, word_id) for word_id in word_ids))
+            statistics.group_words_inserted(group_id, cursor.rowcount)
+        self.word_sets.group_words_inserted(group_id)
 
     def insert_phrase(self, phrase, words_count):
-        return self.execute(queries.INSERT_PHRASE, (phrase, words_count,)).lastrowid
+        phrase_id = self.execute(queries.INSERT_PHRASE, (phrase, words_count,)).lastrowid
+        self.statistics.phrase_inserted()
+        return phrase_id
 
     def insert_many_words_to_phrase(self, words_in_phrase):
-        self.executemany(queries.INSERT_WORD_TO_PHRASE, words_in_phrase)
+        words_in_phrase = list(words_in_phrase)
+        with self._updating_statistics() as statistics:
+            self.executemany(queries.INSERT_WORD_TO_PHRASE, words_in_phrase)
+            statistics.phrase_words_inserted((phrase_id, word) for phrase_id, word, _index in words_in_phrase)
 
     def insert_many_word_ids_to_phrase(self, phrase_id, word_ids):
-        self.executemany(queries.INSERT_WORD_ID_TO_PHRASE,
-                         ((phrase_id, word_id, index) for index, word_id in enumerate(word_ids)))
-
-    def add_document(self, title, author, path, date):
-        if not os.path.exists(path):
-            raise FileNotFoundError
-
-        # Insert a new document entry
-        size = os.path.getsize(path)
-        document_id = self.insert_document(title, author, path, size, date)
-
+        word_ids = list(word_ids)
+        with self._updating_statistics() as statistics:
+            self.executemany(queries.INSERT_WORD_ID_TO_PHRASE,
+                             ((phrase_id, word_id, index) for index, word_id in enumerate(word_ids)))
+            statistics.phrase_words_inserted((phrase_id, word_id) for word_id in word_ids)
+
+    def index_document(self, document_id):
+        # The term frequencies and the length of a document for ranking, and the frequencies of its words in the
+        # corpus, counted from its appearances with a statement for each instead of one for every word
+        self.execute(queries.INSERT_DOCUMENT_TERMS, (document_id,))
+        self.execute(queries.ADD_DOCUMENT_WORD_FREQUENCIES, (document_id,))
+        self.execute(queries.INSERT_DOCUMENT_LENGTH, (document_id, document_id))
+        self.word_sets.document_changed(document_id)
+        self.drop_analytics()
+
+    def _insert_document_appearances(self, document_id, path):
         words = set()
         appearances = []
         for appr in parse_document(path):
@@ -160,11 +350,132 @@ class DocumentDatabase(Database):
         # Insert all the words and their appearances
         self.insert_many_words(words)
         self.insert_many_word_appearances(appearances)
+        self.index_document(document_id)
+
+        if self.ngrams is not None or self.cooccurrences is not None:
+            word_ids = dict(self.execute(queries.WORD_NAMES_TO_IDS, (json.dumps(list(words)),)))
+            sentence_words = [(word_index, sentence, word_ids[word]) for
+                              _id, word, word_index, *_location, sentence, _sentence_index in appearances]
+
+            if self.ngrams is not None:
+                self.ngrams.index_document(document_id, sentence_words)
+            if self.cooccurrences is not None:
+                self.cooccurrences.index_document(document_id,
+                                                  [sentence for _word_index, sentence, _word_id in sentence_words],
+                                                  [word_id for _word_index, _sentence, word_id in sentence_words])
+
+    def add_document(self, title, author, path, date):
+        if not os.path.exists(path):
+            raise FileNotFoundError
+
+        stat = os.stat(path)
+        content_hash = file_hash(path)
+
+        # Every document is committed by itself, which is also when an in-memory database checks its size
+        with self.transaction():
+            # Insert a new document entry
+            duplicate = self.execute(queries.CONTENT_HASH_TO_DOCUMENT_ID, (content_hash,)).fetchone()
+            document_id = self.insert_document(title, author, path, stat.st_size, date, content_hash, stat.st_mtime)
+
+            # A document with the same content was already parsed, so link to its appearances
+            if duplicate:
+                for query in queries.COPY_DOCUMENT_APPEARANCES:
+                    self.execute(query, (document_id, duplicate[0]))
+                self.execute(queries.COPY_DOCUMENT_TERMS, (document_id, duplicate[0]))
+                self.execute(queries.ADD_DOCUMENT_WORD_FREQUENCIES, (document_id,))
+                self.execute(queries.COPY_DOCUMENT_LENGTH, (document_id, duplicate[0]))
+                self.word_sets.document_changed(document_id)
+                self.drop_analytics()
+                if self.ngrams is not None:
+                    self.ngrams.copy_document(document_id, duplicate[0])
+                if self.cooccurrences is not None:
+                    self.cooccurrences.copy_document(document_id, duplicate[0])
+            else:
+                self._insert_document_appearances(document_id, path)
 
         # Call the document insert callbacks
         self.call_all_callbacks(self.document_insert_callbacks)
         return document_id
 
+    def _refresh_document(self, document_id, path, stat, content_hash):
+        # Replace all of the appearances of the document at once
+        with self.transaction():
+            # The indexes of the old appearances are subtracted before they are deleted, also without the indexes,
+            # so the document is indexed again when the database is opened with them
+            (self.ngrams or NgramIndex(self)).remove_document(document_id)
+            if self.cooccurrences is not None:
+                self.cooccurrences.remove_document(document_id)
+            else:
+                CooccurrenceIndex.remove_indexed_document(self, document_id)
+            for query in queries.DELETE_DOCUMENT_APPEARANCES:
+                self.execute(query, (document_id,))
+            self.execute(queries.SUBTRACT_DOCUMENT_WORD_FREQUENCIES, (document_id,))
+            self.execute(queries.DELETE_DOCUMENT_TERMS, (document_id,))
+            self._insert_document_appearances(document_id, path)
+            self.execute(queries.UPDATE_DOCUMENT_SOURCE, (stat.st_size, stat.st_mtime, content_hash, document_id))
+
+    def refresh_documents(self):
+        refreshed_ids = []
+
+        for document_id, path, size, mtime, content_hash in self.execute(queries.ALL_DOCUMENT_SOURCES).fetchall():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+
+            if stat.st_size == size and stat.st_mtime == mtime:
+                continue
+
+            new_content_hash = file_hash(path)
+
+            # Documents from before the content hashes are only re-indexed if their size changed
+            unchanged = new_content_hash == content_hash if content_hash else stat.st_size == size
+            if unchanged:
+                self.execute(queries.UPDATE_DOCUMENT_SOURCE, (stat.st_size, stat.st_mtime, new_content_hash,
+                                                              document_id))
+            else:
+                # The cached text of the file is out of date
+                cached_read.cache_clear()
+                self._refresh_document(document_id, path, stat, new_content_hash)
+                refreshed_ids.append(document_id)
+
+            self.statistics.document_size_changed(size, stat.st_size)
+
+        if refreshed_ids:
+            self.call_all_callbacks(self.document_insert_callbacks)
+        return refreshed_ids
+
+    def add_documents_directory(self, directory):
+        known_sources = {path: (size, mtime) for _id, path, size, mtime, _hash in
+                         self.execute(queries.ALL_DOCUMENT_SOURCES).fetchall()}
+
+        added_ids = []
+        changed_known_document = False
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.is_file() or not entry.name.lower().endswith(DOCUMENT_EXTENSIONS):
+                    continue
+
+                # Only a stat is needed to know that a known document didn't change
+                stat = entry.stat()
+                if entry.path in known_sources:
+                    changed_known_document |= (stat.st_size, stat.st_mtime) != known_sources[entry.path]
+                    continue
+
+                try:
+                    title, author, date, _size = parse_document_file(entry.path, stat)
+                    added_ids.append(self.add_document(title or default_document_name(entry.path),
+                                                       author or DocumentDatabase.UNKNOWN_AUTHOR,
+                                                       entry.path,
+                                                       datetime.fromtimestamp(date)))
+                except (IntegrityError, OSError, ValueError):
+                    pass
+
+        if changed_known_document:
+            added_ids += self.refresh_documents()
+
+        return added_ids
+
     def add_phrase(self, phrase):
         # Split to single valid words
         words = [self.to_single_word(match[0]) for match in re.finditer(VALID_WORD_REGEX, phrase)]
@@ -198,26 +509,243 @@ class DocumentDatabase(Database):
             **kwargs
         )
 
-    def search_word_appearances(self, cols=None, tables=None, unique_words=False, order_by=None, **kwargs):
+    @staticmethod
+    def word_appearances_query(cols=None, tables=None, unique_words=False, order_by=None, **kwargs):
 
         tables = set(tables) if tables else set()
-        tables.add("word_appearance")
 
+        # Filters of the positions that the view computes are found from the spans instead, the words of a paragraph
+        # by their ranges and the words at an index of the sentences or lines by their keys (unless another filter
+        # is selective, then its few appearances are checked). All of the columns are read in the order of the view.
+        paragraph_filtered = False
+        constraints = []
+        if cols:
+            if isinstance(kwargs.get("paragraph"), int):
+                tables.add(queries.PARAGRAPH_POSITION_APPEARANCES.format(paragraph=kwargs.pop("paragraph")))
+                paragraph_filtered = True
+            if all(kwargs.get(column) in (None, "") for column in DocumentDatabase.SELECTIVE_APPEARANCE_FILTERS):
+                constraints = [constraint.format(index=kwargs.pop(column))
+                               for column, constraint in queries.SPAN_INDEX_CONSTRAINTS.items()
+                               if isinstance(kwargs.get(column), int)]
+
+        # The primary key only finds the words at an index of a document, so it is searched for every document
+        if isinstance(kwargs.get("word_index"), int) and kwargs.get("document_id") in (None, ""):
+            constraints.append(queries.DOCUMENTS_WORD_INDEX_CONSTRAINT.format(word_index=kwargs.pop("word_index")))
+
+        # The view of all of the columns joins the spans of every appearance, so it is only read when it's needed
+        referenced_columns = " ".join(list(cols or ["*"]) + list(kwargs) + [order_by or ""])
+        if DocumentDatabase.SPAN_COLUMNS_REGEX.search(referenced_columns):
+            tables.add("word_appearance")
+        elif DocumentDatabase.PARAGRAPH_COLUMN_REGEX.search(referenced_columns) and not paragraph_filtered:
+            tables.add("word_occurrence NATURAL JOIN sentence_span")
+        elif not paragraph_filtered:
+            tables.add("word_occurrence")
+
+        # Reading the appearances in the order of the word_occurrence_position index to group them is slower
+        # than sorting them, unless the query only reads the columns of the index
         if unique_words:
-            kwargs["group_by"] = "word_id"
+            kwargs["group_by"] = "+word_id"
 
-        return self.build_and_exec(
+        return build_query(
             cols=cols,
             tables=tables,
             order_by=order_by,
+            constraints=constraints,
             **kwargs
         )
 
+    def search_word_appearances(self, **kwargs):
+        return self.execute(self.word_appearances_query(**self.translate_word_filters(kwargs))).fetchall()
+
+    def _suffix_range(self, pattern):
+        # The range of the reversed names of the words that match a name pattern which ends with letters
+        suffix = like_pattern_suffix(pattern)
+        return prefix_range(reverse_word(suffix)) if suffix and self.has_word_endings else None
+
+    def regex_word_ids(self, pattern):
+        # The ids of the words whose names fully match the regular expression, ignoring case
+        return self.vocabulary_regex.matching_word_ids(pattern)
+
+    def translate_word_filters(self, filters):
+        """
+        A name pattern that ends with letters (like "*ing") can't use the index of the names, so its words are
+        found with a range of the reversed names instead, and filtered by their ids.
+        A regular expression of the names (name_regex) is matched against the vocabulary, and the words of a group
+        (and document) are intersected in memory from their bitmaps instead of joining word_in_group, so all of
+        them are filtered the same way.
+        """
+        filters = dict(filters)
+        word_id_sets = []
+        if filters.get("word_id") is not None:
+            word_id = filters["word_id"]
+            word_id_sets.append(set(word_id) if isinstance(word_id, (list, tuple, set)) else {word_id})
+
+        if filters.get("name_regex") is not None:
+            word_id_sets.append(set(self.regex_word_ids(filters["name_regex"])))
+        filters.pop("name_regex", None)
+
+        if filters.get("group_id") is not None:
+            word_id_sets.append(set(self.word_sets.word_ids(filters["group_id"], filters.get("document_id"))))
+            if filters.get("tables") is not None:
+                filters["tables"] = set(filters["tables"]) - {"word_in_group"}
+        filters.pop("group_id", None)
+
+        suffix_range = self._suffix_range(filters.get("name"))
+        if suffix_range is not None:
+            word_id_sets.append({word_id for word_id, in self.execute(queries.WORDS_IN_REVERSED_RANGE, suffix_range)})
+
+            # Only the suffix is left to check
+            if filters["name"].lower() == "%" + like_pattern_suffix(filters["name"]):
+                del filters["name"]
+
+        if len(word_id_sets) > (filters.get("word_id") is not None):
+            filters["word_id"] = sorted(set.intersection(*word_id_sets))
+
+        return filters
+
+    def similar_words(self, word, max_edit_distance=DEFAULT_MAX_EDIT_DISTANCE, limit=None):
+        # The words that are at most max_edit_distance insertions, deletions or substitutions away from the word
+        return self.fuzzy_words.similar_words(word.lower().strip(), max_edit_distance, limit)
+
+    def rhyming_words(self, word, shared_letters=None):
+        """
+        The words that rhyme with the word, as (word_id, name): the words that end with the same number of its
+        last letters, or by default the words with the same rhyme key (see Helpers.word_endings.rhyme_key).
+        """
+        word = self.to_single_word(word)
+        if shared_letters is not None:
+            if shared_letters < 1:
+                raise ValueError("At least one letter has to be shared")
+            return self.execute(queries.WORDS_WITH_REVERSED_PREFIX,
+                                prefix_range(reverse_word(word)[:shared_letters]) + (word,)).fetchall()
+
+        return self.execute(queries.WORDS_WITH_RHYME_KEY, (rhyme_key(word), word)).fetchall()
+
     def word_location_to_offset(self, document_id, sentence, sentence_index, word_end_offset=False):
 
         query = queries.WORD_LOCATION_TO_END_OFFSET if word_end_offset else queries.WORD_LOCATION_TO_OFFSET
         return self.execute(query, (document_id, sentence, sentence_index)).fetchone()
 
+    def keyword_in_context(self, word_id, width=KWIC_WIDTH, limit=None):
+        # Each appearance of the word, with the words around it in its document
+        contexts = []
+        for (document_id, word_index), context in itertools.groupby(
+                self.execute(queries.KEYWORD_IN_CONTEXT, (word_id, -1 if limit is None else limit, width, width)),
+                key=lambda row: row[:2]):
+
+            context = [(context_index, name) for _document_id, _word_index, context_index, name in context]
+            contexts.append((
+                document_id,
+                word_index,
+                " ".join(name for context_index, name in context if context_index < word_index),
+                next(name for context_index, name in context if context_index == word_index),
+                " ".join(name for context_index, name in context if context_index > word_index)
+            ))
+
+        return contexts
+
+    def boolean_search(self, query, scope=DEFAULT_QUERY_SCOPE):
+        return run_query(self, query, scope)
+
+    def top_words(self, k, filters=None, order=APPEARANCES_ORDER, descending=True):
+        """
+        The first k words by the order, as (word_id, length, name, appearances count).
+        Filters on the document, group and name are read from the word frequencies in the order of their
+        indexes, other filters count the appearances of all of the matching words.
+        """
+        filters = {name: value for name, value in (filters or {}).items() if value not in (None, '')}
+        direction = "desc" if descending else "asc"
+
+        if not set(filters).issubset(DocumentDatabase.FREQUENCY_FILTERS):
+            sql = self.word_appearances_query(cols=DocumentDatabase.TOP_WORDS_COLUMNS, tables={"word"},
+                                              unique_words=True, order_by=f"{order} {direction}",
+                                              **self.translate_word_filters(filters))
+            return self.execute(f"{sql} LIMIT ?", (k,)).fetchall()
+
+        constraints = []
+        parameters = []
+        if "name" in filters:
+            constraints.append("AND name LIKE ?")
+            parameters.append(filters["name"])
+
+            suffix_range = self._suffix_range(filters["name"])
+            if suffix_range:
+                constraints.append("AND reversed_name >= ? AND reversed_name < ?")
+                parameters += suffix_range
+        if "name_regex" in filters:
+            constraints.append("AND word_id IN (SELECT value FROM json_each(?))")
+            parameters.append(json.dumps(self.regex_word_ids(filters["name_regex"])))
+        if "group_id" in filters:
+            # Any group when the group is "%"
+            constraints.append("AND word_id IN (SELECT value FROM json_each(?))")
+            parameters.append(json.dumps(self.word_sets.word_ids(filters["group_id"], filters.get("document_id"))))
+        if "document_id" in filters:
+            constraints.append("AND document_id == ?")
+            parameters.append(filters["document_id"])
+
+        sql = queries.TOP_WORDS.format(
+            frequencies="document_term" if "document_id" in filters else "word_frequency",
+            constraints=" ".join(constraints),
+            order=f"{'frequency' if order == DocumentDatabase.APPEARANCES_ORDER else order} {direction}")
+        return self.execute(sql, parameters + [k]).fetchall()
+
+    def top_documents_for_word(self, word, k):
+        # The documents the word appears in the most, as (document_id, appearances count)
+        search_result = self.execute(queries.WORD_NAME_TO_ID, (self.to_single_word(word),)).fetchone()
+        if search_result is None:
+            return []
+
+        return self.execute(queries.TOP_DOCUMENTS_FOR_WORD, (search_result[0], k)).fetchall()
+
+    def query_word_ids(self, query):
+        word_ids = []
+        for match in re.finditer(VALID_WORD_REGEX, query.lower()):
+            search_result = self.execute(queries.WORD_NAME_TO_ID, (match.group(),)).fetchone()
+            if search_result and search_result[0] not in word_ids:
+                word_ids.append(search_result[0])
+
+        return word_ids
+
+    def ranking_statistics(self, word_ids):
+        documents_count, total_length = self.execute(queries.CORPUS_LENGTH).fetchone()
+        document_frequencies = {word_id: self.execute(queries.WORD_DOCUMENTS_COUNT, (word_id,)).fetchone()[0]
+                                for word_id in word_ids}
+        return documents_count, total_length, document_frequencies
+
+    def rank_documents(self, query, limit=RANKED_DOCUMENTS_LIMIT, statistics=None, word_ids=None):
+        """
+        The documents that are the most relevant to the words of the query by BM25, as (document_id, score).
+        The statistics of the corpus can be given when it is larger than this database.
+        """
+        word_ids = self.query_word_ids(query) if word_ids is None else word_ids
+        documents_count, total_length, document_frequencies = statistics or self.ranking_statistics(word_ids)
+        if not documents_count:
+            return []
+
+        terms = [TermPostings(self.execute(queries.WORD_DOCUMENT_POSTINGS, (word_id,)).fetchall(),
+                              documents_count, document_frequencies[word_id], total_length / documents_count)
+                 for word_id in word_ids if document_frequencies.get(word_id)]
+        return top_documents(terms, limit)
+
+    def load_analytics(self):
+        # Until the appearances change, the statistics of the documents are computed from arrays in memory
+        with self.reading_writer():
+            self.analytics = CorpusAnalytics(self)
+
+    def drop_analytics(self):
+        # Waits for a load that is running, so it doesn't keep the appearances from before the change
+        with self.write_lock:
+            self.analytics = None
+
+    def document_statistics(self, document_id=None):
+        analytics = self.analytics
+        if analytics is not None:
+            return analytics.statistics(document_id)
+
+        document_id_filter = ALL_DOCUMENTS_FILTER if document_id is None else f"== {int(document_id)}"
+        return {name: self.execute(query.format(document_id_filter=document_id_filter)).fetchone()[0]
+                for name, query in queries.DOCUMENT_STATISTICS}
+
     def all_words(self):
 
         return self.execute(queries.ALL_WORDS).fetchall()
@@ -253,4 +781,29 @@ class DocumentDatabase(Database):
         return self.execute(queries.ALL_WORDS_IN_PHRASE, (phrase_id,)).fetchall()
 
     def find_phrase(self, phrase_id):
+        if self.ngrams is not None and self.ngrams.is_complete():
+            phrase_appearances = self.ngrams.find_phrase(phrase_id)
+            if phrase_appearances is not None:
+                return phrase_appearances
+
         return self._run_sql_script(DocumentDatabase.SCRIPTS.SEARCH_PHRASE, (phrase_id,)).fetchall()
+
+    def index_missing_documents(self):
+        # The optional indexes of the documents that were added without them (or imported, or merged)
+        if self.ngrams is not None:
+            self.ngrams.index_missing_documents()
+        if self.cooccurrences is not None:
+            self.cooccurrences.index_missing_documents()
+
+    def associated_words(self, word, limit=ASSOCIATED_WORDS_LIMIT, measure=PMI_MEASURE):
+        if self.cooccurrences is None:
+            raise ValueError("The database was opened without the co-occurrence index")
+
+        search_result = self.execute(queries.WORD_NAME_TO_ID, (self.to_single_word(word),)).fetchone()
+        return self.cooccurrences.associated_words(search_result[0], limit, measure) if search_result else []
+
+    def top_ngrams(self, k, n=None):
+        if self.ngrams is None:
+            raise ValueError("The database was opened without the n-gram index")
+
+        return self.ngrams.top_ngrams(k, n)
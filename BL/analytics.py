@@ -0,0 +1,147 @@
+import itertools
+
+import numpy as np
+
+import BL.sql_queries as queries
+
+# language=SQL
+APPEARANCE_COLUMNS = "SELECT document_id, word_index, word_id, paragraph, line, sentence " \
+                     f"FROM ({queries.PARAGRAPH_APPEARANCES})"
+
+# language=SQL
+APPEARANCES_COUNT = "SELECT COUNT(*) " \
+                    "FROM word_occurrence"
+
+# language=SQL
+WORD_LENGTHS = "SELECT word_id, length " \
+               "FROM word"
+
+COLUMNS_COUNT = 6
+
+
+def _distinct(values):
+    # Sorting and comparing neighbours is faster than np.unique for these large integer arrays
+    values = np.sort(values)
+    return values[np.concatenate(([True], values[1:] != values[:-1]))] if len(values) else values
+
+
+def _distinct_pairs(first, second):
+    # Combine each pair to a single key, so the distinct pairs are found in one pass
+    values_range = int(second.max()) + 1
+    return _distinct(first * values_range + second), values_range
+
+
+def _average(total, count):
+    return total / count if count else None
+
+
+def _empty_document_statistics():
+    # What the SQL counts for a document without appearances
+    statistics = dict.fromkeys(name for name, _query in queries.DOCUMENT_STATISTICS)
+    statistics.update(total_words=0, total_unique_words=0)
+    return statistics
+
+
+class CorpusAnalytics:
+    """
+    Loads the columns of the appearances once, and computes all of the statistics of
+    queries.DOCUMENT_STATISTICS for all the documents together.
+    """
+
+    def __init__(self, db):
+        self.document_ids = np.zeros(0, dtype=np.int64)
+        self.document_index = np.zeros(0, dtype=np.int64)
+        self.word_index = np.zeros(0, dtype=np.int64)
+        self.word_id = np.zeros(0, dtype=np.int64)
+        self.columns = {}
+        self.lengths = np.zeros(0, dtype=np.int64)
+        self._statistics = None
+        self.load(db)
+
+    def load(self, db):
+        appearances_count = db.execute(APPEARANCES_COUNT).fetchone()[0]
+        appearances = np.fromiter(itertools.chain.from_iterable(db.execute(APPEARANCE_COLUMNS)),
+                                  dtype=np.int64,
+                                  count=appearances_count * COLUMNS_COUNT).reshape(appearances_count, COLUMNS_COUNT)
+
+        # Documents are numbered densely, so per document results can be counted with bincount
+        self.document_ids, self.document_index = np.unique(appearances[:, 0], return_inverse=True)
+        self.word_index = np.ascontiguousarray(appearances[:, 1])
+        self.word_id = np.ascontiguousarray(appearances[:, 2])
+        self.columns = {column: np.ascontiguousarray(appearances[:, index])
+                        for index, column in enumerate(queries.COUNT_COLUMNS, start=3)}
+
+        word_lengths = np.array(db.execute(WORD_LENGTHS).fetchall(), dtype=np.int64).reshape(-1, 2)
+        word_length_lookup = np.zeros(int(word_lengths[:, 0].max(initial=0)) + 1, dtype=np.int64)
+        word_length_lookup[word_lengths[:, 0]] = word_lengths[:, 1]
+        self.lengths = word_length_lookup[self.word_id]
+        self._statistics = None
+
+    def _per_document_distinct_count(self, values):
+        if not len(values):
+            return np.zeros(len(self.document_ids), dtype=np.int64)
+
+        distinct_keys, values_range = _distinct_pairs(self.document_index, values)
+        return np.bincount(distinct_keys // values_range, minlength=len(self.document_ids))
+
+    def document_statistics(self):
+        documents_count = len(self.document_ids)
+        words = np.bincount(self.document_index, minlength=documents_count)
+        letters = np.bincount(self.document_index, weights=self.lengths, minlength=documents_count).astype(np.int64)
+        unique_words = self._per_document_distinct_count(self.word_id)
+
+        statistics = {
+            "total_words": words,
+            "total_unique_words": unique_words,
+            "total_letters": letters,
+            "avg_letters_per_word": letters / words
+        }
+
+        # In a single document each word index appears once, so the words of a column value are its rows
+        for column, values in self.columns.items():
+            distinct_values = self._per_document_distinct_count(values)
+            statistics[f"total_{column}"] = distinct_values
+            statistics[f"words_per_{column}"] = words / distinct_values
+            statistics[f"letters_per_{column}"] = letters / distinct_values
+
+        return {
+            int(document_id): {name: values[index].item() for name, values in statistics.items()}
+            for index, document_id in enumerate(self.document_ids)
+        }
+
+    def corpus_statistics(self):
+        words = len(self.word_id)
+        letters = int(self.lengths.sum()) if words else None
+
+        statistics = {
+            "total_words": words,
+            "total_unique_words": len(_distinct(self.word_id)),
+            "total_letters": letters,
+            "avg_letters_per_word": _average(letters, words)
+        }
+
+        # Like the SQL, the column values are grouped across all of the documents
+        for column, values in self.columns.items():
+            distinct_values = len(_distinct(values))
+            distinct_word_indexes = len(_distinct_pairs(values, self.word_index)[0]) if words else 0
+
+            statistics[f"total_{column}"] = int(self._per_document_distinct_count(values).sum()) if words else None
+            statistics[f"words_per_{column}"] = _average(distinct_word_indexes, distinct_values)
+            statistics[f"letters_per_{column}"] = _average(letters, distinct_values)
+
+        return statistics
+
+    def statistics(self, document_id=None):
+        """
+        The statistics of the corpus, or of a single document, like DocumentDatabase.document_statistics. All of them
+        are computed on the first call, and kept with the arrays.
+        """
+        if self._statistics is None:
+            self._statistics = self.corpus_statistics(), self.document_statistics()
+
+        corpus_statistics, document_statistics = self._statistics
+        if document_id is None:
+            return dict(corpus_statistics)
+
+        statistics = document_statistics.get(int(document_id))
+        return dict(statistics) if statistics is not None else _empty_document_statistics()
@@ -0,0 +1,110 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from BL.Documents_db import DocumentDatabase
+from BL.phrase_miner import insert_mined_phrases, mine_phrases
+
+DEFAULT_MAX_WORKERS = 4
+PENDING_CALLS_PER_WORKER = 4
+
+
+class AsyncDocumentDatabase:
+    """
+    Awaitable versions of the DocumentDatabase calls, which run on a bounded pool of threads.
+    The database gives every worker its own read connection for a file database (see ReadConnectionPool),
+    and the writes are serialized on the writer connection.
+    A cancelled call interrupts its running statement.
+    """
+
+    def __init__(self, db=None, max_workers=DEFAULT_MAX_WORKERS, max_pending=None, **db_kwargs):
+        self.db = db if db is not None else DocumentDatabase(read_connections=max_workers, **db_kwargs)
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="AsyncDocumentDatabase")
+
+        # Callers wait here instead of piling up an unbounded queue of calls in the executor
+        self._pending_calls = asyncio.Semaphore(max_pending or max_workers * PENDING_CALLS_PER_WORKER)
+
+    def _call(self, cancel_event, func, *args, **kwargs):
+        with self.db.cancellable(cancel_event):
+            return func(*args, **kwargs)
+
+    async def run(self, func, *args, **kwargs):
+        async with self._pending_calls:
+            cancel_event = threading.Event()
+            future = asyncio.wrap_future(self._executor.submit(self._call, cancel_event, func, *args, **kwargs))
+
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Interrupt the statement, and wait for the worker so the executor stays bounded
+                cancel_event.set()
+                await asyncio.wait([future])
+
+                # The interrupted statement fails, which is expected here
+                if not future.cancelled():
+                    future.exception()
+                raise
+
+    def _write(self, func, *args, **kwargs):
+        # A write is committed by the worker that made it, the worker can't hold the writer between calls
+        with self.db.transaction():
+            return func(*args, **kwargs)
+
+    async def search_word_appearances(self, **kwargs):
+        return await self.run(self.db.search_word_appearances, **kwargs)
+
+    async def search_documents(self, **kwargs):
+        return await self.run(self.db.search_documents, **kwargs)
+
+    async def find_phrase(self, phrase_id):
+        return await self.run(self.db.find_phrase, phrase_id)
+
+    async def all_words(self):
+        return await self.run(self.db.all_words)
+
+    async def add_document(self, title, author, path, date):
+        return await self.run(self._write, self.db.add_document, title, author, path, date)
+
+    async def general_statistics(self):
+        return await self.run(self.db.statistics.general_statistics)
+
+    async def document_statistics(self, document_id=None):
+        return await self.run(self.db.document_statistics, document_id)
+
+    async def mine_phrases(self, insert=False, **kwargs):
+        # The mining pass reads on a worker, and only the insert of the found phrases holds the writer
+        phrases = await self.run(mine_phrases, self.db, **kwargs)
+        if insert:
+            await self.run(insert_mined_phrases, self.db, phrases)
+
+        return phrases
+
+    async def stream(self, sql, parameters=(), batch_size=DocumentDatabase.STREAM_BATCH_SIZE):
+        batches = self.db.stream(sql, parameters, batch_size)
+        next_batch = functools.partial(next, batches, None)
+
+        try:
+            while True:
+                batch = await self.run(next_batch)
+                if batch is None:
+                    break
+
+                for row in batch:
+                    yield row
+        finally:
+            # Release the connection of the stream
+            await asyncio.get_running_loop().run_in_executor(self._executor, batches.close)
+
+    def stream_word_appearances(self, batch_size=DocumentDatabase.STREAM_BATCH_SIZE, **kwargs):
+        return self.stream(self.db.word_appearances_query(**kwargs), batch_size=batch_size)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+        self.db.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, _exc_type, _exc_val, _exc_tb):
+        await asyncio.get_running_loop().run_in_executor(None, self.close)
@@ -0,0 +1,374 @@
+import heapq
+import json
+import re
+from bisect import bisect_left, bisect_right
+
+import BL.sql_queries as queries
+
+DEFAULT_NEAR_DISTANCE = 10
+
+# A word is only read around the hits of another operand when it has this many more appearances than the hits
+SPANS_READ_RATIO = 8
+
+# The unit that all of the terms of a match have to be in
+SCOPE_COLUMNS = {
+    "document": "0",
+    "paragraph": "paragraph",
+    "sentence": "sentence"
+}
+
+# The appearances with the column of each unit
+SCOPE_APPEARANCES = {
+    "document": "word_occurrence",
+    "paragraph": "word_occurrence NATURAL JOIN sentence_span",
+    "sentence": "word_occurrence"
+}
+
+TOKEN_REGEX = re.compile(r'\s*(?:(?P<phrase>"[^"]*")|(?P<near>NEAR(?:/\d+)?)(?=[\s()"]|$)|'
+                         r'(?P<operator>AND|OR|NOT)(?=[\s()"]|$)|(?P<paren>[()])|(?P<word>[^\s()"]+))')
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+def _next_unit(unit):
+    # The smallest hit that comes after all of the hits of the unit
+    return unit[0], unit[1] + 1
+
+
+def _unit_ends(hits):
+    # The ranges of the hits of every unit, as (unit, start, end)
+    start = 0
+    while start < len(hits):
+        unit = hits[start][:2]
+        end = bisect_left(hits, _next_unit(unit), start)
+        yield unit, start, end
+        start = end
+
+
+def _unique(hits):
+    return [hit for i, hit in enumerate(hits) if i == 0 or hit != hits[i - 1]]
+
+
+def _shared_units(first, second):
+    """
+    The units that have hits in both of the lists, with the ranges of their hits in each of the lists.
+    The first list should be the shorter one, the second one is only searched at the units of the first.
+    """
+    position = 0
+    for unit, start, end in _unit_ends(first):
+        position = bisect_left(second, unit, position)
+        if position == len(second):
+            break
+
+        if second[position][:2] == unit:
+            second_end = bisect_left(second, _next_unit(unit), position)
+            yield start, end, position, second_end
+            position = second_end
+
+
+class QueryNode:
+
+    def evaluate_in_spans(self, context, hits, start_offset, end_offset):
+        """
+        The hits between start_offset and end_offset words from the given hits, and maybe some others.
+        """
+        return self.evaluate(context, _documents_of(hits))
+
+
+class Term(QueryNode):
+
+    def __init__(self, word):
+        self.word = word.lower()
+
+    def word_id(self, context):
+        if self.word not in context.word_ids:
+            search_result = context.db.execute(queries.WORD_NAME_TO_ID, (self.word,)).fetchone()
+            context.word_ids[self.word] = search_result[0] if search_result else None
+
+        return context.word_ids[self.word]
+
+    def estimate(self, context):
+        if self.word not in context.estimates:
+            word_id = self.word_id(context)
+            context.estimates[self.word] = context.db.execute(queries.WORD_ID_APPEARANCES_COUNT,
+                                                              (word_id,)).fetchone()[0] if word_id else 0
+
+        return context.estimates[self.word]
+
+    def evaluate(self, context, documents=None):
+        word_id = self.word_id(context)
+        if word_id is None or documents == []:
+            return []
+
+        documents_filter = f"AND document_id IN ({', '.join(map(str, documents))})" if documents else ""
+        return context.db.execute(queries.WORD_POSTINGS.format(unit=SCOPE_COLUMNS[context.scope],
+                                                               appearances=SCOPE_APPEARANCES[context.scope],
+                                                               documents_filter=documents_filter),
+                                  (word_id,)).fetchall()
+
+    def evaluate_in_spans(self, context, hits, start_offset, end_offset):
+        # Skip most of the appearances of a common word by looking it up in the index at every span
+        if self.estimate(context) < len(hits) * SPANS_READ_RATIO:
+            return super().evaluate_in_spans(context, hits, start_offset, end_offset)
+
+        spans = json.dumps([(document_id, word_index + start_offset, word_index + end_offset)
+                            for document_id, _unit, word_index in hits])
+        return context.db.execute(queries.WORD_POSTINGS_IN_SPANS.format(unit=SCOPE_COLUMNS[context.scope],
+                                                                        appearances=SCOPE_APPEARANCES[context.scope]),
+                                  (spans, self.word_id(context))).fetchall()
+
+
+class Phrase(QueryNode):
+
+    def __init__(self, words):
+        self.terms = [Term(word) for word in words]
+
+    def estimate(self, context):
+        return min(term.estimate(context) for term in self.terms)
+
+    def evaluate(self, context, documents=None):
+        # Start from the rarest word, and only read the others in the documents it appears in
+        offsets = sorted(range(len(self.terms)), key=lambda offset: self.terms[offset].estimate(context))
+        rarest = offsets[0]
+        postings = {rarest: self.terms[rarest].evaluate(context, documents)}
+        for offset in offsets[1:]:
+            postings[offset] = self.terms[offset].evaluate_in_spans(context, postings[rarest], offset - rarest,
+                                                                    offset - rarest)
+
+        # All of the words of the phrase have to be in the same unit
+        positions = [set(postings[offset]) for offset in range(len(self.terms))]
+
+        hits = []
+        for document_id, unit, word_index in postings[0]:
+            phrase_hits = [(document_id, unit, word_index + offset) for offset in range(len(self.terms))]
+            if all(hit in hits_of_offset for hit, hits_of_offset in zip(phrase_hits, positions)):
+                hits.extend(phrase_hits)
+
+        return _unique(sorted(hits))
+
+
+class And(QueryNode):
+
+    def __init__(self, operands):
+        self.operands = operands
+
+    def estimate(self, context):
+        return min(operand.estimate(context) for operand in self.operands)
+
+    def evaluate(self, context, documents=None):
+        # Intersect from the rarest operand, every other operand is only read in the remaining documents
+        operands = sorted(self.operands, key=lambda operand: operand.estimate(context))
+        hits = operands[0].evaluate(context, documents)
+
+        for operand in operands[1:]:
+            if not hits:
+                break
+
+            other_hits = operand.evaluate(context, _documents_of(hits))
+            hits = _unique([hit for first_start, first_end, second_start, second_end
+                            in _shared_units(hits, other_hits)
+                            for hit in heapq.merge(hits[first_start:first_end], other_hits[second_start:second_end])])
+
+        return hits
+
+
+class Or(QueryNode):
+
+    def __init__(self, operands):
+        self.operands = operands
+
+    def estimate(self, context):
+        return sum(operand.estimate(context) for operand in self.operands)
+
+    def evaluate(self, context, documents=None):
+        return _unique(list(heapq.merge(*(operand.evaluate(context, documents) for operand in self.operands))))
+
+
+class AndNot(QueryNode):
+
+    def __init__(self, included, excluded):
+        self.included = included
+        self.excluded = excluded
+
+    def estimate(self, context):
+        return self.included.estimate(context)
+
+    def evaluate(self, context, documents=None):
+        hits = self.included.evaluate(context, documents)
+        if not hits:
+            return hits
+
+        excluded_hits = self.excluded.evaluate(context, _documents_of(hits))
+        excluded = set()
+        for first_start, first_end, _second_start, _second_end in _shared_units(hits, excluded_hits):
+            excluded.update(range(first_start, first_end))
+
+        return [hit for i, hit in enumerate(hits) if i not in excluded]
+
+
+class Near(QueryNode):
+
+    def __init__(self, first, second, distance):
+        self.first = first
+        self.second = second
+        self.distance = distance
+
+    def estimate(self, context):
+        return min(self.first.estimate(context), self.second.estimate(context))
+
+    def evaluate(self, context, documents=None):
+        rare, common = sorted((self.first, self.second), key=lambda operand: operand.estimate(context))
+        rare_hits = rare.evaluate(context, documents)
+        if not rare_hits:
+            return rare_hits
+
+        common_hits = common.evaluate_in_spans(context, rare_hits, -self.distance, self.distance)
+        hits = []
+        for first_start, first_end, second_start, second_end in _shared_units(rare_hits, common_hits):
+            common_indexes = [word_index for _document_id, _unit, word_index in common_hits[second_start:second_end]]
+            near_common_hits = set()
+
+            for hit in rare_hits[first_start:first_end]:
+                start = bisect_left(common_indexes, hit[2] - self.distance)
+                end = bisect_right(common_indexes, hit[2] + self.distance)
+                if start < end:
+                    hits.append(hit)
+                    near_common_hits.update(common_hits[second_start + start:second_start + end])
+
+            hits.extend(near_common_hits)
+
+        return _unique(sorted(hits))
+
+
+def _documents_of(hits):
+    return sorted({document_id for document_id, _unit, _word_index in hits})
+
+
+class QueryParser:
+    """
+    Parses a query into a plan of the nodes above:
+        query := or_query
+        or_query := and_query ("OR" and_query)*
+        and_query := near_query (["AND"] ["NOT"] near_query)*
+        near_query := term ("NEAR" ["/" distance] term)*
+        term := word | '"' words '"' | "(" query ")"
+    The operators are written in capitals, so "and" and "or" are still words.
+    """
+
+    def __init__(self, query):
+        self.tokens = list(self._tokenize(query))
+        self.position = 0
+
+    @staticmethod
+    def _tokenize(query):
+        position = 0
+        query = query.rstrip()
+        while position < len(query):
+            match = TOKEN_REGEX.match(query, position)
+            if match is None:
+                raise QuerySyntaxError(f"Unexpected text at {position}: {query[position:]}")
+
+            position = match.end()
+            yield match.lastgroup, match.group(match.lastgroup)
+
+    def _peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None)
+
+    def _take(self):
+        token = self._peek()
+        self.position += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise QuerySyntaxError("The query is empty")
+
+        plan = self._or_query()
+        if self.position < len(self.tokens):
+            raise QuerySyntaxError(f"Unexpected {self._peek()[1]}")
+
+        return plan
+
+    def _or_query(self):
+        operands = [self._and_query()]
+        while self._peek() == ("operator", "OR"):
+            self._take()
+            operands.append(self._and_query())
+
+        return operands[0] if len(operands) == 1 else Or(operands)
+
+    def _and_query(self):
+        operands = [self._near_query()]
+        excluded = []
+
+        # Terms without an operator between them are also combined with AND
+        while self._peek()[0] is not None and self._peek() not in (("paren", ")"), ("operator", "OR")):
+            if self._peek() == ("operator", "AND"):
+                self._take()
+
+            if self._peek() == ("operator", "NOT"):
+                self._take()
+                excluded.append(self._near_query())
+            else:
+                operands.append(self._near_query())
+
+        plan = operands[0] if len(operands) == 1 else And(operands)
+        for operand in excluded:
+            plan = AndNot(plan, operand)
+
+        return plan
+
+    def _near_query(self):
+        plan = self._term()
+        while self._peek()[0] == "near":
+            distance = self._take()[1].partition("/")[2]
+            plan = Near(plan, self._term(), int(distance) if distance else DEFAULT_NEAR_DISTANCE)
+
+        return plan
+
+    def _term(self):
+        kind, value = self._take()
+        if kind == "word":
+            return Term(value)
+        if kind == "phrase":
+            words = value.strip('"').split()
+            if not words:
+                raise QuerySyntaxError("A phrase can't be empty")
+            return Phrase(words) if len(words) > 1 else Term(words[0])
+        if (kind, value) == ("paren", "("):
+            plan = self._or_query()
+            if self._take() != ("paren", ")"):
+                raise QuerySyntaxError("Missing )")
+            return plan
+
+        raise QuerySyntaxError(f"Expected a word instead of {value}" if value else "The query ended unexpectedly")
+
+
+class QueryContext:
+
+    def __init__(self, db, scope):
+        if scope not in SCOPE_COLUMNS:
+            raise ValueError(f"The scope has to be one of {', '.join(SCOPE_COLUMNS)}")
+
+        self.db = db
+        self.scope = scope
+        self.word_ids = {}
+        self.estimates = {}
+
+
+def parse_query(query):
+    return QueryParser(query).parse()
+
+
+def run_query(db, query, scope="document"):
+    """
+    Returns the units (documents, paragraphs or sentences) that match the query, as
+    (document_id, unit, word_indexes of the matched words). The unit is None when the scope is the document.
+    """
+    hits = parse_query(query).evaluate(QueryContext(db, scope))
+
+    return [(unit[0], unit[1] if scope != "document" else None,
+             [word_index for _document_id, _unit, word_index in hits[start:end]])
+            for unit, start, end in _unit_ends(hits)]
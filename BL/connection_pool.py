@@ -0,0 +1,109 @@
+import contextlib
+import os
+import queue
+import re
+import sqlite3
+import threading
+from urllib.request import pathname2url
+
+DEFAULT_POOL_SIZE = 4
+
+# Seconds to wait for a pooled connection when all of them are in use
+ACQUIRE_TIMEOUT = 30
+
+# Statements that only read, after any leading comments
+READ_STATEMENT_REGEX = re.compile(r"^(?:\s+|--[^\n]*(?:\n|$)|/\*.*?\*/)*(?:SELECT|WITH)\b", re.IGNORECASE | re.DOTALL)
+
+
+def is_read_statement(sql):
+    return READ_STATEMENT_REGEX.match(sql) is not None
+
+
+def read_only_uri(db_path, immutable=False):
+    # An immutable database is never checked for changes by other connections, so it isn't locked at all
+    return f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro{'&immutable=1' if immutable else ''}"
+
+
+class ReadConnectionPool:
+    """
+    Read-only connections to a database file in WAL mode, so they can read while the writer connection
+    is in the middle of a transaction. Connections are created when needed, up to the size of the pool.
+    """
+
+    def __init__(self, db_path, size=DEFAULT_POOL_SIZE, on_connect=None, immutable=False,
+                 acquire_timeout=ACQUIRE_TIMEOUT):
+        self.db_path = db_path
+        self.size = size
+        self.acquire_timeout = acquire_timeout
+        self.on_connect = on_connect
+        self.immutable = immutable
+        self._idle_connections = queue.LifoQueue()
+        self._connections = []
+        self._lock = threading.Lock()
+
+        # The connections of the readers that keep them for long, which are never waited for
+        self._spare_connections = queue.LifoQueue()
+
+    def _connect(self):
+        connection = sqlite3.connect(read_only_uri(self.db_path, self.immutable), uri=True, check_same_thread=False)
+        if self.on_connect is not None:
+            self.on_connect(connection)
+
+        return connection
+
+    def _acquire(self):
+        try:
+            return self._idle_connections.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._connections) < self.size:
+                connection = self._connect()
+                self._connections.append(connection)
+                return connection
+
+        # All of the connections are in use, wait for one of them
+        try:
+            return self._idle_connections.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise sqlite3.OperationalError("Timed out waiting for a read connection")
+
+    @contextlib.contextmanager
+    def connection(self):
+        connection = self._acquire()
+        try:
+            yield connection
+        finally:
+            self._idle_connections.put(connection)
+
+    @contextlib.contextmanager
+    def separate_connection(self):
+        """
+        A connection of its own, outside of the pool, for a reader that keeps it between its steps (like a stream
+        that is consumed slowly, or never closed), so it can't keep the pooled connections from the other readers.
+        Up to the size of the pool, the connections are kept for the next readers instead of being closed.
+        """
+        try:
+            connection = self._spare_connections.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+
+        try:
+            yield connection
+        finally:
+            if self._spare_connections.qsize() < self.size:
+                self._spare_connections.put(connection)
+            else:
+                connection.close()
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+
+            self._connections = []
+            self._idle_connections = queue.LifoQueue()
+
+            while not self._spare_connections.empty():
+                self._spare_connections.get_nowait().close()
@@ -0,0 +1,172 @@
+import numpy as np
+
+import BL.sql_queries as queries
+
+# Words are related when they are at most this many words apart in a sentence
+DEFAULT_WINDOW = 5
+
+# A window of the whole sentence, stored as window 0
+SENTENCE_WINDOW = "sentence"
+
+PMI_MEASURE = "pmi"
+LOG_LIKELIHOOD_MEASURE = "log_likelihood"
+
+MIN_COOCCURRENCES = 3
+
+COUNTING_BATCH_SIZE = 100_000
+ASSOCIATED_WORDS_LIMIT = 10
+
+
+def _window_value(window):
+    if window == SENTENCE_WINDOW:
+        return 0
+    if not isinstance(window, int) or window < 1:
+        raise ValueError(f"The window has to be a positive number of words or '{SENTENCE_WINDOW}'")
+
+    return window
+
+
+def _cooccurrences(document_ids, sentences, word_ids, window):
+    """
+    The pairs of different words that appear in the same sentence, at most window words apart (or anywhere in it
+    for window 0). The appearances are in the order of their documents. Returns the first words, the second words
+    (always above the first) and the number of times they appear together.
+    """
+    if window == 0:
+        # The longest distance inside a sentence is below the length of the longest sentence
+        sentence_starts = np.flatnonzero(np.concatenate(([True], (document_ids[1:] != document_ids[:-1]) |
+                                                         (sentences[1:] != sentences[:-1]), [True])))
+        window = int(np.diff(sentence_starts).max(initial=1)) - 1
+
+    firsts = []
+    seconds = []
+    for distance in range(1, min(window, len(word_ids) - 1) + 1):
+        same_sentence = (document_ids[distance:] == document_ids[:-distance]) & \
+                        (sentences[distance:] == sentences[:-distance])
+        firsts.append(word_ids[:-distance][same_sentence])
+        seconds.append(word_ids[distance:][same_sentence])
+
+    firsts = np.concatenate(firsts) if firsts else np.zeros(0, dtype=np.int64)
+    seconds = np.concatenate(seconds) if seconds else np.zeros(0, dtype=np.int64)
+    different = firsts != seconds
+    firsts, seconds = np.minimum(firsts, seconds)[different], np.maximum(firsts, seconds)[different]
+
+    # Count the pairs as single keys
+    words_range = int(seconds.max(initial=0)) + 1
+    keys, counts = np.unique(firsts * words_range + seconds, return_counts=True)
+    return keys // words_range, keys % words_range, counts
+
+
+def _xlogx(values):
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(values > 0, values * np.log(np.where(values > 0, values, 1)), 0)
+
+
+class CooccurrenceIndex:
+    """
+    How many times every pair of words appears near each other, stored in both directions in word_cooccurrence,
+    and how many times each word appears near any word in cooccurrence_word.
+    A document is counted once, from its parsed appearances when it is added, or from word_occurrence in
+    batches of whole documents for the documents that were added without the index.
+    """
+
+    def __init__(self, db, window=DEFAULT_WINDOW):
+        self._db = db
+        self.window = _window_value(window)
+
+    def _add_counts(self, document_ids, sentences, word_ids, sign=1):
+        firsts, seconds, counts = _cooccurrences(np.asarray(document_ids, dtype=np.int64),
+                                                 np.asarray(sentences, dtype=np.int64),
+                                                 np.asarray(word_ids, dtype=np.int64), self.window)
+        if not len(counts):
+            return
+
+        counts = counts * sign
+        pairs = np.concatenate((np.stack((firsts, seconds, counts), axis=1),
+                                np.stack((seconds, firsts, counts), axis=1)))
+        self._db.executemany(queries.ADD_WORD_COOCCURRENCE, pairs.tolist())
+
+        word_counts = np.bincount(pairs[:, 0], weights=pairs[:, 2])
+        words = np.flatnonzero(word_counts)
+        self._db.executemany(queries.ADD_COOCCURRENCE_WORD,
+                             zip(words.tolist(), word_counts[words].astype(np.int64).tolist()))
+
+    def index_document(self, document_id, sentences, word_ids):
+        # The sentence and word id of every appearance of the document, in order
+        self._add_counts(np.full(len(word_ids), document_id), sentences, word_ids)
+        self._db.execute(queries.INSERT_COOCCURRENCE_DOCUMENT, (document_id, self.window))
+
+    def _document_appearances(self, document_id):
+        appearances = np.array(self._db.execute(queries.DOCUMENT_SENTENCE_WORDS, (document_id,)).fetchall(),
+                               dtype=np.int64).reshape(-1, 3)
+        return appearances.T
+
+    def copy_document(self, document_id, source_document_id):
+        _document_ids, sentences, word_ids = self._document_appearances(source_document_id)
+        self.index_document(document_id, sentences, word_ids)
+
+    def remove_document(self, document_id):
+        self._add_counts(*self._document_appearances(document_id), sign=-1)
+        self._db.execute(queries.DELETE_COOCCURRENCE_DOCUMENT, (document_id,))
+
+    @staticmethod
+    def remove_indexed_document(db, document_id):
+        # Subtracts the counts of a document with the window they were counted with, also by a database that was
+        # opened without the index, while the old appearances of the document are still there
+        indexed_window = db.execute(queries.COOCCURRENCE_DOCUMENT_WINDOW, (document_id,)).fetchone()
+        if indexed_window is not None:
+            CooccurrenceIndex(db, indexed_window[0] or SENTENCE_WINDOW).remove_document(document_id)
+
+    def index_missing_documents(self, batch_size=COUNTING_BATCH_SIZE):
+        # Counts of another window can't be mixed with the counts of this one
+        if self._db.execute(queries.HAS_OTHER_COOCCURRENCE_WINDOW, (self.window,)).fetchone()[0]:
+            self._db.executescript(queries.CLEAR_COOCCURRENCES)
+
+        if not self._db.execute(queries.HAS_UNINDEXED_COOCCURRENCE_DOCUMENTS).fetchone()[0]:
+            return
+
+        with self._db.transaction():
+            remainder = np.zeros((0, 3), dtype=np.int64)
+            for rows in self._db.stream(queries.UNINDEXED_COOCCURRENCE_APPEARANCES, batch_size=batch_size):
+                appearances = np.concatenate((remainder, np.array(rows, dtype=np.int64).reshape(-1, 3)))
+
+                # The last document may continue in the next batch
+                last_document_start = np.searchsorted(appearances[:, 0], appearances[-1, 0])
+                self._add_counts(*appearances[:last_document_start].T)
+                remainder = appearances[last_document_start:]
+
+            self._add_counts(*remainder.T)
+            self._db.execute(queries.INSERT_UNINDEXED_COOCCURRENCE_DOCUMENTS, (self.window,))
+
+    def associated_words(self, word_id, limit=ASSOCIATED_WORDS_LIMIT, measure=PMI_MEASURE,
+                         min_count=MIN_COOCCURRENCES):
+        """
+        The words that appear near the word at least min_count times, as (name, count, score) from the most
+        associated one. The score is the pointwise mutual information of the pair (in bits), or Dunning's
+        log-likelihood ratio, which doesn't favor rare words as much.
+        """
+        if measure not in (PMI_MEASURE, LOG_LIKELIHOOD_MEASURE):
+            raise ValueError(f"The measure has to be {PMI_MEASURE} or {LOG_LIKELIHOOD_MEASURE}")
+
+        word_count = self._db.execute(queries.COOCCURRENCE_WORD_COUNT, (word_id,)).fetchone()
+        rows = self._db.execute(queries.WORD_COOCCURRENCES, (word_id, min_count)).fetchall()
+        if not word_count or not rows:
+            return []
+
+        names = [name for name, _count, _other_count in rows]
+        counts = np.array([count for _name, count, _other_count in rows], dtype=np.float64)
+        other_counts = np.array([other_count for _name, _count, other_count in rows], dtype=np.float64)
+        word_count = word_count[0]
+        total = self._db.execute(queries.COOCCURRENCES_TOTAL).fetchone()[0]
+
+        if measure == PMI_MEASURE:
+            scores = np.log2(counts * total / (word_count * other_counts))
+        else:
+            # The 2x2 table of the word and the other word, against all the other pairs
+            cells = (counts, word_count - counts, other_counts - counts, total - word_count - other_counts + counts)
+            scores = 2 * (sum(_xlogx(cell) for cell in cells) + _xlogx(total)
+                          - _xlogx(word_count) - _xlogx(total - word_count)
+                          - _xlogx(other_counts) - _xlogx(total - other_counts))
+
+        order = np.lexsort((names, -scores))[:limit]
+        return [(names[i], int(counts[i]), float(scores[i])) for i in order]
@@ -0,0 +1,91 @@
+import time
+
+
+# A cursor-like wrapper over rows that were already fetched from a real cursor
+class FetchedCursor:
+
+    def __init__(self, cursor, rows):
+        self.description = cursor.description
+        self.lastrowid = cursor.lastrowid
+        self.rowcount = cursor.rowcount
+        self._rows = rows
+        self._position = 0
+
+    def fetchone(self):
+        if self._position >= len(self._rows):
+            return None
+
+        self._position += 1
+        return self._rows[self._position - 1]
+
+    def fetchmany(self, size=1):
+        rows = self._rows[self._position:self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._rows[self._position:]
+        self._position = len(self._rows)
+        return rows
+
+    def __iter__(self):
+        while self._position < len(self._rows):
+            yield self.fetchone()
+
+    def close(self):
+        pass
+
+
+class TimedCursor:
+    """
+    A real cursor whose rows are still fetched when they are asked for. The time of the fetches is added to the
+    time of the execute, and on_finish(duration, row_count) is called once: when the rows run out, or the cursor is
+    closed or discarded before that.
+    """
+
+    def __init__(self, cursor, duration, on_finish):
+        self._cursor = cursor
+        self._duration = duration
+        self._row_count = 0
+        self._on_finish = on_finish
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def _fetched(self, start_time, rows, finished):
+        self._duration += time.perf_counter() - start_time
+        self._row_count += len(rows)
+        if finished:
+            self._finish()
+
+        return rows
+
+    def _finish(self):
+        on_finish, self._on_finish = self._on_finish, None
+        if on_finish is not None:
+            on_finish(self._duration, self._row_count)
+
+    def fetchone(self):
+        start_time = time.perf_counter()
+        row = self._cursor.fetchone()
+        self._fetched(start_time, [] if row is None else [row], row is None)
+        return row
+
+    def fetchmany(self, size=1):
+        start_time = time.perf_counter()
+        rows = self._cursor.fetchmany(size)
+        return self._fetched(start_time, rows, len(rows) < size)
+
+    def fetchall(self):
+        start_time = time.perf_counter()
+        return self._fetched(start_time, self._cursor.fetchall(), True)
+
+    def __iter__(self):
+        return iter(self.fetchone, None)
+
+    def close(self):
+        self._finish()
+        self._cursor.close()
+
+    def __del__(self):
+        self._finish()
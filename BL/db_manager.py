@@ -1,7 +1,14 @@
+import contextlib
+import functools
 import os
 import sqlite3
+import tempfile
+import threading
 
+from BL.connection_pool import DEFAULT_POOL_SIZE, ReadConnectionPool, is_read_statement, read_only_uri
+from BL.cursors import FetchedCursor
 from BL.exceptions import raise_specific_exception
+from BL.slow_query_log import SlowQueryLog
 from Helpers.utils import cached_read
 
 
@@ -19,11 +26,49 @@ def raise_specific_exception_wrapper(func):
 class Database:
 
     SCRIPTS_DIR = r"scripts"
+    WAL_SUFFIXES = ("-wal", "-shm")
 
-    def __init__(self, db_path=None, always_create=False):
+    CANCEL_CHECK_INSTRUCTIONS = 10000
+    STREAM_BATCH_SIZE = 1000
+
+    # SQLite limits it to the maximum it was compiled with
+    READ_ONLY_MMAP_SIZE = 1 << 40
+
+    DEFAULT_MEMORY_LIMIT = 512 * 1024 ** 2
+    SPILL_BACKUP_PAGES = 1024
+    SPILLED_CACHE_FRACTION = 4
+
+    # The size of an in-memory database is checked when a transaction is committed, and after this many writes
+    # that didn't open one
+    SPILL_CHECK_WRITES = 100
+
+    def __init__(self, db_path=None, always_create=False, slow_query_log=None, read_connections=DEFAULT_POOL_SIZE,
+                 read_only=False, memory_limit=DEFAULT_MEMORY_LIMIT):
+        # A read-only database is a published file that nothing writes to, so all of its connections
+        # open it as immutable and map it into memory, and processes that serve it share the page cache
+        self.read_only = read_only
         self._curr_path = None
         self._conn = None  # type: sqlite3.Connection
-        self._cursor = None  # type: sqlite3.Cursor
+        self._read_pool = None  # type: ReadConnectionPool
+        self.read_connections = read_connections
+        self.slow_query_log = slow_query_log  # type: SlowQueryLog
+
+        # An in-memory database that grows past the limit moves to a temporary file, which is deleted on close
+        self.memory_limit = memory_limit
+        self._spill_path = None
+        self._unchecked_writes = 0
+
+        # The writer connection is shared by all threads. A thread with an open transaction holds the
+        # lock until it commits, so other threads can't write into the middle of its transaction.
+        self.write_lock = threading.RLock()
+        self._transaction_owner = None
+
+        # The cancel event of the call that runs on each thread, the transaction blocks it is inside of, and
+        # whether it reads from the writer
+        self._cancellation = threading.local()
+        self._transaction_blocks = threading.local()
+        self._writer_reads = threading.local()
+
         self.new_connection(always_create, db_path)
 
     def save_to_file(self, db_path, switch_to_new=False):
@@ -31,52 +76,215 @@ class Database:
         if db_path == self._curr_path:
             return
 
-        disk_conn = sqlite3.connect(db_path)
+        disk_conn = sqlite3.connect(db_path, check_same_thread=False)
         self.commit()
-        self._conn.backup(disk_conn)
+        with self.write_lock:
+            self._conn.backup(disk_conn)
 
         if switch_to_new:
             self.close(commit=False)
-            self._conn = disk_conn
-            self._cursor = self._conn.cursor()
+            self.read_only = False
+            self._set_connection(disk_conn, db_path)
+        else:
+            disk_conn.close()
 
     def new_connection(self, always_create=True, new_path=None, commit=True):
 
         if self._conn:
             self.close(commit=commit)
 
+        if self.read_only:
+            if not new_path or always_create:
+                raise ValueError("A read-only database has to be an existing file")
+
+            self._set_connection(sqlite3.connect(read_only_uri(new_path, immutable=True), uri=True,
+                                                 check_same_thread=False), new_path)
+            return True
+
         if new_path:
             # Check if the path already exists
             already_exists = os.path.exists(new_path)
 
-            # Delete if always_create
+            # Delete if always_create, with the write-ahead log of the old database
             if always_create and already_exists:
                 os.remove(new_path)
+                for suffix in Database.WAL_SUFFIXES:
+                    if os.path.exists(new_path + suffix):
+                        os.remove(new_path + suffix)
         else:
             already_exists = False
 
         # Connect to the new path
-        self._conn = sqlite3.connect(new_path if new_path else ':memory:')
-        self._cursor = self._conn.cursor()
-        self._curr_path = new_path
+        self._set_connection(sqlite3.connect(new_path if new_path else ':memory:', check_same_thread=False), new_path)
 
         return already_exists and not always_create
 
+    def _set_connection(self, connection, path):
+        self._conn = connection
+        self._curr_path = path
+        self._prepare_connection(self._conn)
+
+        # Only a file can be shared with other connections, an in-memory database is read by the writer
+        if path:
+            if not self.read_only:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._read_pool = ReadConnectionPool(path, self.read_connections, self._prepare_connection,
+                                                 immutable=self.read_only)
+
+    def _prepare_connection(self, connection):
+        connection.set_progress_handler(self._is_cancelled, Database.CANCEL_CHECK_INSTRUCTIONS)
+        if self.read_only:
+            connection.execute(f"PRAGMA mmap_size={Database.READ_ONLY_MMAP_SIZE}")
+
+    def _is_cancelled(self):
+        # Called by sqlite during long statements, a true result interrupts the statement
+        cancel_event = getattr(self._cancellation, "event", None)
+        return cancel_event is not None and cancel_event.is_set()
+
+    @contextlib.contextmanager
+    def cancellable(self, cancel_event):
+        # Statements of this thread are interrupted once the event is set
+        self._cancellation.event = cancel_event
+        try:
+            yield
+        finally:
+            self._cancellation.event = None
+
+    def _cursor_execute(self, cursor, *args, **kwargs):
+        if self.slow_query_log is not None:
+            return self.slow_query_log.execute(cursor, *args, **kwargs)
+
+        return cursor.execute(*args, **kwargs)
+
+    def _write(self, method, *args, **kwargs):
+        self.write_lock.acquire()
+        try:
+            result = method(self._conn.cursor(), *args, **kwargs)
+            if not self._conn.in_transaction:
+                self._unchecked_writes += 1
+                if self._unchecked_writes >= Database.SPILL_CHECK_WRITES:
+                    self._spill_if_needed()
+            return result
+        finally:
+            if self._conn.in_transaction and self._transaction_owner is None:
+                # Keep holding the lock until the transaction that was started here ends
+                self._transaction_owner = threading.get_ident()
+            else:
+                # Some statements (like scripts) end the transaction by themselves
+                if not self._conn.in_transaction and self._transaction_owner == threading.get_ident():
+                    self._transaction_owner = None
+                    self.write_lock.release()
+
+                self.write_lock.release()
+
+    def memory_size(self):
+        page_count, = self._conn.execute("PRAGMA page_count").fetchone()
+        page_size, = self._conn.execute("PRAGMA page_size").fetchone()
+        return page_count * page_size
+
+    def _spill_if_needed(self):
+        # Only called between transactions (with the write lock), moving the database can't commit a part of one
+        if self._curr_path is not None or not self.memory_limit or self._conn.in_transaction or \
+                getattr(self._transaction_blocks, "depth", 0):
+            return
+
+        self._unchecked_writes = 0
+        if self.memory_size() <= self.memory_limit:
+            return
+
+        fd, spill_path = tempfile.mkstemp(prefix="concordance_", suffix=".sqlite")
+        os.close(fd)
+        disk_conn = sqlite3.connect(spill_path, check_same_thread=False)
+
+        # The pages are copied in steps, so the copy doesn't have to be built in memory next to the database
+        self._conn.backup(disk_conn, pages=Database.SPILL_BACKUP_PAGES)
+        self._conn.close()
+
+        self._set_connection(disk_conn, spill_path)
+        self._spill_path = spill_path
+
+        # The page cache is the memory of the database from now on, and the file doesn't have to survive a crash
+        disk_conn.execute(f"PRAGMA cache_size=-{self.memory_limit // Database.SPILLED_CACHE_FRACTION // 1024}")
+        disk_conn.execute("PRAGMA synchronous=OFF")
+
+    @property
+    def spilled(self):
+        return self._spill_path is not None
+
+    def _end_transaction(self, method):
+        with self.write_lock:
+            method()
+            if self._transaction_owner == threading.get_ident():
+                self._transaction_owner = None
+                self.write_lock.release()
+
+    def owns_transaction(self):
+        # Whether this thread wrote in a transaction that it didn't end yet
+        return self._transaction_owner == threading.get_ident()
+
+    def _read_from_pool(self, sql, *args, **kwargs):
+        # A thread in the middle of a transaction has to read its own changes from the writer
+        return self._read_pool is not None and is_read_statement(sql) and \
+            self._transaction_owner != threading.get_ident() and not getattr(self._writer_reads, "active", False)
+
+    @contextlib.contextmanager
+    def reading_writer(self):
+        """
+        The reads of this thread inside the block are made by the writer, while holding the write lock. They wait
+        for the transaction of another thread to end, so unlike the snapshot of a pooled connection they see
+        every write that was made before the block, and no other write is made until it ends.
+        """
+        with self.write_lock:
+            active = getattr(self._writer_reads, "active", False)
+            self._writer_reads.active = True
+            try:
+                yield
+            finally:
+                self._writer_reads.active = active
+
     @raise_specific_exception_wrapper
     def execute(self, *args, **kwargs):
 
         if len(args) == 3:
             raise ValueError
 
-        return self._cursor.execute(*args, **kwargs)
+        if self._read_from_pool(*args, **kwargs):
+            # The rows are fetched before the connection goes back to the pool
+            with self._read_pool.connection() as connection:
+                cursor = self._cursor_execute(connection.cursor(), *args, **kwargs)
+                return FetchedCursor(cursor, cursor.fetchall())
+
+        return self._write(self._cursor_execute, *args, **kwargs)
+
+    def stream(self, sql, parameters=(), batch_size=STREAM_BATCH_SIZE):
+        # Yield the rows in batches, without holding all of them in memory
+        if self._read_from_pool(sql):
+            # The batches are read whenever the caller asks for them, so the stream doesn't hold a pooled connection
+            with self._read_pool.separate_connection() as connection:
+                # A stream that isn't read to the end ends its read transaction, before the connection is reused
+                with contextlib.closing(connection.execute(sql, parameters)) as cursor:
+                    yield from iter(functools.partial(cursor.fetchmany, batch_size), [])
+        else:
+            # Other threads may use the writer between the batches, so only hold the lock for each batch
+            with self.write_lock:
+                cursor = self._conn.execute(sql, parameters)
+
+            while True:
+                with self.write_lock:
+                    rows = cursor.fetchmany(batch_size)
+
+                if not rows:
+                    break
+
+                yield rows
 
     @raise_specific_exception_wrapper
     def executemany(self, *args, **kwargs):
-        return self._cursor.executemany(*args, **kwargs)
+        return self._write(sqlite3.Cursor.executemany, *args, **kwargs)
 
     @raise_specific_exception_wrapper
     def executescript(self, *args, **kwargs):
-        return self._cursor.executescript(*args, **kwargs)
+        return self._write(sqlite3.Cursor.executescript, *args, **kwargs)
 
     @staticmethod
     def _read_script_file(script_name):
@@ -90,18 +298,63 @@ class Database:
             return self.execute(script, args)
 
     def commit(self):
-        self._conn.commit()
+        with self.write_lock:
+            self._end_transaction(self._conn.commit)
+            self._spill_if_needed()
+
+    def rollback(self):
+        self._end_transaction(self._conn.rollback)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        # Only the outermost block begins and commits, a nested block is a savepoint, so a failure inside of it
+        # undoes its own writes without the writes of the enclosing block
+        depth = getattr(self._transaction_blocks, "depth", 0)
+        savepoint = f"transaction_block_{depth}"
+        if depth:
+            self.execute(f"SAVEPOINT {savepoint}")
+        else:
+            self.commit()
+            self.execute("BEGIN")
+
+        self._transaction_blocks.depth = depth + 1
+        try:
+            yield
+        except BaseException:
+            if depth:
+                self.execute(f"ROLLBACK TO {savepoint}")
+                self.execute(f"RELEASE {savepoint}")
+            else:
+                self.rollback()
+            raise
+        finally:
+            self._transaction_blocks.depth = depth
+
+        if depth:
+            self.execute(f"RELEASE {savepoint}")
+        else:
+            self.commit()
 
     def close(self, commit=True):
+        # Not through commit(), a database that is closed doesn't have to move to a file first
         if commit:
-            self.commit()
+            self._end_transaction(self._conn.commit)
+        elif self._conn:
+            self.rollback()
 
-        if self._cursor:
-            self._cursor.close()
+        if self._read_pool:
+            self._read_pool.close()
+            self._read_pool = None
 
         if self._conn:
             self._conn.close()
 
+        if self._spill_path:
+            for path in (self._spill_path,) + tuple(self._spill_path + suffix for suffix in Database.WAL_SUFFIXES):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._spill_path = None
+
     def __enter__(self):
         return self
 
@@ -0,0 +1,145 @@
+import threading
+
+import numpy as np
+
+# language=SQL
+WORDS_AFTER_ID = "SELECT word_id, name " \
+                 "FROM word " \
+                 "WHERE word_id > ? " \
+                 "ORDER BY word_id"
+
+DEFAULT_MAX_EDIT_DISTANCE = 2
+
+# The sizes of the substrings that are indexed. Every edit changes at most n of the substrings of n letters, so
+# short words are looked up with the smaller substrings, which less of the edits can change.
+GRAM_SIZES = (3, 2)
+
+# The postings of the words that arrived after the last build are merged into the arrays at this fraction
+PENDING_WORDS_REBUILD_FRACTION = 0.1
+
+
+def _grams(name, size):
+    # A space at each end makes the first and last letters part of their own substrings
+    padded = f" {name} "
+    return {padded[i:i + size] for i in range(len(padded) - size + 1)}
+
+
+def _edit_distances(word, names, max_distance):
+    """
+    The Levenshtein distances of the word to all of the names at once, with a row of the table of every name
+    computed together. Distances above max_distance are returned as max_distance + 1.
+    """
+    lengths = np.array([len(name) for name in names], dtype=np.int64)
+    width = int(lengths.max(initial=0))
+    letters = np.full((len(names), width), -1, dtype=np.int64)
+    for i, name in enumerate(names):
+        letters[i, :len(name)] = [ord(letter) for letter in name]
+
+    previous = np.broadcast_to(np.arange(width + 1), (len(names), width + 1)).copy()
+    for i, letter in enumerate(word, start=1):
+        current = np.empty_like(previous)
+        current[:, 0] = i
+        substitutions = previous[:, :-1] + (letters != ord(letter))
+        deletions = previous[:, 1:] + 1
+        best = np.minimum(substitutions, deletions)
+        for j in range(1, width + 1):
+            current[:, j] = np.minimum(best[:, j - 1], current[:, j - 1] + 1)
+        previous = current
+
+    distances = previous[np.arange(len(names)), lengths]
+    return np.minimum(distances, max_distance + 1)
+
+
+class FuzzyWordIndex:
+    """
+    An in-memory inverted index from the trigrams and bigrams of the words to the words, for finding the words
+    within an edit distance of a word. A word within k edits of the word shares all but n * k of its substrings of
+    n letters, so only the words that share enough of them (and have a close length) are compared letter by letter.
+    It is loaded on the first lookup, and the words that were inserted since then are added on the next lookups.
+    """
+
+    def __init__(self, db):
+        self._db = db
+        self._lock = threading.Lock()
+        self.invalidate()
+
+    def invalidate(self):
+        # Also called after a rollback, whose word ids are used again by the next inserted words
+        with self._lock:
+            self._last_word_id = 0
+            self.word_ids = []
+            self.names = []
+            self.lengths = np.zeros(0, dtype=np.int64)
+            self._postings = {size: {} for size in GRAM_SIZES}
+            self._pending_postings = {size: {} for size in GRAM_SIZES}
+            self._pending_words = 0
+
+    def _add_pending_postings(self, first_index):
+        for size, postings in self._pending_postings.items():
+            for index, name in enumerate(self.names[first_index:], start=first_index):
+                for gram in _grams(name, size):
+                    postings.setdefault(gram, []).append(index)
+
+    def _build_postings(self):
+        self._pending_postings = {size: {} for size in GRAM_SIZES}
+        self._add_pending_postings(0)
+
+        self._postings = {size: {gram: np.array(indexes, dtype=np.int32) for gram, indexes in postings.items()}
+                          for size, postings in self._pending_postings.items()}
+        self._pending_postings = {size: {} for size in GRAM_SIZES}
+        self._pending_words = 0
+
+    def update(self):
+        new_words = self._db.execute(WORDS_AFTER_ID, (self._last_word_id,)).fetchall()
+        if not new_words:
+            return
+
+        first_index = len(self.names)
+        self.word_ids += [word_id for word_id, _name in new_words]
+        self.names += [name for _word_id, name in new_words]
+        self.lengths = np.array([len(name) for name in self.names], dtype=np.int64)
+        self._last_word_id = self.word_ids[-1]
+
+        self._pending_words += len(new_words)
+        if self._pending_words > len(self.names) * PENDING_WORDS_REBUILD_FRACTION:
+            self._build_postings()
+        else:
+            self._add_pending_postings(first_index)
+
+    def _candidates(self, word, max_distance):
+        # The words with a close length that share enough substrings with the word, of the largest size that can
+        # still filter them
+        close_length = np.abs(self.lengths - len(word)) <= max_distance
+        for size in GRAM_SIZES:
+            grams = _grams(word, size)
+            min_shared = len(grams) - size * max_distance
+            if min_shared > 0:
+                break
+        else:
+            return np.flatnonzero(close_length)
+
+        postings = [self._postings[size][gram] for gram in grams if gram in self._postings[size]]
+        postings += [np.array(self._pending_postings[size][gram], dtype=np.int32)
+                     for gram in grams if gram in self._pending_postings[size]]
+        if not postings:
+            return np.zeros(0, dtype=np.int64)
+
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.names))
+        return np.flatnonzero((shared >= min_shared) & close_length)
+
+    def similar_words(self, word, max_distance=DEFAULT_MAX_EDIT_DISTANCE, limit=None):
+        # The words within max_distance edits of the word, as (word_id, name, distance) from the closest one
+        with self._lock:
+            self.update()
+            candidates = self._candidates(word, max_distance)
+            names = [self.names[index] for index in candidates]
+
+        if not names:
+            return []
+
+        distances = _edit_distances(word, names, max_distance)
+        similar = sorted((int(distance), name, self.word_ids[index])
+                         for index, name, distance in zip(candidates.tolist(), names, distances)
+                         if distance <= max_distance)
+
+        return [(word_id, name, distance) for distance, name, word_id in similar[:limit]]
@@ -0,0 +1,76 @@
+import BL.sql_queries as queries
+from BL.Documents_db import DocumentDatabase
+
+SOURCE_SCHEMA = "source"
+
+# Columns that older source databases may not have yet
+OPTIONAL_DOCUMENT_COLUMNS = ("content_hash", "file_mtime")
+
+
+def _source_document_columns(db):  # type: (DocumentDatabase) -> dict
+    existing_columns = {row[1] for row in db.execute(f"PRAGMA {SOURCE_SCHEMA}.table_info(document)")}
+    return {column: column if column in existing_columns else "NULL" for column in OPTIONAL_DOCUMENT_COLUMNS}
+
+
+def _merge_source(db):  # type: (DocumentDatabase) -> dict
+    def run(query, **kwargs):
+        return db.execute(query.format(schema=SOURCE_SCHEMA, **kwargs)).rowcount
+
+    merged = {"words": run(queries.MERGE_WORDS)}
+    run(queries.MAP_WORDS)
+
+    merged["duplicate_documents"] = run(queries.MAP_DUPLICATE_DOCUMENTS)
+    run(queries.MAP_NEW_DOCUMENTS)
+    merged["documents"] = run(queries.MERGE_DOCUMENTS, **_source_document_columns(db))
+    merged["word_appearances"] = run(queries.MERGE_WORD_APPEARANCES)
+    for query in queries.MERGE_SPANS:
+        run(query)
+    run(queries.MERGE_DOCUMENT_TERMS)
+    run(queries.MERGE_WORD_FREQUENCIES)
+    run(queries.MERGE_DOCUMENT_LENGTHS)
+
+    merged["groups"] = run(queries.MERGE_GROUPS)
+    run(queries.MAP_GROUPS)
+    merged["words_in_groups"] = run(queries.MERGE_WORDS_IN_GROUPS)
+
+    run(queries.MAP_DUPLICATE_PHRASES)
+    run(queries.MAP_NEW_PHRASES)
+    merged["phrases"] = run(queries.MERGE_PHRASES)
+    run(queries.MERGE_WORDS_IN_PHRASES)
+
+    return merged
+
+
+def merge_databases(target, sources):  # type: (DocumentDatabase, list) -> list
+    """
+    Copy the content of other database files into the target with set-based statements.
+    The ids of the sources are remapped: words and groups by name, documents by title and author (or path),
+    and phrases by text. The appearances of a document that is already in the target are not copied again.
+    Returns the counts of the merged rows of every source.
+    """
+    merged = []
+
+    for source_path in sources:
+        # Attaching isn't allowed in the middle of a transaction
+        target.commit()
+        target.execute(queries.ATTACH_DATABASE.format(schema=SOURCE_SCHEMA), (source_path,))
+        try:
+            target.executescript(queries.CREATE_MERGE_MAPS)
+            with target.transaction():
+                merged.append(_merge_source(target))
+        finally:
+            target.executescript(queries.DROP_MERGE_MAPS)
+            target.execute(queries.DETACH_DATABASE.format(schema=SOURCE_SCHEMA))
+
+    # The merged rows didn't go through the insert methods
+    target.get_word_id.cache_clear()
+    target.statistics.invalidate()
+    target.word_sets.invalidate()
+    target.fuzzy_words.invalidate()
+    target.vocabulary_regex.invalidate()
+    target.drop_analytics()
+
+    # The optional indexes of the new documents are built from their merged appearances
+    target.index_missing_documents()
+
+    return merged
@@ -0,0 +1,136 @@
+import json
+
+import BL.sql_queries as queries
+
+NGRAM_SIZES = (2, 3)
+
+# The third word of a bigram in the index
+NO_WORD_ID = 0
+
+
+def _sentence_ngrams(appearances):
+    """
+    The bigrams and trigrams that start at every appearance, as (word_index, first, second, third) where the
+    third word of a bigram is NO_WORD_ID. The appearances are (word_index, sentence, word_id) in the order of
+    the document, and an n-gram never crosses the end of a sentence.
+    """
+    for i, (word_index, sentence, word) in enumerate(appearances):
+        following = [next_word for _next_index, next_sentence, next_word in appearances[i + 1:i + 3]
+                     if next_sentence == sentence]
+
+        if following:
+            yield word_index, word, following[0], NO_WORD_ID
+        if len(following) == 2:
+            yield word_index, word, following[0], following[1]
+
+
+class NgramIndex:
+    """
+    The bigrams and trigrams inside the sentences of the documents, with their frequencies and the positions
+    (document_id, word_index of the first word) they appear at.
+    Phrases of up to three words are read directly from the index, and longer phrases start from the
+    positions of their rarest trigram and only check the other trigrams at those positions.
+    """
+
+    def __init__(self, db):
+        self._db = db
+
+    def _merge_staged_ngrams(self):
+        self._db.execute(queries.INSERT_STAGED_NGRAMS)
+        self._db.execute(queries.INSERT_STAGED_NGRAM_APPEARANCES)
+        self._db.execute(queries.CLEAR_NGRAM_STAGING)
+
+    def index_document(self, document_id, appearances):
+        # The appearances are (word_index, sentence, word_id) from the parsed document
+        self._db.execute(queries.CREATE_NGRAM_STAGING)
+        self._db.executemany(queries.INSERT_NGRAM_STAGING, ((document_id,) + ngram
+                                                            for ngram in _sentence_ngrams(appearances)))
+        self._merge_staged_ngrams()
+        self._db.execute(queries.INSERT_NGRAM_DOCUMENT, (document_id,))
+
+    def index_missing_documents(self):
+        # Documents that were added without the index, imported or merged are indexed from their appearances
+        if not self._db.execute(queries.HAS_UNINDEXED_NGRAM_DOCUMENTS).fetchone()[0]:
+            return
+
+        with self._db.transaction():
+            self._db.execute(queries.CREATE_NGRAM_STAGING)
+            self._db.execute(queries.STAGE_UNINDEXED_NGRAMS)
+            self._merge_staged_ngrams()
+            self._db.execute(queries.INSERT_UNINDEXED_NGRAM_DOCUMENTS)
+
+    def copy_document(self, document_id, source_document_id):
+        self._db.execute(queries.COPY_DOCUMENT_NGRAMS, (document_id, source_document_id))
+        self._db.execute(queries.ADD_DOCUMENT_NGRAM_FREQUENCIES, (1, document_id))
+        self._db.execute(queries.INSERT_NGRAM_DOCUMENT, (document_id,))
+
+    def remove_document(self, document_id):
+        self._db.execute(queries.ADD_DOCUMENT_NGRAM_FREQUENCIES, (-1, document_id))
+        self._db.execute(queries.DELETE_DOCUMENT_NGRAMS, (document_id,))
+        self._db.execute(queries.DELETE_NGRAM_DOCUMENT, (document_id,))
+
+    def is_complete(self):
+        return not self._db.execute(queries.HAS_UNINDEXED_NGRAM_DOCUMENTS).fetchone()[0]
+
+    def find_ngram(self, word_ids):
+        # The (ngram_id, frequency) of two or three words, or None if they never appear together
+        word_ids = tuple(word_ids) + (NO_WORD_ID,) * (3 - len(word_ids))
+        return self._db.execute(queries.NGRAM_ID, word_ids).fetchone()
+
+    def find(self, word_ids):
+        """
+        The positions of the phrase with the given word ids inside of sentences, as (document_id, word_index)
+        of its first word, sorted.
+        """
+        word_ids = list(word_ids)
+        if len(word_ids) < NGRAM_SIZES[0]:
+            raise ValueError(f"A phrase in the n-gram index has at least {NGRAM_SIZES[0]} words")
+
+        if len(word_ids) <= NGRAM_SIZES[-1]:
+            ngram = self.find_ngram(word_ids)
+            return self._db.execute(queries.NGRAM_POSTINGS, (ngram[0],)).fetchall() if ngram else []
+
+        trigrams = {}
+        for offset in range(len(word_ids) - 2):
+            trigram = self.find_ngram(word_ids[offset:offset + 3])
+            if trigram is None:
+                return []
+            trigrams[offset] = trigram
+
+        # Start from the rarest trigram, and check the positions with enough trigrams to cover the whole phrase
+        anchor = min(trigrams, key=lambda offset: trigrams[offset][1])
+        covering = (set(range(0, len(word_ids) - 2, 3)) | {len(word_ids) - 3}) - {anchor}
+
+        starts = [(document_id, word_index - anchor)
+                  for document_id, word_index in self._db.execute(queries.NGRAM_POSTINGS,
+                                                                  (trigrams[anchor][0],))]
+        for offset in sorted(covering, key=lambda offset: trigrams[offset][1]):
+            if not starts:
+                break
+
+            positions = json.dumps([(document_id, word_index + offset) for document_id, word_index in starts])
+            starts = [(document_id, word_index - offset)
+                      for document_id, word_index in self._db.execute(queries.NGRAM_POSTINGS_AT,
+                                                                      (positions, trigrams[offset][0]))]
+
+        return sorted(starts)
+
+    def find_phrase(self, phrase_id):
+        # Like the search_phrase script: (document_id, sentence, start_index, end_index) of every appearance
+        word_ids = [word_id for word_id, in self._db.execute(queries.PHRASE_WORD_IDS, (phrase_id,))]
+        if len(word_ids) < NGRAM_SIZES[0]:
+            return None
+
+        starts = json.dumps(self.find(word_ids))
+        return self._db.execute(queries.PHRASE_POSITIONS_TO_SENTENCES, (len(word_ids), starts)).fetchall()
+
+    def top_ngrams(self, k, n=None):
+        # The most frequent n-grams (of n words, or of any size) as (words, frequency)
+        if n is not None and n not in NGRAM_SIZES:
+            raise ValueError(f"The n-grams have {' or '.join(map(str, NGRAM_SIZES))} words")
+
+        length_filter = {None: "", 2: f"AND third_word_id == {NO_WORD_ID}",
+                         3: f"AND third_word_id != {NO_WORD_ID}"}[n]
+        return [(" ".join(word for word in words if word is not None), frequency)
+                for *words, frequency in self._db.execute(queries.TOP_NGRAMS.format(length_filter=length_filter),
+                                                          (k,))]
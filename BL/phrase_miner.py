@@ -0,0 +1,186 @@
+import json
+import math
+
+import numpy as np
+
+import BL.sql_queries as queries
+
+# language=SQL
+APPEARANCES_IN_DOCUMENT_ORDER = "SELECT document_id, sentence, word_id " \
+                                "FROM word_occurrence " \
+                                "ORDER BY document_id, word_index"
+
+# language=SQL
+MAX_WORD_ID = "SELECT MAX(word_id) " \
+              "FROM word"
+
+# language=SQL
+WORD_IDS_TO_NAMES = "SELECT word_id, name " \
+                    "FROM word " \
+                    "WHERE word_id IN (SELECT value FROM json_each(?))"
+
+MINING_BATCH_SIZE = 100_000
+MAX_PHRASE_WORDS = 3
+
+# The sketch takes SKETCH_DEPTH * 2 ** SKETCH_WIDTH_BITS counters, whatever the size of the corpus
+SKETCH_WIDTH_BITS = 20
+SKETCH_DEPTH = 4
+HEAVY_HITTERS_COUNT = 10_000
+
+MIN_PHRASE_FREQUENCY = 5
+MIN_PHRASE_PMI = 3.0
+MINED_PHRASES_LIMIT = 100
+
+
+class CountMinSketch:
+    """
+    Approximate counts of integer keys in a fixed amount of memory. Every key is counted in one counter of
+    each row, and its estimate is the smallest of them, which is never below its real count.
+    """
+
+    def __init__(self, width_bits=SKETCH_WIDTH_BITS, depth=SKETCH_DEPTH, seed=0):
+        self.width_bits = width_bits
+        self.counters = np.zeros((depth, 1 << width_bits), dtype=np.int64)
+
+        # Multiply-shift hashing, with a random odd multiplier for every row
+        rand = np.random.default_rng(seed)
+        self._multipliers = rand.integers(0, 1 << 62, size=(depth, 1), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._offsets = rand.integers(0, 1 << 63, size=(depth, 1), dtype=np.uint64)
+
+    def _indexes(self, keys):
+        hashes = keys.astype(np.uint64) * self._multipliers + self._offsets
+        return (hashes >> np.uint64(64 - self.width_bits)).astype(np.intp)
+
+    def add(self, keys, counts):
+        for row, indexes in zip(self.counters, self._indexes(keys)):
+            np.add.at(row, indexes, counts)
+
+    def estimate(self, keys):
+        indexes = self._indexes(keys)
+        return self.counters[np.arange(len(self.counters))[:, None], indexes].min(axis=0)
+
+
+def _ngram_keys(appearances, first_new, words_range):
+    """
+    The keys of the bigrams and trigrams inside the sentences of the appearances (document_id, sentence, word_id),
+    which end at first_new or after it. A bigram is first * words_range + second, and a trigram continues it
+    with the third word, so its key is always above the keys of the bigrams.
+    """
+    document_ids, sentences, word_ids = appearances.T
+    next_in_sentence = (document_ids[1:] == document_ids[:-1]) & (sentences[1:] == sentences[:-1])
+    ends = np.arange(1, len(appearances))
+
+    bigrams = word_ids[:-1] * words_range + word_ids[1:]
+    bigrams = bigrams[next_in_sentence & (ends >= first_new)]
+
+    trigrams = (word_ids[:-2] * words_range + word_ids[1:-1]) * words_range + word_ids[2:]
+    trigrams = trigrams[next_in_sentence[:-1] & next_in_sentence[1:] & (ends[1:] >= first_new)]
+
+    return np.concatenate((bigrams, trigrams))
+
+
+def _key_word_ids(key, words_range):
+    word_ids = []
+    while key:
+        key, word_id = divmod(key, words_range)
+        word_ids.append(word_id)
+
+    return word_ids[::-1]
+
+
+class PhraseMiner:
+    """
+    Finds the frequent bigrams and trigrams of the corpus in a single pass over word_occurrence in document order.
+    The n-grams are counted in a count-min sketch, and only the HEAVY_HITTERS_COUNT n-grams with the highest
+    estimates are kept as candidates, so the memory doesn't grow with the corpus (except for a counter per word).
+    """
+
+    def __init__(self, db, width_bits=SKETCH_WIDTH_BITS, depth=SKETCH_DEPTH, candidates_count=HEAVY_HITTERS_COUNT):
+        self._db = db
+        self.sketch = CountMinSketch(width_bits, depth)
+        self.candidates_count = candidates_count
+        self.candidates = np.zeros(0, dtype=np.int64)
+
+        self.words_range = (db.execute(MAX_WORD_ID).fetchone()[0] or 0) + 1
+        if self.words_range ** MAX_PHRASE_WORDS >= 1 << 63:
+            raise ValueError("There are too many words to give every trigram a key")
+
+        self.word_counts = np.zeros(self.words_range, dtype=np.int64)
+
+    def _add_batch(self, keys):
+        keys, counts = np.unique(keys, return_counts=True)
+        self.sketch.add(keys, counts)
+
+        # The estimates only grow, so a candidate that was dropped comes back with all of its count
+        keys = np.union1d(self.candidates, keys)
+        if len(keys) > self.candidates_count:
+            keys = keys[np.argpartition(-self.sketch.estimate(keys), self.candidates_count)[:self.candidates_count]]
+
+        self.candidates = keys
+
+    def count(self, batch_size=MINING_BATCH_SIZE):
+        # The last appearances of every batch start the n-grams that end in the next one
+        previous = np.zeros((0, 3), dtype=np.int64)
+        for rows in self._db.stream(APPEARANCES_IN_DOCUMENT_ORDER, batch_size=batch_size):
+            batch = np.array(rows, dtype=np.int64).reshape(-1, 3)
+            self.word_counts += np.bincount(batch[:, 2], minlength=self.words_range)
+
+            appearances = np.concatenate((previous, batch))
+            self._add_batch(_ngram_keys(appearances, len(previous), self.words_range))
+            previous = appearances[-(MAX_PHRASE_WORDS - 1):]
+
+    def _frequency(self, key, word_ids):
+        # The n-gram index has the exact count, where it is complete
+        if self._db.ngrams is not None and self._db.ngrams.is_complete():
+            ngram = self._db.ngrams.find_ngram(word_ids)
+            return ngram[1] if ngram else 0
+
+        return int(self.sketch.estimate(np.array([key], dtype=np.int64))[0])
+
+    def phrases(self, min_frequency=MIN_PHRASE_FREQUENCY, min_pmi=MIN_PHRASE_PMI, limit=MINED_PHRASES_LIMIT):
+        """
+        The candidates that appear at least min_frequency times, and whose pointwise mutual information
+        (how much more often the words appear together than they would by chance, in bits) is at least min_pmi.
+        Returns (text, word_ids, frequency, pmi) from the most frequent phrase.
+        """
+        total_words = int(self.word_counts.sum())
+        phrases = []
+        for key in self.candidates.tolist():
+            word_ids = _key_word_ids(key, self.words_range)
+            frequency = self._frequency(key, word_ids)
+            if frequency < min_frequency:
+                continue
+
+            expected = math.prod(int(self.word_counts[word_id]) / total_words for word_id in word_ids) * total_words
+            pmi = math.log2(frequency / expected)
+            if pmi >= min_pmi:
+                phrases.append((word_ids, frequency, pmi))
+
+        phrases.sort(key=lambda phrase: (-phrase[1], -phrase[2]))
+        phrases = phrases[:limit]
+
+        phrase_word_ids = {word_id for word_ids, _frequency, _pmi in phrases for word_id in word_ids}
+        names = dict(self._db.execute(WORD_IDS_TO_NAMES, (json.dumps(list(phrase_word_ids)),)))
+        return [(" ".join(names[word_id] for word_id in word_ids), word_ids, frequency, pmi)
+                for word_ids, frequency, pmi in phrases]
+
+
+def mine_phrases(db, min_frequency=MIN_PHRASE_FREQUENCY, min_pmi=MIN_PHRASE_PMI, limit=MINED_PHRASES_LIMIT):
+    miner = PhraseMiner(db)
+    miner.count()
+    return miner.phrases(min_frequency, min_pmi, limit)
+
+
+def insert_mined_phrases(db, phrases):
+    # Phrases that were already added are skipped, returns the ids of the new ones
+    existing_phrases = {phrase_text for phrase_text, _phrase_id in db.execute(queries.ALL_PHRASES)}
+    phrase_ids = []
+    with db.transaction():
+        for text, word_ids, _frequency, _pmi in phrases:
+            if text not in existing_phrases:
+                phrase_id = db.insert_phrase(text, len(word_ids))
+                db.insert_many_word_ids_to_phrase(phrase_id, word_ids)
+                phrase_ids.append(phrase_id)
+
+    db.call_all_callbacks(db.phrase_insert_callbacks)
+    return phrase_ids
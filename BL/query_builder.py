@@ -1,4 +1,4 @@
-def build_query(cols=None, tables=None, group_by=None, order_by=None, **kwargs):
+def build_query(cols=None, tables=None, group_by=None, order_by=None, constraints=None, **kwargs):
 
     assert len(tables)
 
@@ -6,12 +6,14 @@ def build_query(cols=None, tables=None, group_by=None, order_by=None, **kwargs):
     query = f'SELECT {cols_str} FROM '
     query += ' NATURAL JOIN '.join(f'({table})' if ' ' in table else table for table in tables)
 
-    # Apply all filters in the kwargs dict
-    constraints = []
+    # Apply all filters in the kwargs dict, after the constraints that are already in SQL
+    constraints = list(constraints or [])
     for col_name, value in kwargs.items():
         if value not in (None, ''):
             if isinstance(value, str):
                 constraints.append(f'{col_name} LIKE "{value}"')
+            elif isinstance(value, (list, tuple, set)):
+                constraints.append(f'{col_name} IN ({", ".join(map(str, value))})')
             else:
                 constraints.append(f'{col_name} == {value}')
 
@@ -0,0 +1,97 @@
+import heapq
+import itertools
+import math
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def inverse_document_frequency(documents_count, document_frequency):
+    return math.log((documents_count - document_frequency + 0.5) / (document_frequency + 0.5) + 1)
+
+
+class TermPostings:
+    """
+    The documents of a query word, as (document_id, frequency, document length) sorted by document_id.
+    """
+
+    def __init__(self, postings, documents_count, document_frequency, average_length):
+        self.postings = postings
+        self.idf = inverse_document_frequency(documents_count, document_frequency)
+        self.average_length = average_length or 1
+        self.position = 0
+        self._frequencies = None
+
+        # The frequency part of the score is always below k1 + 1
+        self.max_score = self.idf * (BM25_K1 + 1)
+
+    def score(self, frequency, length):
+        normalized_length = 1 - BM25_B + BM25_B * length / self.average_length
+        return self.idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * normalized_length)
+
+    def current_document(self):
+        return self.postings[self.position][0] if self.position < len(self.postings) else None
+
+    def document_score(self, document_id):
+        if self._frequencies is None:
+            self._frequencies = {posting[0]: posting[1:] for posting in self.postings}
+
+        posting = self._frequencies.get(document_id)
+        return self.score(*posting) if posting else 0
+
+
+def top_documents(terms, limit=None):
+    """
+    The documents with the highest BM25 scores for the terms, as (document_id, score) from the best one.
+    With a limit, documents are scored with MaxScore: once the heap of the best documents is full, a term
+    whose documents can't reach its lowest score even with all of the terms below it only has its documents
+    looked up, and a document stops being scored once it can't reach the heap.
+    """
+    if limit is not None and limit < 1:
+        return []
+
+    if limit is None:
+        scores = {}
+        for term in terms:
+            for document_id, frequency, length in term.postings:
+                scores[document_id] = scores.get(document_id, 0) + term.score(frequency, length)
+
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    terms = sorted(terms, key=lambda term: term.max_score)
+    max_scores_below = list(itertools.accumulate(term.max_score for term in terms))
+
+    heap = []
+    threshold = 0
+    first_essential = 0
+    while first_essential < len(terms):
+        # The next document of the essential terms, the only documents that can still reach the heap
+        essential_documents = [term.current_document() for term in terms[first_essential:]]
+        document_id = min((document for document in essential_documents if document is not None), default=None)
+        if document_id is None:
+            break
+
+        score = 0
+        for term in terms[first_essential:]:
+            if term.current_document() == document_id:
+                _document_id, frequency, length = term.postings[term.position]
+                score += term.score(frequency, length)
+                term.position += 1
+
+        for index in range(first_essential - 1, -1, -1):
+            if score + max_scores_below[index] <= threshold:
+                break
+            score += terms[index].document_score(document_id)
+
+        if len(heap) < limit:
+            heapq.heappush(heap, (score, -document_id))
+        elif score > threshold:
+            heapq.heapreplace(heap, (score, -document_id))
+
+        if len(heap) == limit:
+            threshold = heap[0][0]
+            while first_essential < len(terms) and max_scores_below[first_essential] <= threshold:
+                first_essential += 1
+
+    return [(-negative_document_id, score) for score, negative_document_id in sorted(heap, reverse=True)]
+
@@ -0,0 +1,374 @@
+import glob
+import heapq
+import itertools
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import BL.sql_queries as queries
+from BL.Documents_db import ALL_DOCUMENTS_FILTER, DocumentDatabase
+from BL.exceptions import IntegrityError, NonUniqueError
+from Helpers.utils import file_hash
+
+DEFAULT_SHARDS_COUNT = 4
+SHARD_FILENAME = "shard_{index}.sqlite"
+SHARD_FILENAME_REGEX = re.compile(r"shard_(\d+)\.sqlite")
+
+# Aggregates that can be computed for each shard and then merged
+MERGEABLE_AGGREGATE_REGEX = re.compile(r"(COUNT|SUM|MIN|MAX)\((?!\s*DISTINCT\b).*\)", re.IGNORECASE)
+MERGE_AGGREGATES = {
+    "COUNT": sum,
+    "SUM": lambda values: sum(value for value in values if value is not None),
+    "MIN": lambda values: min((value for value in values if value is not None), default=None),
+    "MAX": lambda values: max((value for value in values if value is not None), default=None)
+}
+
+# The statistics of all the documents that are the sum of the statistics of each shard
+SUMMABLE_STATISTICS = ("total_words", "total_letters") + tuple(f"total_{column}" for column in queries.COUNT_COLUMNS)
+
+ORDER_DIRECTION_REGEX = re.compile(r"(.*?)(?:\s+(asc|desc))?", re.IGNORECASE)
+
+
+def _parse_order_by(order_by):
+    orders = []
+    for order in (order_by.split(",") if order_by else []):
+        expression, direction = ORDER_DIRECTION_REGEX.fullmatch(order.strip()).groups()
+        orders.append((expression, (direction or "asc").lower() == "desc"))
+
+    return orders
+
+
+def _sort_rows(rows, orders):
+    # Sort by the last order first, the sort is stable so the earlier orders take precedence.
+    # Like sqlite, NULL values are smaller than any other value.
+    for index, descending in reversed(orders):
+        rows.sort(key=lambda row: (row[index] is not None, row[index]), reverse=descending)
+
+    return rows
+
+
+def _count_distinct_sorted(streams):
+    # Every stream is sorted, so the distinct values of all of them are counted without holding them
+    return sum(1 for _value in itertools.groupby(heapq.merge(*streams)))
+
+
+def _rows(batches):
+    return itertools.chain.from_iterable(batches)
+
+
+class ShardDatabase(DocumentDatabase):
+    """
+    One of the files of a ShardedDocumentDatabase. Its documents get their ids from the sharded database,
+    and its new words are added to the shared vocabulary, so all of the shards have the same word ids.
+    """
+
+    def __init__(self, sharded_db, **kargs):
+        self.sharded_db = sharded_db
+        super().__init__(**kargs)
+
+    def insert_document(self, name, author, path, size, date, content_hash=None, mtime=None, document_id=None):
+        return super().insert_document(name, author, path, size, date, content_hash, mtime,
+                                       document_id if document_id is not None else self.sharded_db.next_document_id())
+
+    def insert_word(self, word):
+        return self.sharded_db.add_words([word])[word]
+
+    def insert_many_words(self, words):
+        self.sharded_db.add_words(words)
+
+
+class ShardedDocumentDatabase:
+    """
+    Splits the documents and their appearances across the database files in a directory.
+    The vocabulary, the groups and the phrases are copied to every shard with the same ids,
+    and the queries run on all of the shards in parallel and are merged to the result of a single database.
+    Writes are done by one thread at a time.
+    """
+
+    def __init__(self, directory, shards_count=None, always_create=False, **db_kwargs):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+        existing_shards = sorted(int(SHARD_FILENAME_REGEX.fullmatch(os.path.basename(path))[1])
+                                 for path in glob.glob(os.path.join(directory, SHARD_FILENAME.format(index="*"))))
+        if existing_shards and not always_create:
+            if shards_count is not None and shards_count != len(existing_shards):
+                raise ValueError(f"The directory has {len(existing_shards)} shards, not {shards_count}")
+            shards_count = len(existing_shards)
+
+        shards_count = shards_count or DEFAULT_SHARDS_COUNT
+        for index in existing_shards[shards_count:]:
+            # Remove the shards that aren't part of the new database
+            self._remove_shard(index)
+
+        self._write_lock = threading.RLock()
+        self._word_ids = {}
+        self._next_document_id = 1
+        self.shards = []
+        for index in range(shards_count):
+            self.shards.append(ShardDatabase(self, db_path=os.path.join(directory, SHARD_FILENAME.format(index=index)),
+                                             always_create=always_create, **db_kwargs))
+
+        # All of the shards have the whole vocabulary
+        self._word_ids = {name: word_id for word_id, name in self.shards[0].all_words()}
+        self._next_word_id = max(self._word_ids.values(), default=0) + 1
+        self._next_document_id = max(shard.execute(queries.MAX_DOCUMENT_ID).fetchone()[0] or 0
+                                     for shard in self.shards) + 1
+
+        self._document_shards = {}
+        for shard in self.shards:
+            self._document_shards.update((document[0], shard) for document in shard.all_documents())
+
+        self._executor = ThreadPoolExecutor(len(self.shards), thread_name_prefix="ShardedDocumentDatabase")
+
+    def _remove_shard(self, index):
+        shard_path = os.path.join(self.directory, SHARD_FILENAME.format(index=index))
+        for path in (shard_path,) + tuple(shard_path + suffix for suffix in DocumentDatabase.WAL_SUFFIXES):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _scatter(self, func, *args, **kwargs):
+        # A shard that this thread is writing to is read here by its writer, which sees the uncommitted writes,
+        # and the other shards are read in parallel by their read connections
+        futures = [None if shard.owns_transaction() else self._executor.submit(func, shard, *args, **kwargs)
+                   for shard in self.shards]
+        return [func(shard, *args, **kwargs) if future is None else future.result()
+                for shard, future in zip(self.shards, futures)]
+
+    def _replicate(self, func, *args):
+        # Run the same insert on every shard, the shards must give it the same id
+        with self._write_lock:
+            ids = [func(shard, *args) for shard in self.shards]
+
+        if len(set(ids)) != 1:
+            raise IntegrityError("The shards are out of sync")
+        return ids[0]
+
+    def next_document_id(self):
+        with self._write_lock:
+            document_id = self._next_document_id
+            self._next_document_id += 1
+            return document_id
+
+    def add_words(self, words):
+        with self._write_lock:
+            new_words = [word for word in dict.fromkeys(words) if word not in self._word_ids]
+            if new_words:
+                words_with_ids = list(zip(new_words, itertools.count(self._next_word_id)))
+                for shard in self.shards:
+                    shard.insert_many_words_with_id(words_with_ids)
+
+                self._word_ids.update(words_with_ids)
+                self._next_word_id += len(new_words)
+
+            return {word: self._word_ids[word] for word in words}
+
+    def _smallest_shard(self):
+        return min(self.shards, key=lambda shard: shard.statistics.general_statistics()["total_size"] or 0)
+
+    def _duplicate_content_shard(self, title, author, path):
+        """
+        A shard only checks the documents it has, so a new document is checked against all of them (including
+        the ones that aren't committed yet) before it is placed. Raises NonUniqueError like the insert of a single
+        database for a document with the same file path, or title and author. Returns the shard with a document
+        that has the same content, which copies its appearances instead of parsing them again.
+        """
+        if not os.path.exists(path):
+            return None
+
+        source = (path, DocumentDatabase.to_title(title), DocumentDatabase.to_title(author))
+        content_hash = file_hash(path)
+        content_shard = None
+        for shard in self.shards:
+            with shard.reading_writer():
+                if shard.execute(queries.DOCUMENT_WITH_SOURCE, source).fetchone():
+                    raise NonUniqueError
+                if content_shard is None and shard.execute(queries.CONTENT_HASH_TO_DOCUMENT_ID,
+                                                           (content_hash,)).fetchone():
+                    content_shard = shard
+
+        return content_shard
+
+    def add_document(self, title, author, path, date):
+        with self._write_lock:
+            shard = self._duplicate_content_shard(title, author, path) or self._smallest_shard()
+            document_id = shard.add_document(title, author, path, date)
+            self._document_shards[document_id] = shard
+            return document_id
+
+    def refresh_documents(self):
+        with self._write_lock:
+            return [document_id for shard in self.shards for document_id in shard.refresh_documents()]
+
+    def insert_words_group(self, name):
+        return self._replicate(DocumentDatabase.insert_words_group, name)
+
+    def insert_word_to_group(self, group_id, word):
+        return self._replicate(DocumentDatabase.insert_word_to_group, group_id, word)
+
+    def add_phrase(self, phrase):
+        return self._replicate(DocumentDatabase.add_phrase, phrase)
+
+    def commit(self):
+        for shard in self.shards:
+            shard.commit()
+
+    def close(self, commit=True):
+        self._executor.shutdown(wait=True)
+        for shard in self.shards:
+            shard.close(commit)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _exc_type, _exc_val, _exc_tb):
+        self.close()
+
+    def all_words(self):
+        return self.shards[0].all_words()
+
+    def all_groups(self):
+        return self.shards[0].all_groups()
+
+    def words_in_group(self, group_id):
+        return self.shards[0].words_in_group(group_id)
+
+    def all_phrases(self):
+        return self.shards[0].all_phrases()
+
+    def words_in_phrase(self, phrase_id):
+        return self.shards[0].words_in_phrase(phrase_id)
+
+    def all_documents(self):
+        return sorted(itertools.chain.from_iterable(self._scatter(DocumentDatabase.all_documents)))
+
+    def search_documents(self, **kwargs):
+        return sorted(itertools.chain.from_iterable(self._scatter(DocumentDatabase.search_documents, **kwargs)))
+
+    def find_phrase(self, phrase_id):
+        return sorted(itertools.chain.from_iterable(self._scatter(DocumentDatabase.find_phrase, phrase_id)))
+
+    def rank_documents(self, query, limit=DocumentDatabase.RANKED_DOCUMENTS_LIMIT):
+        # Every shard scores its documents with the statistics of the whole corpus, the vocabulary is shared
+        word_ids = self.shards[0].query_word_ids(query)
+        shard_statistics = self._scatter(DocumentDatabase.ranking_statistics, word_ids)
+        statistics = (sum(documents_count for documents_count, _length, _frequencies in shard_statistics),
+                      sum(length for _documents_count, length, _frequencies in shard_statistics),
+                      {word_id: sum(frequencies[word_id] for _count, _length, frequencies in shard_statistics)
+                       for word_id in word_ids})
+
+        shard_documents = self._scatter(DocumentDatabase.rank_documents, query, limit, statistics, word_ids)
+        ranked_documents = sorted(itertools.chain.from_iterable(shard_documents), key=lambda item: (-item[1], item[0]))
+        return ranked_documents[:limit] if limit is not None else ranked_documents
+
+    def boolean_search(self, query, scope=DocumentDatabase.DEFAULT_QUERY_SCOPE):
+        # Every document is in one shard, so the matches of the shards don't overlap
+        return sorted(itertools.chain.from_iterable(self._scatter(DocumentDatabase.boolean_search, query, scope)))
+
+    def search_word_appearances(self, cols=None, tables=None, unique_words=False, order_by=None, **kwargs):
+        if not cols:
+            raise ValueError("The columns of a sharded search must be given, to merge the results")
+
+        # Columns that are only needed for merging are added at the end, and removed from the result
+        shard_cols = list(cols)
+        orders = []
+        for expression, descending in _parse_order_by(order_by):
+            if expression not in shard_cols:
+                shard_cols.append(expression)
+            orders.append((shard_cols.index(expression), descending))
+
+        if unique_words and "word_id" not in shard_cols:
+            shard_cols.append("word_id")
+
+        shard_results = self._scatter(DocumentDatabase.search_word_appearances, cols=shard_cols, tables=tables,
+                                      unique_words=unique_words, **kwargs)
+        rows = list(itertools.chain.from_iterable(shard_results))
+
+        if unique_words:
+            rows = self._merge_word_groups(rows, shard_cols)
+
+        return [row[:len(cols)] for row in _sort_rows(rows, orders)]
+
+    @staticmethod
+    def _merge_word_groups(rows, cols):
+        # The word columns are the same in all of the shards, only the aggregates have to be merged
+        aggregates = []
+        for index, col in enumerate(cols):
+            match = MERGEABLE_AGGREGATE_REGEX.fullmatch(col.strip())
+            if match:
+                aggregates.append((index, MERGE_AGGREGATES[match[1].upper()]))
+            elif re.search(r"\b(AVG|COUNT|SUM|MIN|MAX|GROUP_CONCAT|TOTAL)\s*\(", col, re.IGNORECASE):
+                raise ValueError(f"Can't merge {col} from the shards")
+
+        word_id_index = cols.index("word_id")
+        words = {}
+        for row in rows:
+            words.setdefault(row[word_id_index], []).append(row)
+
+        merged_rows = []
+        for word_rows in words.values():
+            merged_row = list(word_rows[0])
+            for index, merge in aggregates:
+                merged_row[index] = merge([row[index] for row in word_rows])
+            merged_rows.append(tuple(merged_row))
+
+        return merged_rows
+
+    def general_statistics(self):
+        shard_statistics = self._scatter(lambda shard: shard.statistics.general_statistics())
+
+        # The groups and phrases are the same in every shard
+        statistics = dict(shard_statistics[0])
+        statistics["documents_count"] = sum(shard["documents_count"] for shard in shard_statistics)
+        sizes = [shard["total_size"] for shard in shard_statistics if shard["total_size"] is not None]
+        statistics["total_size"] = sum(sizes) if sizes else None
+        return statistics
+
+    def document_statistics(self, document_id=None):
+        if document_id is not None:
+            shard = self._document_shards.get(int(document_id))
+            if shard is None:
+                # Like the queries of a single database, the statistics of a missing document are empty
+                return self.shards[0].document_statistics(document_id)
+
+            return shard.document_statistics(document_id)
+
+        return self._corpus_statistics()
+
+    @staticmethod
+    def _shard_totals(shard):
+        statistics = dict(queries.DOCUMENT_STATISTICS)
+        return {name: shard.execute(statistics[name].format(document_id_filter=ALL_DOCUMENTS_FILTER)).fetchone()[0]
+                for name in SUMMABLE_STATISTICS}
+
+    def _merged_distinct_count(self, sql):
+        return _count_distinct_sorted([_rows(shard.stream(sql)) for shard in self.shards])
+
+    def _corpus_statistics(self):
+        shard_totals = self._scatter(self._shard_totals)
+
+        def _total(name):
+            values = [totals[name] for totals in shard_totals if totals[name] is not None]
+            return sum(values) if values else None
+
+        total_words = _total("total_words")
+        total_letters = _total("total_letters")
+        statistics = {
+            "total_words": total_words,
+            "total_unique_words": self._merged_distinct_count(queries.DISTINCT_WORD_IDS),
+            "total_letters": total_letters,
+            "avg_letters_per_word": total_letters / total_words if total_words else None
+        }
+
+        # The statistics of a column group the values of all of the documents together, like the queries
+        for column in queries.COUNT_COLUMNS:
+            values_count = self._merged_distinct_count(queries.DISTINCT_COLUMN_VALUES.format(count_column=column))
+            word_indexes_count = self._merged_distinct_count(queries.DISTINCT_COLUMN_WORD_INDEXES.format(
+                count_column=column, appearances=queries.COUNT_COLUMN_APPEARANCES[column]))
+
+            statistics[f"total_{column}"] = _total(f"total_{column}")
+            statistics[f"words_per_{column}"] = word_indexes_count / values_count if values_count else None
+            statistics[f"letters_per_{column}"] = total_letters / values_count if values_count else None
+
+        return statistics
@@ -0,0 +1,142 @@
+import argparse
+import functools
+import json
+import logging
+import os
+import re
+import time
+from logging.handlers import RotatingFileHandler
+
+from BL.cursors import TimedCursor
+
+DEFAULT_THRESHOLD_MS = 100
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+
+STRING_LITERAL_REGEX = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+NUMBER_LITERAL_REGEX = re.compile(r"\b\d+(\.\d+)?\b")
+WHITESPACE_REGEX = re.compile(r"\s+")
+
+
+def statement_shape(sql):
+    # Replace all the literals with placeholders, so queries built with different values are grouped together
+    shape = STRING_LITERAL_REGEX.sub("?", sql)
+    shape = NUMBER_LITERAL_REGEX.sub("?", shape)
+    return WHITESPACE_REGEX.sub(" ", shape).strip()
+
+
+class SlowQueryLog:
+
+    def __init__(self, log_path, threshold_ms=DEFAULT_THRESHOLD_MS, max_bytes=DEFAULT_MAX_BYTES,
+                 backup_count=DEFAULT_BACKUP_COUNT):
+        self.log_path = log_path
+        self.threshold = threshold_ms / 1000
+
+        handler = RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        handler.setFormatter(logging.Formatter("%(message)s"))
+
+        self._logger = logging.getLogger(f"{__name__}.{os.path.abspath(log_path)}")
+        self._logger.setLevel(logging.INFO)
+        self._logger.propagate = False
+        self._logger.handlers = [handler]
+
+    def execute(self, cursor, sql, parameters=()):
+        start_time = time.perf_counter()
+        cursor.execute(sql, parameters)
+        duration = time.perf_counter() - start_time
+
+        # The rows of a select are only produced when fetched, so the time of its fetches is added as they are
+        # made, without fetching the rows of a stream before the caller asks for them
+        if cursor.description is not None:
+            return TimedCursor(cursor, duration, functools.partial(self._check, cursor.connection, sql, parameters))
+
+        self._check(cursor.connection, sql, parameters, duration, cursor.rowcount)
+        return cursor
+
+    def _check(self, connection, sql, parameters, duration, row_count):
+        if duration >= self.threshold:
+            self._log(connection, sql, parameters, duration, row_count)
+
+    def _log(self, connection, sql, parameters, duration, row_count):
+        try:
+            plan = [row[-1] for row in connection.execute("EXPLAIN QUERY PLAN " + sql, parameters)]
+        except Exception as error:
+            plan = [f"Failed to explain: {error}"]
+
+        self._logger.info(json.dumps({
+            "time": time.time(),
+            "sql": sql,
+            "shape": statement_shape(sql),
+            "parameters": {name: repr(value) for name, value in parameters.items()} if isinstance(parameters, dict)
+            else [repr(parameter) for parameter in parameters],
+            "duration_ms": round(duration * 1000, 3),
+            "rows": row_count,
+            "plan": plan
+        }))
+
+    def close(self):
+        for handler in self._logger.handlers:
+            handler.close()
+        self._logger.handlers = []
+
+
+def _log_files(log_path):
+    # Read the rotated files from the oldest to the newest
+    rotated = []
+    index = 1
+    while os.path.exists(f"{log_path}.{index}"):
+        rotated.append(f"{log_path}.{index}")
+        index += 1
+
+    return list(reversed(rotated)) + ([log_path] if os.path.exists(log_path) else [])
+
+
+def read_log(log_path):
+    for path in _log_files(log_path):
+        with open(path, encoding="utf-8") as log_file:
+            for line in log_file:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def summarize(log_path):
+    shapes = {}
+    for entry in read_log(log_path):
+        summary = shapes.setdefault(entry["shape"], {
+            "shape": entry["shape"],
+            "count": 0,
+            "total_ms": 0,
+            "max_ms": 0,
+            "rows": 0,
+            "plan": entry["plan"]
+        })
+
+        summary["count"] += 1
+        summary["total_ms"] += entry["duration_ms"]
+        summary["rows"] += entry["rows"]
+        if entry["duration_ms"] >= summary["max_ms"]:
+            summary["max_ms"] = entry["duration_ms"]
+            summary["plan"] = entry["plan"]
+
+    return sorted(shapes.values(), key=lambda shape_summary: shape_summary["total_ms"], reverse=True)
+
+
+def print_summary(log_path, top=None):
+    for rank, summary in enumerate(summarize(log_path)[:top], start=1):
+        print(f"#{rank} total {summary['total_ms']:,.1f} ms, "
+              f"{summary['count']:,} calls, "
+              f"avg {summary['total_ms'] / summary['count']:,.1f} ms, "
+              f"max {summary['max_ms']:,.1f} ms, "
+              f"{summary['rows']:,} rows")
+        print(f"    {summary['shape']}")
+        for plan_line in summary["plan"]:
+            print(f"        {plan_line}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rank the statement shapes in a slow query log by total time.")
+    parser.add_argument("log_path")
+    parser.add_argument("--top", type=int, default=None)
+    arguments = parser.parse_args()
+
+    print_summary(arguments.log_path, arguments.top)
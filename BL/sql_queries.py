@@ -1,8 +1,21 @@
 
 # language=SQL
 INSERT_DOCUMENT = """
-INSERT INTO document(title, author, file_path, file_size, creation_date)
-values (?, ?, ?, ?, ?);
+INSERT INTO document(title, author, file_path, file_size, creation_date, content_hash, file_mtime)
+values (?, ?, ?, ?, ?, ?, ?);
+"""
+
+# language=SQL
+INSERT_DOCUMENT_WITH_ID = """
+INSERT INTO document(title, author, file_path, file_size, creation_date, content_hash, file_mtime, document_id)
+values (?, ?, ?, ?, ?, ?, ?, ?);
+"""
+
+# language=SQL
+UPDATE_DOCUMENT_SOURCE = """
+UPDATE document
+SET file_size = ?, file_mtime = ?, content_hash = ?
+WHERE document_id == ?;
 """
 
 # language=SQL
@@ -18,17 +31,168 @@ values (?, ?);
 """
 
 # language=SQL
-INSERT_WORD_APPEARANCE = """
-INSERT INTO word_appearance(document_id, word_id, word_index, paragraph, line, line_index, line_offset, sentence, sentence_index)
-VALUES (?, (SELECT word_id FROM word WHERE name == ?), ?, ?, ?, ?, ?, ?, ?);
+INSERT_WORD_OCCURRENCE = """
+INSERT INTO word_occurrence(document_id, word_id, word_index, line, line_offset, sentence)
+VALUES (?, (SELECT word_id FROM word WHERE name == ?), ?, ?, ?, ?);
+"""
+
+# language=SQL
+INSERT_WORD_ID_OCCURRENCE = """
+INSERT INTO word_occurrence(document_id, word_id, word_index, line, line_offset, sentence)
+VALUES (?, ?, ?, ?, ?, ?);
 """
 
 # language=SQL
-INSERT_WORD_ID_APPEARANCE = """
-INSERT INTO word_appearance(document_id, word_id, word_index, paragraph, line, line_index, line_offset, sentence, sentence_index)
-VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?);
+INSERT_SENTENCE_SPAN = """
+INSERT INTO sentence_span(document_id, sentence, paragraph, first_word_index, last_word_index, start_line, start_line_offset)
+VALUES (?, ?, ?, ?, ?, ?, ?);
 """
 
+# language=SQL
+INSERT_PARAGRAPH_SPAN = """
+INSERT INTO paragraph_span(document_id, paragraph, first_word_index, last_word_index, start_line, start_line_offset)
+VALUES (?, ?, ?, ?, ?, ?);
+"""
+
+# language=SQL
+INSERT_LINE_SPAN = """
+INSERT INTO line_span(document_id, line, first_word_index)
+VALUES (?, ?, ?);
+"""
+
+# language=SQL
+COPY_DOCUMENT_APPEARANCES = (
+    """
+    INSERT INTO word_occurrence(document_id, word_id, word_index, line, line_offset, sentence)
+    SELECT ?, word_id, word_index, line, line_offset, sentence
+    FROM word_occurrence
+    WHERE document_id == ?;
+    """,
+    """
+    INSERT INTO sentence_span(document_id, sentence, paragraph, first_word_index, last_word_index, start_line,
+        start_line_offset)
+    SELECT ?, sentence, paragraph, first_word_index, last_word_index, start_line, start_line_offset
+    FROM sentence_span
+    WHERE document_id == ?;
+    """,
+    """
+    INSERT INTO paragraph_span(document_id, paragraph, first_word_index, last_word_index, start_line,
+        start_line_offset)
+    SELECT ?, paragraph, first_word_index, last_word_index, start_line, start_line_offset
+    FROM paragraph_span
+    WHERE document_id == ?;
+    """,
+    """
+    INSERT INTO line_span(document_id, line, first_word_index)
+    SELECT ?, line, first_word_index
+    FROM line_span
+    WHERE document_id == ?;
+    """
+)
+
+# language=SQL
+DELETE_DOCUMENT_APPEARANCES = tuple(f"DELETE FROM {table} WHERE document_id == ?"
+                                    for table in ("word_occurrence", "sentence_span", "paragraph_span", "line_span"))
+
+# language=SQL
+OBJECT_TYPE = "SELECT type " \
+              "FROM sqlite_master " \
+              "WHERE name == ?"
+
+# The spans of the sentences, paragraphs and lines of the appearances in a table or view with all of their columns
+# language=SQL
+SENTENCE_SPANS = """
+SELECT span.document_id, span.sentence, span.paragraph, span.first_word_index, span.last_word_index,
+    first_word.line AS start_line, first_word.line_offset AS start_line_offset
+FROM
+    (SELECT document_id, sentence, MIN(paragraph) AS paragraph, MIN(word_index) AS first_word_index,
+        MAX(word_index) AS last_word_index
+    FROM {appearances}
+    GROUP BY document_id, sentence) AS span
+    JOIN {appearances} AS first_word
+        ON first_word.document_id == span.document_id AND first_word.word_index == span.first_word_index
+"""
+
+# language=SQL
+PARAGRAPH_SPANS = """
+SELECT span.document_id, span.paragraph, span.first_word_index, span.last_word_index,
+    first_word.line AS start_line, first_word.line_offset AS start_line_offset
+FROM
+    (SELECT document_id, paragraph, MIN(word_index) AS first_word_index, MAX(word_index) AS last_word_index
+    FROM {appearances}
+    GROUP BY document_id, paragraph) AS span
+    JOIN {appearances} AS first_word
+        ON first_word.document_id == span.document_id AND first_word.word_index == span.first_word_index
+"""
+
+# language=SQL
+LINE_SPANS = """
+SELECT document_id, line, MIN(word_index) AS first_word_index
+FROM {appearances}
+GROUP BY document_id, line
+"""
+
+# Moves the appearances of a database from before word_occurrence to it and to the spans of their documents.
+# The view of the appearances is created instead of the table afterwards.
+# language=SQL
+MIGRATE_WORD_APPEARANCES = f"""
+BEGIN;
+
+INSERT INTO word_occurrence(document_id, word_id, word_index, line, line_offset, sentence)
+SELECT document_id, word_id, word_index, line, line_offset, sentence
+FROM word_appearance
+ORDER BY document_id, word_index;
+
+INSERT INTO sentence_span(document_id, sentence, paragraph, first_word_index, last_word_index, start_line, start_line_offset)
+{SENTENCE_SPANS.format(appearances="word_appearance")};
+
+INSERT INTO paragraph_span(document_id, paragraph, first_word_index, last_word_index, start_line, start_line_offset)
+{PARAGRAPH_SPANS.format(appearances="word_appearance")};
+
+INSERT INTO line_span(document_id, line, first_word_index)
+{LINE_SPANS.format(appearances="word_occurrence")};
+
+DROP TABLE word_appearance;
+
+COMMIT;
+
+VACUUM;
+"""
+
+# A read-only database from before word_occurrence can't be migrated, so the tables of the newer queries are
+# computed from its word_appearance table
+# language=SQL
+LEGACY_APPEARANCE_VIEWS = f"""
+CREATE TEMP VIEW IF NOT EXISTS word_occurrence AS
+SELECT document_id, word_index, word_id, line, line_offset, sentence
+FROM main.word_appearance;
+
+CREATE TEMP VIEW IF NOT EXISTS sentence_span AS
+{SENTENCE_SPANS.format(appearances="main.word_appearance")};
+
+CREATE TEMP VIEW IF NOT EXISTS paragraph_span AS
+{PARAGRAPH_SPANS.format(appearances="main.word_appearance")};
+
+CREATE TEMP VIEW IF NOT EXISTS line_span AS
+{LINE_SPANS.format(appearances="main.word_appearance")};
+"""
+
+# A published database from before the frequency tables counts them from its appearances, by the missing table
+LEGACY_FREQUENCY_VIEWS = {
+    "document_term": "CREATE TEMP VIEW IF NOT EXISTS document_term AS "
+                     "SELECT word_id, document_id, COUNT(*) AS frequency "
+                     "FROM main.word_appearance "
+                     "GROUP BY word_id, document_id",
+    "document_length": "CREATE TEMP VIEW IF NOT EXISTS document_length AS "
+                       "SELECT document_id, COUNT(*) AS words_count "
+                       "FROM main.word_appearance "
+                       "GROUP BY document_id",
+    "word_frequency": "CREATE TEMP VIEW IF NOT EXISTS word_frequency AS "
+                      "SELECT word_id, COUNT(*) AS frequency "
+                      "FROM main.word_appearance "
+                      "GROUP BY word_id"
+}
+
 # language=SQL
 INSERT_WORDS_GROUP = """
 INSERT INTO words_group(name)
@@ -67,6 +231,23 @@ ALL_WORDS = "SELECT word_id, name " \
 ALL_DOCUMENTS = "SELECT document_id, title, author, file_path, file_size, STRFTIME(?, creation_date) " \
             "FROM document"
 
+# language=SQL
+ALL_DOCUMENT_SOURCES = "SELECT document_id, file_path, file_size, file_mtime, content_hash " \
+                       "FROM document"
+
+# language=SQL
+CONTENT_HASH_TO_DOCUMENT_ID = "SELECT document_id " \
+                              "FROM document " \
+                              "WHERE content_hash == ? " \
+                              "LIMIT 1"
+
+# The document that a new document with these file path, title and author can't be inserted next to
+# language=SQL
+DOCUMENT_WITH_SOURCE = "SELECT document_id " \
+                       "FROM document " \
+                       "WHERE file_path == ? OR (title == ? AND author == ?) " \
+                       "LIMIT 1"
+
 # language=SQL
 DOCUMENT_ID_TO_TITLE = "SELECT title " \
                    "FROM document " \
@@ -84,7 +265,7 @@ DOCUMENT_ID_TO_PATH = "SELECT file_path " \
 
 # language=SQL
 ALL_DOCUMENT_WORDS = "SELECT word_id, paragraph, sentence, line, line_offset " \
-                 "FROM word_appearance " \
+                 "FROM word_occurrence NATURAL JOIN sentence_span " \
                  "WHERE document_id == ? " \
                  "ORDER BY word_index"
 
@@ -95,13 +276,13 @@ WORD_NAME_TO_ID = "SELECT word_id " \
 
 # language=SQL
 WORD_LOCATION_TO_OFFSET = "SELECT line, line_offset " \
-                          "FROM word_appearance " \
-                          "WHERE document_id == ? AND sentence == ? AND sentence_index == ?"
+                          "FROM sentence_span NATURAL JOIN word_occurrence " \
+                          "WHERE document_id == ? AND sentence == ? AND word_index == first_word_index + ? - 1"
 
 # language=SQL
 WORD_LOCATION_TO_END_OFFSET = "SELECT line, line_offset + length " \
-                              "FROM word_appearance NATURAL JOIN word " \
-                              "WHERE document_id == ? AND sentence == ? AND sentence_index == ?"
+                              "FROM sentence_span NATURAL JOIN word_occurrence NATURAL JOIN word " \
+                              "WHERE document_id == ? AND sentence == ? AND word_index == first_word_index + ? - 1"
 
 # language=SQL
 ALL_GROUPS = "SELECT group_id, name " \
@@ -123,6 +304,10 @@ ALL_WORDS_IN_PHRASE = "SELECT word_id " \
                       "WHERE phrase_id == ? " \
                       "ORDER BY phrase_index"
 
+# language=SQL
+TABLE_COLUMNS = "SELECT name " \
+                "FROM pragma_table_info(?)"
+
 # language=SQL
 DOCUMENTS_COUNT = "SELECT COUNT(document_id) " \
               "FROM document"
@@ -159,30 +344,59 @@ TOTAL_SIZE = "SELECT SUM(file_size) " \
 
 # language=SQL
 TOTAL_WORDS = "SELECT COUNT(word_index) " \
-              "FROM word_appearance " \
+              "FROM word_occurrence " \
               "WHERE document_id {document_id_filter}"
 
+# The statistics of the words read the appearances in the order of the word_occurrence_position index (the unary +
+# keeps the primary key from being used for the documents), which counts the distinct words without sorting them
+# and reads each word once
 # language=SQL
 TOTAL_UNIQUE_WORDS = "SELECT COUNT(DISTINCT word_id) " \
-                     "FROM word_appearance " \
-                     "WHERE document_id {document_id_filter}"
+                     "FROM word_occurrence " \
+                     "WHERE +document_id {document_id_filter}"
 
 # language=SQL
 TOTAL_LETTERS = "SELECT SUM(length) " \
-                "FROM word_appearance NATURAL JOIN word " \
-                "WHERE document_id {document_id_filter}"
+                "FROM word_occurrence NATURAL JOIN word " \
+                "WHERE +document_id {document_id_filter}"
 
 # language=SQL
 AVG_LETTERS_PER_WORD = "SELECT AVG(length) " \
-                       "FROM word_appearance NATURAL JOIN word " \
-                       "WHERE document_id {document_id_filter}"
+                       "FROM word_occurrence NATURAL JOIN word " \
+                       "WHERE +document_id {document_id_filter}"
 
+# The appearances with their paragraphs. Reading the words of each paragraph by a range of the primary key is faster
+# than finding the sentence of every word, and the CROSS JOIN makes sqlite read the paragraphs first.
+# language=SQL
+PARAGRAPH_APPEARANCES = "SELECT word_occurrence.*, paragraph " \
+                        "FROM paragraph_span CROSS JOIN word_occurrence USING (document_id) " \
+                        "WHERE word_index BETWEEN first_word_index AND last_word_index"
+
+# The appearances of a paragraph, read by the range of its words in every document
+# language=SQL
+PARAGRAPH_POSITION_APPEARANCES = "SELECT word_occurrence.*, paragraph " \
+                                 "FROM paragraph_span JOIN word_occurrence USING (document_id) " \
+                                 "WHERE paragraph == {paragraph} " \
+                                 "AND word_index BETWEEN first_word_index AND last_word_index"
+
+# The appearances at an index of their sentence or line, by the primary keys of the words at that index of every one
+SPAN_INDEX_CONSTRAINTS = {
+    "sentence_index": "(document_id, word_index, sentence) IN "
+                      "(SELECT document_id, first_word_index + {index} - 1, sentence FROM sentence_span)",
+    "line_index": "(document_id, word_index, line) IN "
+                  "(SELECT document_id, first_word_index + {index} - 1, line FROM line_span)"
+}
+
+# The appearances at an index of every document
+DOCUMENTS_WORD_INDEX_CONSTRAINT = "(document_id, word_index) IN (SELECT document_id, {word_index} FROM document)"
+
+# Every span has a different value of its column in its document
 # language=SQL
 TOTAL_COLUMN_COUNT = """
 SELECT SUM(count_in_document) 
 FROM 
     (SELECT COUNT(DISTINCT {count_column}) as count_in_document 
-    FROM word_appearance 
+    FROM {count_column}_span 
     WHERE document_id {{document_id_filter}} 
     GROUP BY document_id)
 """
@@ -192,7 +406,7 @@ WORDS_COUNT = """
 SELECT AVG(words_count)
 FROM 
     (SELECT COUNT(DISTINCT word_index) as words_count 
-    FROM word_appearance 
+    FROM {appearances} 
     WHERE document_id {{document_id_filter}} 
     GROUP BY {count_column})
 """
@@ -202,7 +416,646 @@ LETTERS_COUNT = """
 SELECT AVG(letters_count)
 FROM 
     (SELECT SUM(length) as letters_count
-    FROM word_appearance NATURAL JOIN word
+    FROM {appearances} NATURAL JOIN word
     WHERE document_id {{document_id_filter}}
     GROUP BY {count_column})
 """
+
+COUNT_COLUMNS = ("paragraph", "line", "sentence")
+
+# The appearances with each of the count columns
+COUNT_COLUMN_APPEARANCES = {
+    "paragraph": f"({PARAGRAPH_APPEARANCES})",
+    "line": "word_occurrence",
+    "sentence": "word_occurrence"
+}
+
+# The statistics that can be filtered by document, by name
+DOCUMENT_STATISTICS = (
+    ("total_words", TOTAL_WORDS),
+    ("total_unique_words", TOTAL_UNIQUE_WORDS),
+    ("total_letters", TOTAL_LETTERS),
+    ("avg_letters_per_word", AVG_LETTERS_PER_WORD)
+) + tuple(
+    (f"{statistic}_{column}", query.format(count_column=column, appearances=COUNT_COLUMN_APPEARANCES[column]))
+    for column in COUNT_COLUMNS
+    for statistic, query in (("total", TOTAL_COLUMN_COUNT), ("words_per", WORDS_COUNT), ("letters_per", LETTERS_COUNT))
+)
+
+# language=SQL
+GROUP_WORDS_COUNTS = "SELECT group_id, COUNT(DISTINCT word_id) " \
+                     "FROM word_in_group " \
+                     "GROUP BY group_id"
+
+# language=SQL
+PHRASE_WORDS_COUNTS = "SELECT phrase_id, COUNT(DISTINCT word_id) " \
+                      "FROM word_in_phrase " \
+                      "GROUP BY phrase_id"
+
+# The statistics of the whole database, by name
+GENERAL_STATISTICS = (
+    ("documents_count", DOCUMENTS_COUNT),
+    ("groups_count", GROUPS_COUNT),
+    ("avg_words_per_group", AVG_WORDS_PER_GROUP),
+    ("phrases_count", PHRASES_COUNT),
+    ("avg_words_per_phrase", AVG_WORDS_PER_PHRASE),
+    ("total_size", TOTAL_SIZE)
+)
+
+# The CROSS JOIN makes sqlite find the context of each target by a range of the primary key,
+# instead of building an automatic index over all of the appearances
+# language=SQL
+KEYWORD_IN_CONTEXT = """
+SELECT target.document_id, target.word_index, context.word_index, name
+FROM
+    (SELECT document_id, word_index
+    FROM word_occurrence
+    WHERE word_id == ?
+    ORDER BY document_id, word_index
+    LIMIT ?) AS target
+    CROSS JOIN word_occurrence AS context
+        ON context.document_id == target.document_id
+        AND context.word_index BETWEEN target.word_index - ? AND target.word_index + ?
+    JOIN word ON word.word_id == context.word_id
+ORDER BY target.document_id, target.word_index, context.word_index
+"""
+
+# language=SQL
+MAX_DOCUMENT_ID = "SELECT MAX(document_id) " \
+                  "FROM document"
+
+# language=SQL
+DISTINCT_WORD_IDS = "SELECT DISTINCT word_id " \
+                    "FROM word_occurrence " \
+                    "ORDER BY word_id"
+
+# language=SQL
+DISTINCT_COLUMN_VALUES = "SELECT DISTINCT {count_column} " \
+                         "FROM {count_column}_span " \
+                         "ORDER BY {count_column}"
+
+# language=SQL
+DISTINCT_COLUMN_WORD_INDEXES = "SELECT DISTINCT {count_column}, word_index " \
+                               "FROM {appearances} " \
+                               "ORDER BY {count_column}, word_index"
+
+# language=SQL
+ATTACH_DATABASE = "ATTACH DATABASE ? AS {schema}"
+
+# language=SQL
+DETACH_DATABASE = "DETACH DATABASE {schema}"
+
+# language=SQL
+CREATE_MERGE_MAPS = """
+CREATE TEMP TABLE word_map(source_id INTEGER PRIMARY KEY, target_id INTEGER NOT NULL);
+CREATE TEMP TABLE document_map(source_id INTEGER PRIMARY KEY, target_id INTEGER NOT NULL, is_new INTEGER NOT NULL);
+CREATE TEMP TABLE group_map(source_id INTEGER PRIMARY KEY, target_id INTEGER NOT NULL);
+CREATE TEMP TABLE phrase_map(source_id INTEGER PRIMARY KEY, target_id INTEGER NOT NULL, is_new INTEGER NOT NULL);
+"""
+
+# language=SQL
+DROP_MERGE_MAPS = """
+DROP TABLE IF EXISTS temp.word_map;
+DROP TABLE IF EXISTS temp.document_map;
+DROP TABLE IF EXISTS temp.group_map;
+DROP TABLE IF EXISTS temp.phrase_map;
+"""
+
+# language=SQL
+MERGE_WORDS = """
+INSERT OR IGNORE INTO main.word(name, length)
+SELECT name, length
+FROM {schema}.word
+ORDER BY name
+"""
+
+# language=SQL
+MAP_WORDS = """
+INSERT INTO temp.word_map(source_id, target_id)
+SELECT source.word_id, target.word_id
+FROM {schema}.word AS source JOIN main.word AS target ON target.name == source.name
+"""
+
+# Documents with the same title and author, or the same path, are the same document
+# language=SQL
+MAP_DUPLICATE_DOCUMENTS = """
+INSERT INTO temp.document_map(source_id, target_id, is_new)
+SELECT source.document_id, target.document_id, 0
+FROM {schema}.document AS source JOIN main.document AS target
+    ON (target.title == source.title AND target.author == source.author) OR target.file_path == source.file_path
+GROUP BY source.document_id
+"""
+
+# language=SQL
+MAP_NEW_DOCUMENTS = """
+INSERT INTO temp.document_map(source_id, target_id, is_new)
+SELECT document_id,
+    (SELECT IFNULL(MAX(document_id), 0) FROM main.document) + ROW_NUMBER() OVER (ORDER BY document_id),
+    1
+FROM {schema}.document
+WHERE document_id NOT IN (SELECT source_id FROM temp.document_map)
+"""
+
+# language=SQL
+MERGE_DOCUMENTS = """
+INSERT INTO main.document(document_id, title, author, file_path, file_size, creation_date, content_hash, file_mtime)
+SELECT document_map.target_id, title, author, file_path, file_size, creation_date, {content_hash}, {file_mtime}
+FROM {schema}.document JOIN temp.document_map ON document_map.source_id == document.document_id
+WHERE is_new
+"""
+
+# The source may be from before word_occurrence, so its appearances are read from word_appearance
+# language=SQL
+MERGE_WORD_APPEARANCES = """
+INSERT INTO main.word_occurrence(document_id, word_id, word_index, line, line_offset, sentence)
+SELECT document_map.target_id, word_map.target_id, word_index, line, line_offset, sentence
+FROM {schema}.word_appearance AS appearance
+    JOIN temp.document_map ON document_map.source_id == appearance.document_id
+    JOIN temp.word_map ON word_map.source_id == appearance.word_id
+WHERE is_new
+"""
+
+# language=SQL
+MERGE_SPANS = tuple(f"""
+INSERT INTO main.{table}
+SELECT document_map.target_id, {columns}
+FROM ({spans.format(appearances="{schema}.word_appearance")}) AS span
+    JOIN temp.document_map ON document_map.source_id == span.document_id
+WHERE is_new
+""" for table, columns, spans in (
+    ("sentence_span", "sentence, paragraph, first_word_index, last_word_index, start_line, start_line_offset",
+     SENTENCE_SPANS),
+    ("paragraph_span", "paragraph, first_word_index, last_word_index, start_line, start_line_offset", PARAGRAPH_SPANS),
+    ("line_span", "line, first_word_index", LINE_SPANS)
+))
+
+# language=SQL
+MERGE_GROUPS = """
+INSERT OR IGNORE INTO main.words_group(name)
+SELECT name
+FROM {schema}.words_group
+ORDER BY group_id
+"""
+
+# language=SQL
+MAP_GROUPS = """
+INSERT INTO temp.group_map(source_id, target_id)
+SELECT source.group_id, target.group_id
+FROM {schema}.words_group AS source JOIN main.words_group AS target ON target.name == source.name
+"""
+
+# language=SQL
+MERGE_WORDS_IN_GROUPS = """
+INSERT OR IGNORE INTO main.word_in_group(group_id, word_id)
+SELECT group_map.target_id, word_map.target_id
+FROM {schema}.word_in_group AS word_in_group
+    JOIN temp.group_map ON group_map.source_id == word_in_group.group_id
+    JOIN temp.word_map ON word_map.source_id == word_in_group.word_id
+"""
+
+# Phrases with the same text are the same phrase
+# language=SQL
+MAP_DUPLICATE_PHRASES = """
+INSERT INTO temp.phrase_map(source_id, target_id, is_new)
+SELECT source.phrase_id, MIN(target.phrase_id), 0
+FROM {schema}.phrase AS source JOIN main.phrase AS target ON target.phrase_text == source.phrase_text
+GROUP BY source.phrase_id
+"""
+
+# language=SQL
+MAP_NEW_PHRASES = """
+INSERT INTO temp.phrase_map(source_id, target_id, is_new)
+SELECT phrase_id,
+    (SELECT IFNULL(MAX(phrase_id), 0) FROM main.phrase) + ROW_NUMBER() OVER (ORDER BY phrase_id),
+    1
+FROM {schema}.phrase
+WHERE phrase_id NOT IN (SELECT source_id FROM temp.phrase_map)
+"""
+
+# language=SQL
+MERGE_PHRASES = """
+INSERT INTO main.phrase(phrase_id, phrase_text, words_count)
+SELECT phrase_map.target_id, phrase_text, words_count
+FROM {schema}.phrase JOIN temp.phrase_map ON phrase_map.source_id == phrase.phrase_id
+WHERE is_new
+"""
+
+# language=SQL
+MERGE_WORDS_IN_PHRASES = """
+INSERT INTO main.word_in_phrase(phrase_id, word_id, phrase_index)
+SELECT phrase_map.target_id, word_map.target_id, phrase_index
+FROM {schema}.word_in_phrase AS word_in_phrase
+    JOIN temp.phrase_map ON phrase_map.source_id == word_in_phrase.phrase_id
+    JOIN temp.word_map ON word_map.source_id == word_in_phrase.word_id
+WHERE is_new
+"""
+
+# language=SQL
+WORD_ID_APPEARANCES_COUNT = "SELECT COUNT(*) " \
+                            "FROM word_occurrence " \
+                            "WHERE word_id == ?"
+
+# The appearances of a word in the order of the word_occurrence_position index, with the unit of the query
+# language=SQL
+WORD_POSTINGS = "SELECT document_id, {unit}, word_index " \
+                "FROM {appearances} " \
+                "WHERE word_id == ? {documents_filter} " \
+                "ORDER BY document_id, word_index"
+
+# The appearances of a word in spans of (document_id, first word_index, last word_index), read from the
+# word_occurrence_position index at every span
+# language=SQL
+WORD_POSTINGS_IN_SPANS = """
+SELECT DISTINCT document_id, {unit}, word_index
+FROM json_each(?) AS span CROSS JOIN {appearances}
+WHERE word_id == ? AND document_id == span.value ->> 0
+    AND word_index BETWEEN span.value ->> 1 AND span.value ->> 2
+ORDER BY document_id, word_index
+"""
+
+# The terms of a document are counted from its appearances once all of them are inserted
+# language=SQL
+INSERT_DOCUMENT_TERMS = """
+INSERT INTO document_term(word_id, document_id, frequency)
+SELECT word_id, document_id, COUNT(*)
+FROM word_occurrence
+WHERE document_id == ?
+GROUP BY word_id
+"""
+
+# language=SQL
+INSERT_DOCUMENT_LENGTH = """
+INSERT OR REPLACE INTO document_length(document_id, words_count)
+SELECT ?, IFNULL(SUM(frequency), 0)
+FROM document_term
+WHERE document_id == ?
+"""
+
+# language=SQL
+COPY_DOCUMENT_TERMS = """
+INSERT INTO document_term(word_id, document_id, frequency)
+SELECT word_id, ?, frequency
+FROM document_term
+WHERE document_id == ?;
+"""
+
+# language=SQL
+COPY_DOCUMENT_LENGTH = """
+INSERT OR REPLACE INTO document_length(document_id, words_count)
+SELECT ?, words_count
+FROM document_length
+WHERE document_id == ?;
+"""
+
+# The words of a document are added to the frequencies of the corpus after its terms are inserted, and subtracted
+# from them before its terms are deleted
+# language=SQL
+ADD_DOCUMENT_WORD_FREQUENCIES = """
+INSERT INTO word_frequency(word_id, frequency)
+SELECT word_id, frequency
+FROM document_term
+WHERE document_id == ?
+ON CONFLICT(word_id) DO UPDATE SET frequency = word_frequency.frequency + excluded.frequency
+"""
+
+# language=SQL
+SUBTRACT_DOCUMENT_WORD_FREQUENCIES = """
+UPDATE word_frequency
+SET frequency = word_frequency.frequency - document_term.frequency
+FROM document_term
+WHERE document_term.document_id == ? AND document_term.word_id == word_frequency.word_id
+"""
+
+# language=SQL
+DELETE_DOCUMENT_TERMS = "DELETE FROM document_term " \
+                        "WHERE document_id == ?"
+
+# language=SQL
+HAS_UNINDEXED_DOCUMENTS = "SELECT EXISTS(SELECT * FROM word_occurrence) " \
+                          "AND NOT (EXISTS(SELECT * FROM document_length) AND EXISTS(SELECT * FROM word_frequency))"
+
+# language=SQL
+REBUILD_DOCUMENT_TERMS = """
+DELETE FROM document_term;
+DELETE FROM document_length;
+DELETE FROM word_frequency;
+
+INSERT INTO document_term(word_id, document_id, frequency)
+SELECT word_id, document_id, COUNT(*)
+FROM word_occurrence
+GROUP BY word_id, document_id;
+
+INSERT INTO document_length(document_id, words_count)
+SELECT document_id, SUM(frequency)
+FROM document_term
+GROUP BY document_id;
+
+INSERT INTO word_frequency(word_id, frequency)
+SELECT word_id, SUM(frequency)
+FROM document_term
+GROUP BY word_id;
+"""
+
+# language=SQL
+CORPUS_LENGTH = "SELECT COUNT(*), IFNULL(SUM(words_count), 0) " \
+                "FROM document_length"
+
+# language=SQL
+WORD_DOCUMENTS_COUNT = "SELECT COUNT(*) " \
+                       "FROM document_term " \
+                       "WHERE word_id == ?"
+
+# language=SQL
+WORD_DOCUMENT_POSTINGS = "SELECT document_id, frequency, words_count " \
+                         "FROM document_term NATURAL JOIN document_length " \
+                         "WHERE word_id == ? " \
+                         "ORDER BY document_id"
+
+# language=SQL
+MERGE_DOCUMENT_TERMS = """
+INSERT INTO main.document_term(word_id, document_id, frequency)
+SELECT word_map.target_id, document_map.target_id, COUNT(*)
+FROM {schema}.word_appearance AS appearance
+    JOIN temp.document_map ON document_map.source_id == appearance.document_id
+    JOIN temp.word_map ON word_map.source_id == appearance.word_id
+WHERE is_new
+GROUP BY word_map.target_id, document_map.target_id
+"""
+
+# language=SQL
+MERGE_WORD_FREQUENCIES = """
+INSERT INTO main.word_frequency(word_id, frequency)
+SELECT word_id, SUM(frequency)
+FROM main.document_term
+WHERE document_id IN (SELECT target_id FROM temp.document_map WHERE is_new)
+GROUP BY word_id
+ON CONFLICT(word_id) DO UPDATE SET frequency = word_frequency.frequency + excluded.frequency
+"""
+
+# language=SQL
+MERGE_DOCUMENT_LENGTHS = """
+INSERT INTO main.document_length(document_id, words_count)
+SELECT document_map.target_id, COUNT(*)
+FROM {schema}.word_appearance AS appearance
+    JOIN temp.document_map ON document_map.source_id == appearance.document_id
+WHERE is_new
+GROUP BY document_map.target_id
+"""
+
+# The frequencies of the words in the whole corpus, or in one document
+# language=SQL
+TOP_WORDS = """
+SELECT word_id, length, name, frequency
+FROM {frequencies} NATURAL JOIN word
+WHERE frequency > 0 {constraints}
+ORDER BY {order}
+LIMIT ?
+"""
+
+# language=SQL
+TOP_DOCUMENTS_FOR_WORD = "SELECT document_id, frequency " \
+                         "FROM document_term " \
+                         "WHERE word_id == ? " \
+                         "ORDER BY frequency DESC, document_id " \
+                         "LIMIT ?"
+
+# The n-grams of the documents, before they are counted and given ids. The third word of a bigram is 0.
+# language=SQL
+CREATE_NGRAM_STAGING = "CREATE TEMP TABLE IF NOT EXISTS ngram_staging(" \
+                       "document_id INTEGER, word_index INTEGER, " \
+                       "first_word_id INTEGER, second_word_id INTEGER, third_word_id INTEGER)"
+
+# language=SQL
+INSERT_NGRAM_STAGING = "INSERT INTO temp.ngram_staging(document_id, word_index, first_word_id, second_word_id, " \
+                       "third_word_id) " \
+                       "VALUES (?, ?, ?, ?, ?)"
+
+# language=SQL
+STAGE_UNINDEXED_NGRAMS = """
+INSERT INTO temp.ngram_staging(document_id, word_index, first_word_id, second_word_id, third_word_id)
+WITH sentence_words AS (
+    SELECT document_id, word_index, word_id,
+        LEAD(word_id) OVER sentence AS second_word_id,
+        LEAD(word_id, 2) OVER sentence AS third_word_id
+    FROM word_occurrence
+    WHERE document_id NOT IN (SELECT document_id FROM ngram_document)
+    WINDOW sentence AS (PARTITION BY document_id, sentence ORDER BY word_index)
+)
+SELECT document_id, word_index, word_id, second_word_id, 0
+FROM sentence_words
+WHERE second_word_id IS NOT NULL
+UNION ALL
+SELECT document_id, word_index, word_id, second_word_id, third_word_id
+FROM sentence_words
+WHERE third_word_id IS NOT NULL
+"""
+
+# language=SQL
+INSERT_STAGED_NGRAMS = """
+INSERT INTO ngram(first_word_id, second_word_id, third_word_id, frequency)
+SELECT first_word_id, second_word_id, third_word_id, COUNT(*)
+FROM temp.ngram_staging
+WHERE true
+GROUP BY first_word_id, second_word_id, third_word_id
+ON CONFLICT(first_word_id, second_word_id, third_word_id) DO UPDATE SET frequency = frequency + excluded.frequency
+"""
+
+# language=SQL
+INSERT_STAGED_NGRAM_APPEARANCES = """
+INSERT INTO ngram_appearance(ngram_id, document_id, word_index)
+SELECT ngram_id, staging.document_id, staging.word_index
+FROM temp.ngram_staging AS staging JOIN ngram USING(first_word_id, second_word_id, third_word_id)
+"""
+
+# language=SQL
+CLEAR_NGRAM_STAGING = "DELETE FROM temp.ngram_staging"
+
+# language=SQL
+INSERT_NGRAM_DOCUMENT = "INSERT OR IGNORE INTO ngram_document(document_id) " \
+                        "VALUES (?)"
+
+# language=SQL
+INSERT_UNINDEXED_NGRAM_DOCUMENTS = "INSERT INTO ngram_document(document_id) " \
+                                   "SELECT document_id " \
+                                   "FROM document " \
+                                   "WHERE document_id NOT IN (SELECT document_id FROM ngram_document)"
+
+# language=SQL
+HAS_UNINDEXED_NGRAM_DOCUMENTS = "SELECT EXISTS(SELECT * " \
+                                "FROM document " \
+                                "WHERE document_id NOT IN (SELECT document_id FROM ngram_document))"
+
+# language=SQL
+WORD_NAMES_TO_IDS = "SELECT name, word_id " \
+                    "FROM word " \
+                    "WHERE name IN (SELECT value FROM json_each(?))"
+
+# language=SQL
+COPY_DOCUMENT_NGRAMS = "INSERT INTO ngram_appearance(ngram_id, document_id, word_index) " \
+                       "SELECT ngram_id, ?, word_index " \
+                       "FROM ngram_appearance " \
+                       "WHERE document_id == ?"
+
+# Adds (or with a sign of -1, removes) the n-grams of a document to the frequencies
+# language=SQL
+ADD_DOCUMENT_NGRAM_FREQUENCIES = """
+UPDATE ngram SET frequency = frequency + ? * document_ngrams.count
+FROM (SELECT ngram_id, COUNT(*) AS count FROM ngram_appearance WHERE document_id == ? GROUP BY ngram_id) AS document_ngrams
+WHERE ngram.ngram_id == document_ngrams.ngram_id
+"""
+
+# language=SQL
+DELETE_DOCUMENT_NGRAMS = "DELETE FROM ngram_appearance " \
+                         "WHERE document_id == ?"
+
+# language=SQL
+DELETE_NGRAM_DOCUMENT = "DELETE FROM ngram_document " \
+                        "WHERE document_id == ?"
+
+# language=SQL
+NGRAM_ID = "SELECT ngram_id, frequency " \
+           "FROM ngram " \
+           "WHERE first_word_id == ? AND second_word_id == ? AND third_word_id == ?"
+
+# language=SQL
+NGRAM_POSTINGS = "SELECT document_id, word_index " \
+                 "FROM ngram_appearance " \
+                 "WHERE ngram_id == ? " \
+                 "ORDER BY document_id, word_index"
+
+# The positions of (document_id, word_index) where the n-gram appears
+# language=SQL
+NGRAM_POSTINGS_AT = """
+SELECT document_id, word_index
+FROM json_each(?) AS position CROSS JOIN ngram_appearance
+WHERE ngram_id == ? AND document_id == position.value ->> 0 AND word_index == position.value ->> 1
+"""
+
+# language=SQL
+PHRASE_WORD_IDS = "SELECT word_id " \
+                  "FROM word_in_phrase " \
+                  "WHERE phrase_id == ? " \
+                  "ORDER BY phrase_index"
+
+# The sentence locations of phrases that start at the positions of (document_id, word_index)
+# language=SQL
+PHRASE_POSITIONS_TO_SENTENCES = """
+SELECT document_id, sentence, word_index - first_word_index + 1 AS sentence_index,
+    word_index - first_word_index + ? AS end_index
+FROM json_each(?) AS position CROSS JOIN word_occurrence NATURAL JOIN sentence_span
+WHERE word_index == position.value ->> 1 AND document_id == position.value ->> 0
+ORDER BY document_id, sentence, sentence_index
+"""
+
+# language=SQL
+TOP_NGRAMS = """
+SELECT first_word.name, second_word.name, third_word.name, frequency
+FROM ngram
+    JOIN word AS first_word ON first_word.word_id == first_word_id
+    JOIN word AS second_word ON second_word.word_id == second_word_id
+    LEFT JOIN word AS third_word ON third_word.word_id == third_word_id
+WHERE frequency > 0 {length_filter}
+ORDER BY frequency DESC
+LIMIT ?
+"""
+
+# language=SQL
+ADD_WORD_COOCCURRENCE = "INSERT INTO word_cooccurrence(word_id, other_word_id, count) " \
+                        "VALUES (?, ?, ?) " \
+                        "ON CONFLICT(word_id, other_word_id) DO UPDATE SET count = count + excluded.count"
+
+# language=SQL
+ADD_COOCCURRENCE_WORD = "INSERT INTO cooccurrence_word(word_id, count) " \
+                        "VALUES (?, ?) " \
+                        "ON CONFLICT(word_id) DO UPDATE SET count = count + excluded.count"
+
+# language=SQL
+INSERT_COOCCURRENCE_DOCUMENT = "INSERT OR REPLACE INTO cooccurrence_document(document_id, window) " \
+                               "VALUES (?, ?)"
+
+# language=SQL
+COOCCURRENCE_DOCUMENT_WINDOW = "SELECT window " \
+                               "FROM cooccurrence_document " \
+                               "WHERE document_id == ?"
+
+# language=SQL
+DELETE_COOCCURRENCE_DOCUMENT = "DELETE FROM cooccurrence_document " \
+                               "WHERE document_id == ?"
+
+# language=SQL
+HAS_OTHER_COOCCURRENCE_WINDOW = "SELECT EXISTS(SELECT * " \
+                                "FROM cooccurrence_document " \
+                                "WHERE window != ?)"
+
+# language=SQL
+CLEAR_COOCCURRENCES = """
+DELETE FROM word_cooccurrence;
+DELETE FROM cooccurrence_word;
+DELETE FROM cooccurrence_document;
+"""
+
+# language=SQL
+HAS_UNINDEXED_COOCCURRENCE_DOCUMENTS = "SELECT EXISTS(SELECT * " \
+                                       "FROM document " \
+                                       "WHERE document_id NOT IN (SELECT document_id FROM cooccurrence_document))"
+
+# language=SQL
+UNINDEXED_COOCCURRENCE_APPEARANCES = "SELECT document_id, sentence, word_id " \
+                                     "FROM word_occurrence " \
+                                     "WHERE document_id NOT IN (SELECT document_id FROM cooccurrence_document) " \
+                                     "ORDER BY document_id, word_index"
+
+# language=SQL
+DOCUMENT_SENTENCE_WORDS = "SELECT document_id, sentence, word_id " \
+                          "FROM word_occurrence " \
+                          "WHERE document_id == ? " \
+                          "ORDER BY word_index"
+
+# language=SQL
+INSERT_UNINDEXED_COOCCURRENCE_DOCUMENTS = "INSERT INTO cooccurrence_document(document_id, window) " \
+                                          "SELECT document_id, ? " \
+                                          "FROM document " \
+                                          "WHERE document_id NOT IN (SELECT document_id FROM cooccurrence_document)"
+
+# language=SQL
+COOCCURRENCE_WORD_COUNT = "SELECT count " \
+                          "FROM cooccurrence_word " \
+                          "WHERE word_id == ?"
+
+# language=SQL
+COOCCURRENCES_TOTAL = "SELECT SUM(count) " \
+                      "FROM cooccurrence_word"
+
+# The words that appear near a word, with the number of times they appear near it and near any word
+# language=SQL
+WORD_COOCCURRENCES = "SELECT name, word_cooccurrence.count, cooccurrence_word.count " \
+                     "FROM word_cooccurrence " \
+                     "JOIN word ON word.word_id == other_word_id " \
+                     "JOIN cooccurrence_word ON cooccurrence_word.word_id == other_word_id " \
+                     "WHERE word_cooccurrence.word_id == ? AND word_cooccurrence.count >= ?"
+
+# language=SQL
+HAS_WORDS_WITHOUT_ENDINGS = "SELECT EXISTS(SELECT * " \
+                            "FROM word " \
+                            "WHERE reversed_name IS NULL)"
+
+# language=SQL
+UPDATE_WORD_ENDINGS = "UPDATE word SET reversed_name = REVERSE(name), rhyme_key = RHYME_KEY(name) " \
+                      "WHERE reversed_name IS NULL"
+
+# language=SQL
+WORDS_IN_REVERSED_RANGE = "SELECT word_id " \
+                          "FROM word " \
+                          "WHERE reversed_name >= ? AND reversed_name < ?"
+
+# language=SQL
+WORDS_WITH_RHYME_KEY = "SELECT word_id, name " \
+                       "FROM word " \
+                       "WHERE rhyme_key == ? AND name != ? " \
+                       "ORDER BY reversed_name"
+
+# language=SQL
+WORDS_WITH_REVERSED_PREFIX = "SELECT word_id, name " \
+                             "FROM word " \
+                             "WHERE reversed_name >= ? AND reversed_name < ? AND name != ? " \
+                             "ORDER BY reversed_name"
@@ -0,0 +1,115 @@
+import math
+
+import BL.sql_queries as queries
+
+
+def _average(total, count):
+    return total / count if count else None
+
+
+class StatisticsStore:
+    """
+    The general statistics of a database, updated on every insert instead of being queried again.
+    While the values are invalid the updates are ignored, and the values are rebuilt from the database
+    when they are read. They start invalid, and become invalid after anything that the updates can't
+    follow (like a rollback).
+    """
+
+    def __init__(self, db):
+        self._db = db
+        self._valid = False
+
+        self.documents_count = 0
+        self.total_size = 0
+        self.groups_count = 0
+        self.phrases_count = 0
+
+        # The distinct words of each group and phrase that has words, like the GROUP BY of the queries
+        self.group_words_counts = {}
+        self.group_words_total = 0
+        self.phrase_words_counts = {}
+        self.phrase_words_total = 0
+
+    def invalidate(self):
+        self._valid = False
+
+    def rebuild(self):
+        # A pooled connection may read a snapshot from before the writes that are already counted (or are being
+        # made by another thread), which would stay in the values, so they are read from the writer
+        with self._db.reading_writer():
+            self.documents_count = self._db.execute(queries.DOCUMENTS_COUNT).fetchone()[0]
+            self.total_size = self._db.execute(queries.TOTAL_SIZE).fetchone()[0] or 0
+            self.groups_count = self._db.execute(queries.GROUPS_COUNT).fetchone()[0]
+            self.phrases_count = self._db.execute(queries.PHRASES_COUNT).fetchone()[0]
+
+            self.group_words_counts = dict(self._db.execute(queries.GROUP_WORDS_COUNTS).fetchall())
+            self.group_words_total = sum(self.group_words_counts.values())
+            self.phrase_words_counts = dict(self._db.execute(queries.PHRASE_WORDS_COUNTS).fetchall())
+            self.phrase_words_total = sum(self.phrase_words_counts.values())
+
+            self._valid = True
+
+    def document_inserted(self, size):
+        if self._valid:
+            self.documents_count += 1
+            self.total_size += size
+
+    def document_size_changed(self, old_size, new_size):
+        if self._valid:
+            self.total_size += new_size - old_size
+
+    def group_inserted(self):
+        if self._valid:
+            self.groups_count += 1
+
+    def group_words_inserted(self, group_id, words_count):
+        # The primary key of word_in_group makes every inserted word a new distinct word of the group
+        if words_count and self._valid:
+            self.group_words_counts[group_id] = self.group_words_counts.get(group_id, 0) + words_count
+            self.group_words_total += words_count
+
+    def phrase_inserted(self):
+        if self._valid:
+            self.phrases_count += 1
+
+    def phrase_words_inserted(self, phrase_words):
+        if not self._valid:
+            return
+
+        distinct_words = {}
+        for phrase_id, word in phrase_words:
+            distinct_words.setdefault(phrase_id, set()).add(word)
+
+        for phrase_id, words in distinct_words.items():
+            # The words that were already in the phrase aren't kept, so their overlap with the new words is unknown
+            if phrase_id in self.phrase_words_counts:
+                self.invalidate()
+                return
+
+            self.phrase_words_counts[phrase_id] = len(words)
+            self.phrase_words_total += len(words)
+
+    def general_statistics(self):
+        if not self._valid:
+            self.rebuild()
+
+        return {
+            "documents_count": self.documents_count,
+            "groups_count": self.groups_count,
+            "avg_words_per_group": _average(self.group_words_total, len(self.group_words_counts)),
+            "phrases_count": self.phrases_count,
+            "avg_words_per_phrase": _average(self.phrase_words_total, len(self.phrase_words_counts)),
+            "total_size": self.total_size if self.documents_count else None
+        }
+
+    def verify(self):
+        # Compare against the queries, returns the names of the statistics that don't match
+        statistics = self.general_statistics()
+        mismatches = []
+        for name, query in queries.GENERAL_STATISTICS:
+            expected = self._db.execute(query).fetchone()[0]
+            if expected != statistics[name] and \
+                    (expected is None or statistics[name] is None or not math.isclose(expected, statistics[name])):
+                mismatches.append(name)
+
+        return mismatches
@@ -0,0 +1,88 @@
+import bisect
+import itertools
+import re
+import threading
+
+from BL.fuzzy_words import WORDS_AFTER_ID
+from Helpers.word_endings import prefix_range
+
+REGEX_SPECIAL_CHARACTERS = ".^$*+?{}[]\\|()"
+
+# Quantifiers that allow the letter before them to be missing
+OPTIONAL_QUANTIFIERS = "*?{"
+
+
+def literal_prefix(pattern):
+    """
+    The letters that every word matching the pattern (from its start) begins with, like "un" of "un.*able" or
+    "a" of "ab?c", or an empty string if there are none.
+    """
+    # An alternative at the top of the pattern may start with anything
+    if re.search(r"(?<!\\)(?:\\\\)*\|", pattern):
+        return ""
+
+    prefix = []
+    i = 1 if pattern.startswith("^") else 0
+    while i < len(pattern):
+        letter = pattern[i]
+        if letter == "\\" and i + 1 < len(pattern) and not pattern[i + 1].isalnum():
+            # An escaped special character is a literal
+            i += 1
+            letter = pattern[i]
+        elif letter in REGEX_SPECIAL_CHARACTERS:
+            if letter in OPTIONAL_QUANTIFIERS and prefix:
+                prefix.pop()
+            break
+
+        prefix.append(letter)
+        i += 1
+
+    return "".join(prefix).lower()
+
+
+class VocabularyRegex:
+    """
+    The names of all of the words, sorted in an in-memory list, for matching regular expressions against the
+    vocabulary without calling Python for every row of a query. A pattern that begins with letters is only
+    matched against the range of the names that start with them. It is loaded on the first search, and the words
+    that were inserted since then are merged into it on the next searches.
+    """
+
+    def __init__(self, db):
+        self._db = db
+        self._lock = threading.Lock()
+        self.invalidate()
+
+    def invalidate(self):
+        # Also called after a rollback, whose word ids are used again by the next inserted words
+        with self._lock:
+            self._last_word_id = 0
+            self.names = []
+            self.word_ids = []
+
+    def update(self):
+        new_words = self._db.execute(WORDS_AFTER_ID, (self._last_word_id,)).fetchall()
+        if not new_words:
+            return
+
+        self._last_word_id = new_words[-1][0]
+        words = sorted(itertools.chain(zip(self.names, self.word_ids),
+                                       ((name, word_id) for word_id, name in new_words)))
+        self.names = [name for name, _word_id in words]
+        self.word_ids = [word_id for _name, word_id in words]
+
+    def matching_word_ids(self, pattern):
+        # The ids of the words that fully match the pattern, ignoring case. Raises re.error for invalid patterns.
+        regex = re.compile(pattern, re.IGNORECASE)
+        prefix = literal_prefix(pattern)
+
+        with self._lock:
+            self.update()
+            names, word_ids = self.names, self.word_ids
+
+        start, end = 0, len(names)
+        if prefix:
+            low, high = prefix_range(prefix)
+            start, end = bisect.bisect_left(names, low), bisect.bisect_left(names, high)
+
+        return list(itertools.compress(word_ids[start:end], map(regex.fullmatch, names[start:end])))
@@ -0,0 +1,103 @@
+import threading
+
+import numpy as np
+
+# language=SQL
+GROUP_WORD_IDS = "SELECT word_id " \
+                 "FROM word_in_group " \
+                 "WHERE group_id == ?"
+
+# language=SQL
+ANY_GROUP_WORD_IDS = "SELECT DISTINCT word_id " \
+                     "FROM word_in_group"
+
+# language=SQL
+DOCUMENT_WORD_IDS = "SELECT word_id " \
+                    "FROM document_term " \
+                    "WHERE document_id == ? AND frequency > 0"
+
+# The key of the words that are in any group
+ANY_GROUP = "%"
+
+
+def to_bitmap(word_ids):
+    # A set of word ids as an int, with the bit of every id set
+    word_ids = np.fromiter(word_ids, dtype=np.int64)
+    if not len(word_ids):
+        return 0
+
+    bits = np.zeros(int(word_ids.max()) + 1, dtype=np.uint8)
+    bits[word_ids] = 1
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+
+
+def from_bitmap(bitmap):
+    # The word ids of a bitmap, in increasing order
+    bits = np.unpackbits(np.frombuffer(bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little"), dtype=np.uint8),
+                         bitorder="little")
+    return np.flatnonzero(bits).tolist()
+
+
+class WordSets:
+    """
+    The word ids of every group and document as bitmaps, so the words of a combination of filters are found by
+    intersecting them in memory instead of joining word_in_group in every query. A bitmap is read the first
+    time it is used, and dropped when the words of its group or document change (or everything is, after
+    anything that the updates can't follow, like a rollback).
+    """
+
+    def __init__(self, db):
+        self._db = db
+        self._lock = threading.Lock()
+        self._groups = {}
+        self._documents = {}
+
+        # Counts the changes, so a bitmap that was read while its words changed isn't kept
+        self._version = 0
+
+    def invalidate(self):
+        with self._lock:
+            self._groups = {}
+            self._documents = {}
+            self._version += 1
+
+    def group_words_inserted(self, group_id):
+        with self._lock:
+            self._groups.pop(group_id, None)
+            self._groups.pop(ANY_GROUP, None)
+            self._version += 1
+
+    def document_changed(self, document_id):
+        with self._lock:
+            self._documents.pop(document_id, None)
+            self._version += 1
+
+    def _bitmap(self, bitmaps, key, query, parameters=()):
+        with self._lock:
+            bitmap = bitmaps.get(key)
+            version = self._version
+        if bitmap is None:
+            bitmap = to_bitmap(word_id for word_id, in self._db.execute(query, parameters))
+            with self._lock:
+                if version == self._version:
+                    bitmaps[key] = bitmap
+
+        return bitmap
+
+    def group(self, group_id):
+        # The words of the group, or of any group for "%"
+        if group_id == ANY_GROUP:
+            return self._bitmap(self._groups, group_id, ANY_GROUP_WORD_IDS)
+        return self._bitmap(self._groups, group_id, GROUP_WORD_IDS, (group_id,))
+
+    def document(self, document_id):
+        return self._bitmap(self._documents, document_id, DOCUMENT_WORD_IDS, (document_id,))
+
+    def word_ids(self, group_id=None, document_id=None):
+        # The ids of the words in both the group and the document, of the ones that are given
+        bitmap = self.group(group_id) if group_id is not None else None
+        if document_id is not None:
+            document_bitmap = self.document(document_id)
+            bitmap = document_bitmap if bitmap is None else bitmap & document_bitmap
+
+        return from_bitmap(bitmap) if bitmap is not None else None
@@ -25,7 +25,7 @@ def export_documents(db):  # type: (DocumentDatabase) -> Element
 
     for document_id, name, author, path, size, date in db.all_documents(date_format=XML_DATE_FORMAT):
         document = SubElement(documents, "document")
-        SubElement(document, "name").text = name
+        SubElement(document, "title").text = name
         SubElement(document, "author").text = author
         SubElement(document, "path").text = path
         SubElement(document, "size").text = str(size)
@@ -1,4 +1,5 @@
 
+import os
 from datetime import datetime
 from itertools import count
 from xml.etree.ElementTree import ElementTree, Element
@@ -8,7 +9,7 @@ from lxml import etree
 from BL.Documents_db import DocumentDatabase
 from Helpers.constants import XML_DATE_FORMAT
 
-SCHEMA_FILENAME = r"BL\xml\schema.xsd"
+SCHEMA_FILENAME = os.path.join("BL", "xml", "schema.xsd")
 
 g_parser = None
 
@@ -69,6 +70,7 @@ def init_documents(db, documents_root):  # type: (DocumentDatabase, Element) ->
 
         # Insert all of the collected appearances
         db.insert_many_word_id_appearances(appearances)
+        db.index_document(document_id)
 
 
 def init_groups(db, groups_root):  # type: (DocumentDatabase, Element) -> None
@@ -84,7 +86,7 @@ def init_groups(db, groups_root):  # type: (DocumentDatabase, Element) -> None
 def init_phrases(db, phrases_root):  # type: (DocumentDatabase, Element) -> None
 
     for phrase in phrases_root:
-        phrase_id = db.insert_phrase(phrase.find("text").text, len(phrase))
+        phrase_id = db.insert_phrase(phrase.find("text").text, len(phrase.findall("wordref")))
         db.insert_many_word_ids_to_phrase(phrase_id, (int(wordref.text) for wordref in phrase.iter("wordref")))
 
 
@@ -101,4 +103,6 @@ def import_db(db, xml_path):  # type: (DocumentDatabase, str) -> None
     init_words(db, root.find("words"))
     init_documents(db, root.find("documents"))
     init_groups(db, root.find("groups"))
-    init_phrases(db, root.find("phrases"))
\ No newline at end of file
+    init_phrases(db, root.find("phrases"))
+
+    db.index_missing_documents()
\ No newline at end of file
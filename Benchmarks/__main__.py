@@ -0,0 +1,86 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+from Benchmarks.compare import DEFAULT_TOLERANCE, baseline_path, compare, load_results, print_comparison, \
+    save_results
+from Benchmarks.corpus import SIZES, generate_corpus
+from Benchmarks.run import DEFAULT_REPEAT, run_benchmarks
+from Benchmarks.tokenizer import EDGE_CASES_TEXT, compare_tokenizers
+
+
+def _run(arguments):
+    results = run_benchmarks(arguments.size, arguments.seed, arguments.repeat, arguments.corpus_dir,
+                             arguments.database)
+
+    if arguments.output:
+        save_results(results, arguments.output)
+    else:
+        print(json.dumps(results, indent=4, sort_keys=True))
+
+    if arguments.save_baseline:
+        save_results(results, baseline_path(arguments.size))
+
+    return 0
+
+
+def _compare(arguments):
+    results = load_results(arguments.results)
+    baseline = load_results(arguments.baseline or baseline_path(results["size"]))
+
+    regressions = compare(results, baseline, arguments.tolerance)
+    print_comparison(results, baseline, regressions)
+    return 1 if regressions else 0
+
+
+def _tokenizer(arguments):
+    with tempfile.TemporaryDirectory() as temp_dir:
+        edge_cases_path = os.path.join(temp_dir, "edge_cases.txt")
+        with open(edge_cases_path, "w", encoding="utf-8") as edge_cases:
+            edge_cases.write(EDGE_CASES_TEXT)
+
+        documents = generate_corpus(os.path.join(temp_dir, "corpus"), arguments.size, arguments.seed)
+        comparison = compare_tokenizers([edge_cases_path] + [path for _title, _author, path in documents])
+
+    for path, expected, actual in comparison["mismatches"]:
+        print(f"Mismatch in {os.path.basename(path)}: expected {expected}, got {actual}")
+
+    print(f"{comparison['tokens']:,} tokens, "
+          f"{comparison['reference_tokens_per_second']:,.0f} -> {comparison['tokens_per_second']:,.0f} tokens/second "
+          f"({comparison['speedup']:.2f}x)")
+    return 1 if comparison["mismatches"] else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m Benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Generate a synthetic corpus and time the database operations.")
+    run_parser.add_argument("--size", choices=SIZES.keys(), default="1MB")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    run_parser.add_argument("--corpus-dir", help="Keep the generated corpus in this directory.")
+    run_parser.add_argument("--database", help="Use a database file instead of an in-memory database.")
+    run_parser.add_argument("--output", help="Write the results to this JSON file.")
+    run_parser.add_argument("--save-baseline", action="store_true", help="Store the results as the size baseline.")
+    run_parser.set_defaults(func=_run)
+
+    compare_parser = commands.add_parser("compare", help="Fail when results regress from a stored baseline.")
+    compare_parser.add_argument("results")
+    compare_parser.add_argument("--baseline", help="Defaults to the stored baseline of the results size.")
+    compare_parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    compare_parser.set_defaults(func=_compare)
+
+    tokenizer_parser = commands.add_parser("tokenizer", help="Check parse_document against the reference tokenizer.")
+    tokenizer_parser.add_argument("--size", choices=SIZES.keys(), default="1MB")
+    tokenizer_parser.add_argument("--seed", type=int, default=0)
+    tokenizer_parser.set_defaults(func=_tokenizer)
+
+    arguments = parser.parse_args()
+    return arguments.func(arguments)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
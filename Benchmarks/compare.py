@@ -0,0 +1,53 @@
+import json
+import os
+
+BASELINES_DIR = os.path.join("Benchmarks", "baselines")
+
+DEFAULT_TOLERANCE = 0.25
+
+# Differences smaller than this are timer noise, even when they are relatively big
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def baseline_path(size):
+    return os.path.join(BASELINES_DIR, f"{size}.json")
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as results_file:
+        return json.load(results_file)
+
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as results_file:
+        json.dump(results, results_file, indent=4, sort_keys=True)
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    regressions = []
+    for name, baseline_time in baseline["metrics"].items():
+        result_time = results["metrics"].get(name)
+        if result_time is None:
+            continue
+
+        if result_time > baseline_time * (1 + tolerance) and result_time - baseline_time > MIN_REGRESSION_SECONDS:
+            regressions.append((name, baseline_time, result_time))
+
+    return regressions
+
+
+def print_comparison(results, baseline, regressions):
+    regressed_names = {name for name, _baseline_time, _result_time in regressions}
+
+    for name, baseline_time in sorted(baseline["metrics"].items()):
+        result_time = results["metrics"].get(name)
+        if result_time is None:
+            print(f"   {name}: missing")
+            continue
+
+        change = (result_time - baseline_time) / baseline_time * 100 if baseline_time else 0
+        mark = "!!" if name in regressed_names else "  "
+        print(f"{mark} {name}: {baseline_time * 1000:,.2f} ms -> {result_time * 1000:,.2f} ms ({change:+.1f}%)")
+
+    print(f"\n{len(regressions)} regression{'s' if len(regressions) != 1 else ''}.")
@@ -0,0 +1,135 @@
+import bisect
+import itertools
+import os
+import random
+
+SIZES = {
+    "1MB": 1024 ** 2,
+    "10MB": 10 * 1024 ** 2,
+    "100MB": 100 * 1024 ** 2,
+    "1GB": 1024 ** 3
+}
+
+MIN_DOCUMENTS = 4
+MAX_DOCUMENT_SIZE = 8 * 1024 ** 2
+VOCABULARY_SIZE = 50000
+ZIPF_EXPONENT = 1.07
+LINE_WIDTH = 70
+
+SYLLABLES = ("ba", "be", "bi", "bo", "ca", "ce", "co", "da", "de", "di", "do", "fa", "fe", "ga", "ge", "go", "ha",
+             "he", "hi", "ja", "ka", "ke", "la", "le", "li", "lo", "ma", "me", "mi", "mo", "na", "ne", "ni", "no",
+             "pa", "pe", "pi", "po", "ra", "re", "ri", "ro", "sa", "se", "si", "so", "ta", "te", "ti", "to", "va",
+             "ve", "vi", "wa", "we", "ya", "za", "th", "sh", "ing", "er", "ed", "ly", "st", "nd")
+
+SENTENCE_ENDINGS = ".", ".", ".", "?", "!"
+
+GUTENBERG_HEADER = "The Project Gutenberg EBook of {title}, by {author}\n" \
+                   "\n" \
+                   "This eBook is for the use of anyone anywhere at no cost and with\n" \
+                   "almost no restrictions whatsoever.\n" \
+                   "\n" \
+                   "Title: {title}\n" \
+                   "\n" \
+                   "Author: {author}\n" \
+                   "\n" \
+                   "Release Date: January 1, 2000 [EBook #{number}]\n" \
+                   "\n" \
+                   "Language: English\n" \
+                   "\n" \
+                   "*** START OF THIS PROJECT GUTENBERG EBOOK {upper_title} ***\n" \
+                   "\n" \
+                   "\n"
+
+GUTENBERG_FOOTER = "\n" \
+                   "\n" \
+                   "*** END OF THIS PROJECT GUTENBERG EBOOK {upper_title} ***\n"
+
+
+class Vocabulary:
+
+    def __init__(self, rand, size=VOCABULARY_SIZE):
+        words = set()
+        while len(words) < size:
+            words.add("".join(rand.choice(SYLLABLES) for _i in range(rand.choice((1, 1, 2, 2, 2, 3, 3, 4)))))
+
+        # Shorter words are usually the more frequent ones
+        self.words = sorted(words, key=lambda word: (len(word), word))
+
+        weights = (1 / rank ** ZIPF_EXPONENT for rank in range(1, size + 1))
+        self.cumulative_weights = list(itertools.accumulate(weights))
+        self.rand = rand
+
+    def sample(self, count):
+        total = self.cumulative_weights[-1]
+        return [self.words[bisect.bisect(self.cumulative_weights, self.rand.random() * total)]
+                for _i in range(count)]
+
+    def name(self, words_count):
+        return " ".join(word.title() for word in self.sample(words_count))
+
+
+def _wrap(words):
+    lines = []
+    line = []
+    line_length = 0
+    for word in words:
+        if line and line_length + len(word) + 1 > LINE_WIDTH:
+            lines.append(" ".join(line))
+            line = []
+            line_length = 0
+        line.append(word)
+        line_length += len(word) + 1
+
+    if line:
+        lines.append(" ".join(line))
+
+    return "\n".join(lines)
+
+
+def _paragraph(vocabulary, rand):
+    words = []
+    for _sentence in range(rand.randint(1, 8)):
+        sentence = vocabulary.sample(rand.randint(4, 25))
+        sentence[0] = sentence[0].title()
+        for index in range(1, len(sentence) - 1):
+            if rand.random() < 0.08:
+                sentence[index] += ","
+
+        sentence[-1] += rand.choice(SENTENCE_ENDINGS)
+        words += sentence
+
+    return _wrap(words)
+
+
+def generate_document(path, vocabulary, rand, size, number):
+    title = f"{vocabulary.name(rand.randint(1, 3))} Volume {number}"
+    author = vocabulary.name(2)
+    upper_title = title.upper()
+
+    with open(path, "w", encoding="utf-8", newline="\n") as document:
+        written = document.write(GUTENBERG_HEADER.format(title=title, author=author, number=number,
+                                                         upper_title=upper_title))
+        while written < size:
+            written += document.write(_paragraph(vocabulary, rand) + "\n\n")
+
+        document.write(GUTENBERG_FOOTER.format(upper_title=upper_title))
+
+    return title, author
+
+
+def generate_corpus(directory, size, seed=0, max_document_size=MAX_DOCUMENT_SIZE):
+    if isinstance(size, str):
+        size = SIZES[size]
+
+    rand = random.Random(seed)
+    vocabulary = Vocabulary(rand)
+    os.makedirs(directory, exist_ok=True)
+
+    documents = []
+    documents_count = max(MIN_DOCUMENTS, -(-size // max_document_size))
+    for number in range(1, documents_count + 1):
+        path = os.path.join(directory, f"document_{seed}_{number}.txt")
+        title, author = generate_document(path, vocabulary, rand, size // documents_count, number)
+        documents.append((title, author, path))
+
+    return documents
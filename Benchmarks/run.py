@@ -0,0 +1,467 @@
+import asyncio
+import functools
+import itertools
+import json
+import math
+import os
+import platform
+import re
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+
+import BL.sql_queries as queries
+from BL.Documents_db import DocumentDatabase
+from BL.async_db import AsyncDocumentDatabase
+from BL.cooccurrence import LOG_LIKELIHOOD_MEASURE, PMI_MEASURE, CooccurrenceIndex
+from BL.ngram_index import NgramIndex
+from BL.phrase_miner import mine_phrases
+from Benchmarks.corpus import generate_corpus
+from Helpers.document_parser import parse_document, probe_directory
+
+DEFAULT_REPEAT = 3
+
+WORD_HEADER_INT_FILTERS = ("paragraph", "sentence", "line", "word_index", "sentence_index", "line_index")
+WORD_HEADER_COLUMNS = ["word_id", "length", "name", "COUNT(word_index)"]
+ALL_DOCUMENTS_FILTER = "> 0"
+
+BENCHMARK_GROUP_NAME = "Benchmark"
+BENCHMARK_GROUP_WORDS = slice(100, 150)
+BENCHMARK_PHRASES_COUNT = 5
+TOP_WORDS_COUNT = 100
+SUFFIX_LETTERS = 2
+TOP_NGRAMS_COUNT = 100
+LONG_PHRASE_WORDS = 6
+
+# Queries of a common, a middle and a rare word
+BOOLEAN_QUERIES = (
+    ("near_not", "{common} NEAR/5 {rare} NOT {middle}"),
+    ("and", "{middle} AND {rare}"),
+    ("or", "{middle} OR {rare}"),
+    ("phrase", '"{common} {rare}"')
+)
+BOOLEAN_QUERY_WORD_RANKS = {"common": 10, "middle": 500, "rare": 5000}
+
+RANKING_QUERIES = (
+    ("rare", "{rare}"),
+    ("common", "{common}"),
+    ("words", "{common} {middle} {rare}")
+)
+
+# The tables of the appearances, and the single table that stored all of their columns before them
+APPEARANCE_TABLES = ("word_occurrence", "sentence_span", "paragraph_span", "line_span")
+LEGACY_APPEARANCE_COLUMNS = ("word_index", "document_id", "word_id", "paragraph", "line", "line_index", "line_offset",
+                             "sentence", "sentence_index")
+
+# language=SQL
+TABLES_BYTES = "SELECT SUM(pgsize) " \
+               "FROM dbstat " \
+               "WHERE name IN (SELECT name FROM sqlite_master WHERE tbl_name IN (SELECT value FROM json_each(?)))"
+
+# language=SQL
+CREATE_LEGACY_APPEARANCES = """
+CREATE TABLE word_appearance (
+    word_index INTEGER NOT NULL,
+    document_id INTEGER NOT NULL,
+    word_id INTEGER NOT NULL,
+    paragraph INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    line_index INTEGER NOT NULL,
+    line_offset INTEGER NOT NULL,
+    sentence INTEGER NOT NULL,
+    sentence_index INTEGER NOT NULL,
+    PRIMARY KEY(word_index, document_id, word_id)
+);
+CREATE INDEX word_appearance_position ON word_appearance(word_id, document_id, word_index);
+"""
+
+# language=SQL
+LEGACY_APPEARANCES = f"SELECT {', '.join(LEGACY_APPEARANCE_COLUMNS)} FROM word_appearance"
+
+# language=SQL
+INSERT_LEGACY_APPEARANCE = f"INSERT INTO word_appearance VALUES ({', '.join('?' * len(LEGACY_APPEARANCE_COLUMNS))})"
+
+# language=SQL
+SCAN_APPEARANCES = "SELECT COUNT(*), SUM(line_offset) FROM {appearances}"
+
+ASYNC_WORKERS = 4
+LOOP_LAG_INTERVAL = 0.001
+
+
+class Benchmark:
+
+    def __init__(self, repeat=DEFAULT_REPEAT):
+        self.repeat = repeat
+        self.metrics = {}
+        self.counters = {}
+
+    def measure(self, metric, func, *args, repeat=None, **kwargs):
+        result = None
+        best_time = None
+
+        # Keep the best run, it is the one least affected by noise
+        for _run in range(repeat or self.repeat):
+            start_time = time.perf_counter()
+            result = func(*args, **kwargs)
+            run_time = time.perf_counter() - start_time
+            best_time = run_time if best_time is None else min(best_time, run_time)
+
+        self.metrics[metric] = best_time
+        return result
+
+
+def _count_tokens(documents):
+    return sum(1 for _title, _author, path in documents for _appr in parse_document(path))
+
+
+def _benchmark_ingest(benchmark, db, documents):
+    benchmark.counters["tokens"] = benchmark.measure("parse_document", _count_tokens, documents, repeat=1)
+    benchmark.counters["tokens_per_second"] = benchmark.counters["tokens"] / benchmark.metrics["parse_document"]
+
+    def _add_documents():
+        return [db.add_document(title, author, path, datetime.now()) for title, author, path in documents]
+
+    document_ids = benchmark.measure("add_document", _add_documents, repeat=1)
+    db.commit()
+    return document_ids
+
+
+def _create_group(db):
+    group_id = db.insert_words_group(BENCHMARK_GROUP_NAME)
+    most_frequent_words = db.search_word_appearances(cols=["name"], tables={"word"}, unique_words=True,
+                                                     order_by="COUNT(word_index) desc")
+
+    for name, in most_frequent_words[BENCHMARK_GROUP_WORDS]:
+        db.insert_word_to_group(group_id, name)
+
+    return group_id
+
+
+def _create_phrases(db, documents):
+    phrase_ids = []
+    sentences = itertools.groupby(parse_document(documents[0][2]), key=lambda appr: appr[6])
+
+    for _sentence, appearances in itertools.islice(sentences, 1, None, 7):
+        words = [appr[0] for appr in appearances]
+        if len(words) >= 4:
+            phrase_ids.append(db.add_phrase(" ".join(words[1:3 + len(phrase_ids) % 2])))
+
+        if len(phrase_ids) == BENCHMARK_PHRASES_COUNT:
+            break
+
+    return phrase_ids
+
+
+def _word_header_filters(document_id, group_id, name_pattern):
+    # All of the filter combinations the words browser can create
+    for document, group, name, int_filter in itertools.product(
+            (None, document_id), (None, "%", group_id), (None, name_pattern), (None,) + WORD_HEADER_INT_FILTERS):
+
+        filters = {"document_id": document, "group_id": group, "name": name}
+        if int_filter:
+            filters[int_filter] = 1
+
+        label = ",".join(
+            f"{filter_name}={'all' if value == '%' else 'set'}"
+            for filter_name, value in filters.items() if value is not None
+        )
+        yield label or "none", filters
+
+
+def _benchmark_word_search(benchmark, db, document_id, group_id):
+    name_pattern = db.all_words()[0][1][0] + "%"
+
+    # The words of the groups and documents are intersected from their bitmaps, without joining word_in_group
+    for label, group in (("group", group_id), ("all_groups", "%")):
+        benchmark.measure(f"word_sets[{label},document,build]",
+                          lambda group=group: (db.word_sets.invalidate(), db.word_sets.word_ids(group, document_id)))
+        benchmark.measure(f"word_sets[{label},document]", db.word_sets.word_ids, group, document_id)
+
+    for label, filters in _word_header_filters(document_id, group_id, name_pattern):
+        benchmark.measure(f"search_word_appearances[{label}]", db.search_word_appearances,
+                          cols=WORD_HEADER_COLUMNS, tables={"word"}, unique_words=True,
+                          order_by=DocumentDatabase.APPEARANCES_ORDER + " desc", **filters)
+        benchmark.measure(f"top_words[{label}]", db.top_words, TOP_WORDS_COUNT, filters)
+
+    # A pattern of the last letters of a word scans the whole vocabulary without the reversed names
+    suffix_word = db.all_words()[0][1]
+    suffix_pattern = "%" + suffix_word[-SUFFIX_LETTERS:]
+    benchmark.measure("search_word_appearances[suffix]", db.search_word_appearances,
+                      cols=WORD_HEADER_COLUMNS, tables={"word"}, unique_words=True,
+                      order_by=DocumentDatabase.APPEARANCES_ORDER + " desc", name=suffix_pattern)
+    benchmark.measure("top_words[suffix]", db.top_words, TOP_WORDS_COUNT, {"name": suffix_pattern})
+    benchmark.measure("rhyming_words", db.rhyming_words, suffix_word)
+
+    # A typo of a word, with its middle letter swapped with the next one
+    middle = len(suffix_word) // 2
+    typo = suffix_word[:middle] + suffix_word[middle + 1:middle + 2] + suffix_word[middle] + suffix_word[middle + 2:]
+    benchmark.measure("similar_words[build]", lambda: (db.fuzzy_words.invalidate(), db.similar_words(typo)))
+    benchmark.measure("similar_words", db.similar_words, typo)
+
+    # A regular expression with a literal prefix is only matched against the names in its range
+    regex_patterns = (("prefix", re.escape(suffix_word[:2]) + ".*[aeiou]"),
+                      ("suffix", ".*" + re.escape(suffix_word[-SUFFIX_LETTERS:])))
+    benchmark.measure("regex_word_ids[load]", lambda: (db.vocabulary_regex.invalidate(), db.regex_word_ids("")))
+    for label, pattern in regex_patterns:
+        benchmark.measure(f"regex_word_ids[{label}]", db.regex_word_ids, pattern)
+        benchmark.measure(f"top_words[regex,{label}]", db.top_words, TOP_WORDS_COUNT, {"name_regex": pattern})
+
+
+def _query_words(db):
+    ranked_words = [name for name, in db.search_word_appearances(
+        cols=["name"], tables={"word"}, unique_words=True, order_by=DocumentDatabase.APPEARANCES_ORDER + " desc")]
+    return {name: ranked_words[min(rank, len(ranked_words) - 1)] for name, rank in BOOLEAN_QUERY_WORD_RANKS.items()}
+
+
+def _benchmark_queries(benchmark, db):
+    words = _query_words(db)
+
+    for label, query in BOOLEAN_QUERIES:
+        for scope in ("document", "sentence"):
+            benchmark.measure(f"boolean_search[{label},{scope}]", db.boolean_search, query.format(**words), scope)
+
+    for label, query in RANKING_QUERIES:
+        benchmark.measure(f"rank_documents[{label}]", db.rank_documents, query.format(**words), 10)
+
+
+def _long_phrase_word_ids(db, documents):
+    sentences = itertools.groupby(parse_document(documents[0][2]), key=lambda appr: appr[6])
+    for _sentence, appearances in sentences:
+        words = [db.to_single_word(appr[0]) for appr in appearances]
+        if len(words) >= LONG_PHRASE_WORDS:
+            return [db.get_word_id(word) for word in words[:LONG_PHRASE_WORDS]]
+
+    return None
+
+
+def _benchmark_ngrams(benchmark, db, documents, phrase_ids):
+    # The index is built from the appearances of the documents that were already added
+    ngrams = NgramIndex(db)
+    benchmark.measure("build_ngram_index", ngrams.index_missing_documents, repeat=1)
+    benchmark.counters["ngrams"] = db.execute("SELECT COUNT(*) FROM ngram").fetchone()[0]
+
+    for phrase_number, phrase_id in enumerate(phrase_ids, start=1):
+        benchmark.measure(f"find_phrase_ngrams[{phrase_number}]", ngrams.find_phrase, phrase_id)
+
+    long_phrase = _long_phrase_word_ids(db, documents)
+    if long_phrase:
+        benchmark.measure("find_ngrams[long]", ngrams.find, long_phrase)
+
+    for n in (2, 3):
+        benchmark.measure(f"top_ngrams[{n}]", ngrams.top_ngrams, TOP_NGRAMS_COUNT, n)
+
+
+def _benchmark_cooccurrences(benchmark, db):
+    cooccurrences = CooccurrenceIndex(db)
+    benchmark.measure("build_cooccurrence_index", cooccurrences.index_missing_documents, repeat=1)
+    benchmark.counters["word_cooccurrences"] = db.execute("SELECT COUNT(*) FROM word_cooccurrence").fetchone()[0]
+
+    for label, word in _query_words(db).items():
+        word_id = db.execute(queries.WORD_NAME_TO_ID, (word,)).fetchone()[0]
+        for measure in (PMI_MEASURE, LOG_LIKELIHOOD_MEASURE):
+            benchmark.measure(f"associated_words[{label},{measure}]", cooccurrences.associated_words, word_id,
+                              measure=measure)
+
+
+def _benchmark_phrase_mining(benchmark, db):
+    benchmark.counters["mined_phrases"] = len(benchmark.measure("mine_phrases", mine_phrases, db, repeat=1))
+
+
+def _benchmark_statistics(benchmark, db, document_id):
+    def _run_query(query):
+        return db.execute(query).fetchall()
+
+    for name, query in queries.GENERAL_STATISTICS:
+        benchmark.measure(f"statistics[{name}]", _run_query, query)
+
+    benchmark.counters["statistics_store_matches_sql"] = not db.statistics.verify()
+    benchmark.measure("statistics_store_rebuild", db.statistics.rebuild)
+    benchmark.measure("statistics_store_read", db.statistics.general_statistics)
+
+    for name, query in queries.DOCUMENT_STATISTICS:
+        benchmark.measure(f"statistics[{name},all]", _run_query,
+                          query.format(document_id_filter=ALL_DOCUMENTS_FILTER))
+        benchmark.measure(f"statistics[{name},document]", _run_query,
+                          query.format(document_id_filter=f"== {document_id}"))
+
+
+def _benchmark_analytics(benchmark, db):
+    # Imported lazily, numpy is only needed for the analytics benchmarks
+    from BL.analytics import CorpusAnalytics
+
+    analytics = benchmark.measure("analytics_load", CorpusAnalytics, db)
+    benchmark.measure("analytics_document_statistics", analytics.document_statistics)
+    benchmark.measure("analytics_corpus_statistics", analytics.corpus_statistics)
+    benchmark.counters["analytics_matches_sql"] = _analytics_matches_sql(db, analytics)
+
+
+def _analytics_matches_sql(db, analytics):
+    document_statistics = analytics.document_statistics()
+    expected_statistics = [(ALL_DOCUMENTS_FILTER, analytics.corpus_statistics())] + [
+        (f"== {document_id}", statistics) for document_id, statistics in document_statistics.items()
+    ]
+
+    for document_id_filter, statistics in expected_statistics:
+        for name, query in queries.DOCUMENT_STATISTICS:
+            result = db.execute(query.format(document_id_filter=document_id_filter)).fetchone()[0]
+            if result != statistics[name] and not math.isclose(result, statistics[name]):
+                return False
+
+    return True
+
+
+def _max_overlap(intervals):
+    # The most calls that were running at the same time
+    events = sorted([(start, 1) for start, _end in intervals] + [(end, -1) for _start, end in intervals])
+    return max(itertools.accumulate(change for _time, change in events), default=0)
+
+
+async def _measure_loop_lag(stop_event, lags):
+    while not stop_event.is_set():
+        start_time = time.perf_counter()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        lags.append(time.perf_counter() - start_time - LOOP_LAG_INTERVAL)
+
+
+async def _run_async_queries(benchmark, async_db, calls):
+    intervals = []
+
+    def _timed(func, *args):
+        start_time = time.perf_counter()
+        result = func(*args)
+        intervals.append((start_time, time.perf_counter()))
+        return result
+
+    async def _sequential():
+        return [await async_db.run(_timed, *call) for call in calls]
+
+    async def _concurrent():
+        return await asyncio.gather(*(async_db.run(_timed, *call) for call in calls))
+
+    for metric, run_calls in (("async_sequential", _sequential), ("async_concurrent", _concurrent)):
+        best_time = None
+        for _run in range(benchmark.repeat):
+            intervals.clear()
+            stop_event = asyncio.Event()
+            lags = []
+            lag_task = asyncio.create_task(_measure_loop_lag(stop_event, lags))
+
+            start_time = time.perf_counter()
+            await run_calls()
+            run_time = time.perf_counter() - start_time
+
+            stop_event.set()
+            await lag_task
+            best_time = run_time if best_time is None else min(best_time, run_time)
+
+        benchmark.metrics[metric] = best_time
+        benchmark.counters[f"{metric}_max_overlap"] = _max_overlap(intervals)
+        benchmark.counters[f"{metric}_loop_max_lag_ms"] = max(lags, default=0) * 1000
+
+
+def _legacy_appearances(db, path):
+    # A copy of the appearances in the layout of the databases from before word_occurrence
+    legacy_db = sqlite3.connect(path)
+    legacy_db.executescript(CREATE_LEGACY_APPEARANCES)
+    for rows in db.stream(LEGACY_APPEARANCES):
+        legacy_db.executemany(INSERT_LEGACY_APPEARANCE, rows)
+    legacy_db.commit()
+    return legacy_db
+
+
+def _benchmark_appearances_storage(benchmark, db, directory):
+    def _run_query(connection, query, parameters=()):
+        return connection.execute(query, parameters).fetchall()
+
+    legacy_db = _legacy_appearances(db, os.path.join(directory, "legacy.db"))
+    try:
+        benchmark.counters["appearances_bytes"] = _run_query(db, TABLES_BYTES, (json.dumps(APPEARANCE_TABLES),))[0][0]
+        benchmark.counters["legacy_appearances_bytes"] = \
+            _run_query(legacy_db, TABLES_BYTES, (json.dumps(["word_appearance"]),))[0][0]
+
+        occurrences = benchmark.measure("scan_appearances[occurrence]", _run_query, db,
+                                        SCAN_APPEARANCES.format(appearances="word_occurrence"))
+        benchmark.measure("scan_appearances[view]", _run_query, db,
+                          SCAN_APPEARANCES.format(appearances="word_appearance"))
+        legacy_occurrences = benchmark.measure("scan_appearances[legacy]", _run_query, legacy_db,
+                                               SCAN_APPEARANCES.format(appearances="word_appearance"))
+        benchmark.counters["appearances_match_legacy"] = occurrences == legacy_occurrences
+    finally:
+        legacy_db.close()
+
+
+def _benchmark_async(benchmark, db, directory, document_id, phrase_ids):
+    # The workers need a database file to get connections of their own
+    database_path = os.path.join(directory, "async.sqlite")
+    db.save_to_file(database_path)
+
+    async_db = AsyncDocumentDatabase(db_path=database_path, max_workers=ASYNC_WORKERS)
+    calls = [(async_db.db.find_phrase, phrase_id) for phrase_id in phrase_ids] + [
+        (async_db.db.document_statistics, document_id),
+        (async_db.db.document_statistics, None),
+        (functools.partial(async_db.db.search_word_appearances, cols=WORD_HEADER_COLUMNS, tables={"word"},
+                           unique_words=True, document_id=document_id),)
+    ]
+
+    try:
+        asyncio.run(_run_async_queries(benchmark, async_db, calls))
+    finally:
+        async_db.close()
+
+
+def _benchmark_xml(benchmark, db, directory):
+    # Imported lazily, lxml is only needed for the XML benchmarks
+    from BL.xml.export_db import export_db
+    from BL.xml.import_db import import_db
+
+    xml_path = os.path.join(directory, "export.xml")
+    benchmark.measure("export_db", export_db, db, xml_path, repeat=1)
+    benchmark.counters["xml_bytes"] = os.path.getsize(xml_path)
+
+    with DocumentDatabase() as imported_db:
+        benchmark.measure("import_db", import_db, imported_db, xml_path, repeat=1)
+
+
+def run_benchmarks(size, seed=0, repeat=DEFAULT_REPEAT, corpus_dir=None, database_path=None):
+    benchmark = Benchmark(repeat)
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus_dir = corpus_dir or os.path.join(temp_dir, "corpus")
+        documents = generate_corpus(corpus_dir, size, seed)
+        benchmark.counters["documents"] = len(documents)
+        benchmark.measure("probe_directory", lambda: list(probe_directory(corpus_dir)))
+        benchmark.counters["corpus_bytes"] = sum(os.path.getsize(path) for _title, _author, path in documents)
+
+        with DocumentDatabase(db_path=database_path, always_create=True) as db:
+            document_ids = _benchmark_ingest(benchmark, db, documents)
+            group_id = _create_group(db)
+            phrase_ids = _create_phrases(db, documents)
+
+            _benchmark_word_search(benchmark, db, document_ids[0], group_id)
+
+            for phrase_number, phrase_id in enumerate(phrase_ids, start=1):
+                benchmark.measure(f"find_phrase[{phrase_number}]", db.find_phrase, phrase_id)
+
+            _benchmark_queries(benchmark, db)
+            _benchmark_phrase_mining(benchmark, db)
+            _benchmark_cooccurrences(benchmark, db)
+            _benchmark_ngrams(benchmark, db, documents, phrase_ids)
+            _benchmark_statistics(benchmark, db, document_ids[0])
+            _benchmark_analytics(benchmark, db)
+            _benchmark_appearances_storage(benchmark, db, temp_dir)
+            _benchmark_async(benchmark, db, temp_dir, document_ids[0], phrase_ids)
+            _benchmark_xml(benchmark, db, temp_dir)
+
+    return {
+        "size": size,
+        "seed": seed,
+        "repeat": repeat,
+        "environment": {
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform()
+        },
+        "counters": benchmark.counters,
+        "metrics": benchmark.metrics
+    }
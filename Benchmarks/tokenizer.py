@@ -0,0 +1,97 @@
+import itertools
+import re
+import time
+
+from Helpers.constants import VALID_WORD_REGEX
+from Helpers.document_parser import END_OF_SENTENCE_REGEX, parse_document
+from Helpers.utils import cached_read
+
+# Lines with the sentence and paragraph edge cases the tokenizers must agree on
+EDGE_CASES_TEXT = "Title: Edge Cases\n" \
+                  "\n" \
+                  "A sentence. Another one? And a third!\n" \
+                  "Ellipsis... and more.. words. \n" \
+                  ".Leading terminator, and trailing whitespace. \n" \
+                  "   \n" \
+                  "\n" \
+                  "--. dashes ?! then words\n" \
+                  "Don't split it's contractions', nor 'quotes'.\n" \
+                  "Unicode words: naïve café, Straße. Numbers 1984 and A4!\n" \
+                  "...\n" \
+                  "\n" \
+                  "\n" \
+                  "New paragraph without a terminator\n" \
+                  "continues here\n"
+
+
+def reference_parse_document(path):
+    # The line-splitting tokenizer parse_document replaced, kept to check the new one against
+    words_counter = itertools.count(1)
+    paragraph_counter = 0
+    sentence_counter = 0
+    words_in_sentence = 0
+    previous_line = None
+
+    raw = cached_read(path)
+    for line_counter, line in enumerate(raw.splitlines(), 1):
+        words_in_line_counter = itertools.count(1)
+        sentence_offset_in_line = 0
+
+        for sentence_number, sentence in enumerate(filter(None, re.split(END_OF_SENTENCE_REGEX, line))):
+            if sentence_number > 0:
+                words_in_sentence = 0
+                sentence_counter += 1
+
+            words_match = list(re.finditer(VALID_WORD_REGEX, sentence))
+
+            if words_match:
+                if previous_line is None or previous_line < line_counter - 1:
+                    paragraph_counter += 1
+
+                    if words_in_sentence > 0:
+                        words_in_sentence = 0
+                        sentence_counter += 1
+
+                previous_line = line_counter
+
+                for word_match in words_match:
+                    word = word_match[0]
+                    words_in_sentence += 1
+                    line_offset = sentence_offset_in_line + word_match.start()
+
+                    yield (word,
+                           next(words_counter),
+                           paragraph_counter,
+                           line_counter,
+                           next(words_in_line_counter),
+                           line_offset,
+                           sentence_counter,
+                           words_in_sentence)
+
+            sentence_offset_in_line += len(sentence) + 1
+
+
+def _time_tokenizer(tokenizer, paths):
+    start_time = time.perf_counter()
+    tokens = sum(1 for path in paths for _appr in tokenizer(path))
+    return tokens, time.perf_counter() - start_time
+
+
+def compare_tokenizers(paths):
+    mismatches = []
+    for path in paths:
+        for expected, actual in itertools.zip_longest(reference_parse_document(path), parse_document(path)):
+            if expected != actual:
+                mismatches.append((path, expected, actual))
+                break
+
+    tokens, reference_time = _time_tokenizer(reference_parse_document, paths)
+    _tokens, parse_time = _time_tokenizer(parse_document, paths)
+
+    return {
+        "mismatches": mismatches,
+        "tokens": tokens,
+        "reference_tokens_per_second": tokens / reference_time,
+        "tokens_per_second": tokens / parse_time,
+        "speedup": reference_time / parse_time
+    }
@@ -1,20 +1,37 @@
-import itertools
 import os
 import re
 
-from Helpers.constants import VALID_WORD_REGEX
-from Helpers.utils import cached_read
+from Helpers.constants import VALID_WORD_LETTERS
+from Helpers.utils import cached_read, read_prefix
 
 AUTHOR_REGEX = r"Author: (.+)$"
 TITLE_REGEX = r"Title: (.+)$"
 END_OF_SENTENCE_REGEX = r"[\.?!]"
+END_OF_SENTENCE_CHARACTERS = ".?!"
+START_OF_TEXT_MARKER = "*** START OF"
 
+HEADER_PROBE_MAX_SIZE = 64 * 1024
+DOCUMENT_EXTENSIONS = (".txt",)
 
-def parse_document_file(path):
+# The words of VALID_WORD_REGEX, without its nested repetition of the letters. The letters and the apostrophes
+# don't overlap, so the greedy repetitions only give back the apostrophes that no letter follows.
+WORD_REGEX = rf"{VALID_WORD_LETTERS}+(?:'+{VALID_WORD_LETTERS}+)*"
+ASCII_WORD_REGEX = r"[a-zA-Z0-9]+(?:'+[a-zA-Z0-9]+)*"
+
+# Scan a line once for both the words and the sentence terminators
+find_tokens = re.compile(rf"{END_OF_SENTENCE_REGEX}|{WORD_REGEX}").findall
+find_ascii_tokens = re.compile(rf"{END_OF_SENTENCE_REGEX}|{ASCII_WORD_REGEX}").findall
+
+
+def probe_document_header(path, max_size=HEADER_PROBE_MAX_SIZE):
     name_match = None
     author_match = None
 
-    for line in cached_read(path).splitlines():
+    # The metadata is at the top of the document, so only read until the start of the text
+    for line in read_prefix(path, max_size).splitlines():
+        if line.startswith(START_OF_TEXT_MARKER):
+            break
+
         if not name_match:
             name_match = re.search(TITLE_REGEX, line)
         if not author_match:
@@ -25,13 +42,32 @@ def parse_document_file(path):
 
     name = name_match.group(1) if name_match else None
     author = author_match.group(1) if author_match else None
-    date = os.path.getctime(path)
-    size = os.path.getsize(path)
-    return name, author, date, size
+    return name, author
+
+
+def default_document_name(path):
+    return os.path.splitext(os.path.split(path)[-1])[0].replace('_', ' ').title()
+
+
+def parse_document_file(path, stat=None):
+    name, author = probe_document_header(path)
+
+    stat = stat or os.stat(path)
+    return name, author, stat.st_ctime, stat.st_size
+
+
+def probe_directory(directory, extensions=DOCUMENT_EXTENSIONS):
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(extensions):
+                try:
+                    yield (entry.path,) + parse_document_file(entry.path, entry.stat())
+                except (OSError, ValueError):
+                    pass
 
 
 def parse_document(path):
-    words_counter = itertools.count(1)
+    word_index = 0
     paragraph_counter = 0
     sentence_counter = 0
     words_in_sentence = 0
@@ -39,38 +75,70 @@ def parse_document(path):
 
     raw = cached_read(path)
     for line_counter, line in enumerate(raw.splitlines(), 1):
-        words_in_line_counter = itertools.count(1)
-        sentence_offset_in_line = 0
-
-        for sentence_number, sentence in enumerate(filter(None, re.split(END_OF_SENTENCE_REGEX, line))):
-            if sentence_number > 0:
-                words_in_sentence = 0
-                sentence_counter += 1
-
-            words_match = list(re.finditer(VALID_WORD_REGEX, sentence))
-
-            if words_match:
-                if previous_line is None or previous_line < line_counter - 1:
-                    paragraph_counter += 1
-
-                    if words_in_sentence > 0:
+        tokens = find_ascii_tokens(line) if line.isascii() else find_tokens(line)
+        if not tokens:
+            continue
+
+        find_in_line = line.find
+        token_end = 0
+        word_in_line = 0
+        sentences_in_line = 0
+        sentence_start = 0
+        sentence_started = False
+
+        # Empty sentences (between adjacent terminators) aren't counted as sentences,
+        # and aren't counted in the offsets of the words after them
+        empty_sentences = 0
+
+        for token in tokens:
+            # Only non-word characters can be before the token, so the first occurrence is the token itself
+            token_start = find_in_line(token, token_end)
+            token_end = token_start + len(token)
+
+            if token in END_OF_SENTENCE_CHARACTERS:
+                if token_start == sentence_start:
+                    empty_sentences += 1
+                elif not sentence_started:
+                    if sentences_in_line > 0:
                         words_in_sentence = 0
                         sentence_counter += 1
-
-                previous_line = line_counter
-
-                for word_match in words_match:
-                    word = word_match[0]
-                    words_in_sentence += 1
-                    line_offset = sentence_offset_in_line + word_match.start()
-
-                    yield (word,
-                           next(words_counter),
-                           paragraph_counter,
-                           line_counter,
-                           next(words_in_line_counter),
-                           line_offset,
-                           sentence_counter,
-                           words_in_sentence)
-
-            sentence_offset_in_line += len(sentence) + 1
+                    sentences_in_line += 1
+
+                sentence_start = token_end
+                sentence_started = False
+                continue
+
+            if not sentence_started:
+                if sentences_in_line > 0:
+                    words_in_sentence = 0
+                    sentence_counter += 1
+                sentences_in_line += 1
+                sentence_started = True
+
+                if previous_line != line_counter:
+                    if previous_line is None or previous_line < line_counter - 1:
+                        paragraph_counter += 1
+
+                        if words_in_sentence > 0:
+                            words_in_sentence = 0
+                            sentence_counter += 1
+
+                    previous_line = line_counter
+
+            word_index += 1
+            word_in_line += 1
+            words_in_sentence += 1
+
+            yield (token,
+                   word_index,
+                   paragraph_counter,
+                   line_counter,
+                   word_in_line,
+                   token_start - empty_sentences,
+                   sentence_counter,
+                   words_in_sentence)
+
+        # A trailing sentence without words still ends the sentence before it
+        if not sentence_started and sentence_start < len(line) and sentences_in_line > 0:
+            words_in_sentence = 0
+            sentence_counter += 1
@@ -1,10 +1,13 @@
 
 import codecs
 import functools
+import hashlib
+import locale
 import math
 import time
 
 ENCODINGS = "utf-8", None
+HASH_CHUNK_SIZE = 1024 * 1024
 
 
 FILE_SIZES = ("Bytes", "KB", "MB", "GB", "TB", "PB", "EB", "ZB", "YB")
@@ -23,6 +26,33 @@ def cached_read(filename):
     raise UnicodeDecodeError
 
 
+def read_prefix(filename, max_bytes):
+
+    with open(filename, "rb") as file:
+        data = file.read(max_bytes)
+
+    error = None
+    for encoding in ENCODINGS:
+        # An incremental decoder ignores a character that was cut at the end of the prefix
+        decoder = codecs.getincrementaldecoder(encoding or locale.getpreferredencoding(False))()
+        try:
+            return decoder.decode(data)
+        except UnicodeDecodeError as decode_error:
+            error = decode_error
+
+    raise error
+
+
+def file_hash(filename):
+
+    content_hash = hashlib.sha256()
+    with open(filename, "rb") as file:
+        for chunk in iter(functools.partial(file.read, HASH_CHUNK_SIZE), b""):
+            content_hash.update(chunk)
+
+    return content_hash.hexdigest()
+
+
 def float_to_str(number, ndigits=2):
 
     if number is None:
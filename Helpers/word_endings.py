@@ -0,0 +1,57 @@
+RHYME_VOWELS = "aeiouy"
+
+# Spellings that sound like another (or no) letter at the end of a word
+RHYME_SPELLINGS = (("ph", "f"), ("ck", "k"), ("gh", ""), ("'", ""))
+
+LIKE_WILDCARDS = "%_\\"
+
+
+def reverse_word(word):
+    return word[::-1] if word is not None else None
+
+
+def rhyme_key(word):
+    """
+    A rough, spelling based key of the sound a word ends with: its last group of vowels and the letters after it,
+    after a silent final e is dropped. Words with the same key usually rhyme ("time", "rhyme", "chime").
+    """
+    if word is None:
+        return None
+
+    word = word.lower()
+    for spelling, sound in RHYME_SPELLINGS:
+        word = word.replace(spelling, sound)
+
+    if len(word) > 2 and word[-1] == "e" and word[-2] not in RHYME_VOWELS:
+        word = word[:-1]
+
+    end = len(word)
+    while end > 0 and word[end - 1] not in RHYME_VOWELS:
+        end -= 1
+
+    start = end
+    while start > 0 and word[start - 1] in RHYME_VOWELS:
+        start -= 1
+
+    return word[start:].replace("y", "i") if end else word
+
+
+def prefix_range(prefix):
+    # The strings that start with the prefix are the ones in [prefix, end)
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def like_pattern_suffix(pattern):
+    """
+    The literal letters after the last wildcard of a LIKE pattern, like "ing" of "%ing" or "b%ing",
+    or None if the pattern doesn't end with letters after a wildcard.
+    """
+    if not pattern or "%" not in pattern:
+        return None
+
+    suffix = pattern[pattern.rfind("%") + 1:]
+    if not suffix or any(wildcard in suffix for wildcard in LIKE_WILDCARDS):
+        return None
+
+    # LIKE ignores the case of the names, which are stored in lowercase
+    return suffix.lower()
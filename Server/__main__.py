@@ -0,0 +1,36 @@
+import argparse
+import sys
+
+from Server.server import DEFAULT_HOST, DEFAULT_PORT, DEFAULT_WORKERS, ConcordanceServer
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m Server", description="Serve the queries of a database as JSON.")
+    parser.add_argument("database", help="The database file to serve.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--verbose", action="store_true", help="Log every request.")
+    parser.add_argument("--read-only", action="store_true",
+                        help="Serve a published database that nothing writes to, mapped into memory.")
+    parser.add_argument("--analytics", action="store_true",
+                        help="Load the appearances into memory at startup, and count the document statistics "
+                             "from them (about 48 bytes for every appearance).")
+    arguments = parser.parse_args()
+
+    server = ConcordanceServer(arguments.database, arguments.host, arguments.port, arguments.workers,
+                               arguments.verbose, arguments.read_only, arguments.analytics)
+    print(f"Serving {arguments.database} on http://{arguments.host}:{server.server_port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,164 @@
+import argparse
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+DEFAULT_URL = "http://127.0.0.1:8080"
+DEFAULT_CLIENTS = 8
+DEFAULT_REQUESTS = 200
+SAMPLE_WORDS = 200
+
+# The requests of each client, by how often they are sent
+REQUEST_WEIGHTS = (
+    ("words", 3),
+    ("appearances", 3),
+    ("kwic", 3),
+    ("phrase", 1),
+    ("statistics", 1)
+)
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class Client:
+
+    def __init__(self, url):
+        url = urlsplit(url)
+        self.connection = http.client.HTTPConnection(url.hostname, url.port or 80)
+
+    def get(self, path, **parameters):
+        self.connection.request("GET", f"{path}?{urlencode(parameters)}" if parameters else path)
+        response = self.connection.getresponse()
+        body = response.read()
+        return response.status, json.loads(body) if body else None
+
+    def close(self):
+        self.connection.close()
+
+
+class Workload:
+
+    def __init__(self, url):
+        client = Client(url)
+        try:
+            self.words = [row[1] for row in client.get("/words", limit=SAMPLE_WORDS)[1]]
+            self.document_ids = [row[0] for row in client.get("/documents")[1]]
+            self.phrase_ids = [row[1] for row in client.get("/phrases")[1]]
+        finally:
+            client.close()
+
+        self.request_types = [request_type for request_type, weight in REQUEST_WEIGHTS for _i in range(weight)
+                              if request_type != "phrase" or self.phrase_ids]
+
+    def request(self, rand):
+        request_type = rand.choice(self.request_types)
+        if request_type == "words":
+            return request_type, "/words", {"document_id": rand.choice(self.document_ids), "limit": 100}
+        if request_type == "appearances":
+            return request_type, "/appearances", {"word": rand.choice(self.words), "limit": 100}
+        if request_type == "kwic":
+            return request_type, "/kwic", {"word": rand.choice(self.words), "limit": 20}
+        if request_type == "phrase":
+            return request_type, "/phrase", {"phrase_id": rand.choice(self.phrase_ids)}
+
+        return request_type, "/statistics", {"document_id": rand.choice(self.document_ids)}
+
+
+def _run_client(url, workload, requests_count, seed, latencies, errors):
+    rand = random.Random(seed)
+    client = Client(url)
+    try:
+        for _request in range(requests_count):
+            request_type, path, parameters = workload.request(rand)
+            start_time = time.perf_counter()
+            status, _body = client.get(path, **parameters)
+            latencies.append((request_type, time.perf_counter() - start_time))
+            if status != 200:
+                errors.append((request_type, status))
+    finally:
+        client.close()
+
+
+def _latency_summary(latencies):
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "p50_ms": percentile(latencies, 0.5) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": latencies[-1] * 1000
+    }
+
+
+def run_load_test(url=DEFAULT_URL, clients=DEFAULT_CLIENTS, requests_per_client=DEFAULT_REQUESTS, seed=0):
+    workload = Workload(url)
+    latencies = []
+    errors = []
+
+    # Every client keeps one connection open for all of its requests
+    threads = [threading.Thread(target=_run_client,
+                                args=(url, workload, requests_per_client, seed + client, latencies, errors))
+               for client in range(clients)]
+
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total_time = time.perf_counter() - start_time
+
+    request_types = {request_type for request_type, _latency in latencies}
+    return {
+        "clients": clients,
+        "errors": len(errors),
+        "seconds": total_time,
+        "qps": len(latencies) / total_time,
+        **_latency_summary([latency for _request_type, latency in latencies]),
+        "endpoints": {
+            request_type: _latency_summary([latency for latency_type, latency in latencies
+                                            if latency_type == request_type])
+            for request_type in sorted(request_types)
+        }
+    }
+
+
+def print_results(results):
+    print(f"{results['requests']:,} requests from {results['clients']} clients in {results['seconds']:.2f} s, "
+          f"{results['errors']} errors")
+    print(f"{results['qps']:,.1f} QPS, p50 {results['p50_ms']:,.2f} ms, p99 {results['p99_ms']:,.2f} ms, "
+          f"max {results['max_ms']:,.2f} ms")
+
+    for request_type, summary in results["endpoints"].items():
+        print(f"    {request_type}: {summary['requests']:,} requests, p50 {summary['p50_ms']:,.2f} ms, "
+              f"p99 {summary['p99_ms']:,.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m Server.load_test",
+                                     description="Report the latency and throughput of a running query server.")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--clients", type=int, default=DEFAULT_CLIENTS)
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="The requests of each client.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", action="store_true", help="Print the results as JSON.")
+    arguments = parser.parse_args()
+
+    results = run_load_test(arguments.url, arguments.clients, arguments.requests, arguments.seed)
+    if arguments.json:
+        print(json.dumps(results, indent=4))
+    else:
+        print_results(results)
+
+    return 1 if results["errors"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,265 @@
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import BL.sql_queries as queries
+from BL.Documents_db import DocumentDatabase
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8080
+DEFAULT_WORKERS = 8
+DEFAULT_LIMIT = 1000
+KEEP_ALIVE_TIMEOUT = 30
+IDLE_CONNECTION_TIMEOUT = 2
+STREAM_BATCH_SIZE = 1000
+
+# Filter values are put inside of the SQL by build_query, so they are limited to word letters and wildcards
+FILTER_PATTERN_REGEX = re.compile(r"[\w%']+")
+
+WORD_FILTERS = ("document_id", "group_id", "paragraph", "line", "sentence", "line_index", "sentence_index")
+WORD_ORDERS = {
+    "appearances": DocumentDatabase.APPEARANCES_ORDER,
+    "length": DocumentDatabase.LENGTH_ORDER,
+    "name": "name"
+}
+
+WORD_COLUMNS = ["word_id", "name", "length", "COUNT(word_index)"]
+APPEARANCE_COLUMNS = ["document_id", "word_index", "paragraph", "line", "line_index", "line_offset", "sentence",
+                      "sentence_index"]
+
+
+class BadRequest(ValueError):
+    pass
+
+
+class Query:
+
+    def __init__(self, query_string):
+        self._values = {name: values[-1] for name, values in parse_qs(query_string).items()}
+
+    def int(self, name, default=None):
+        value = self._values.get(name)
+        if value is None:
+            return default
+
+        try:
+            return int(value)
+        except ValueError:
+            raise BadRequest(f"{name} must be an integer")
+
+    def limit(self):
+        # SQLite treats a negative limit as no limit at all
+        limit = self.int("limit", DEFAULT_LIMIT)
+        if limit <= 0:
+            raise BadRequest("limit must be positive")
+
+        return limit
+
+    def pattern(self, name):
+        value = self._values.get(name)
+        if value is not None and not FILTER_PATTERN_REGEX.fullmatch(value):
+            raise BadRequest(f"{name} may only contain letters, digits, ', % and _")
+
+        return value
+
+    def regex(self, name):
+        # Regular expressions are only matched against the names in Python, never put inside of the SQL
+        value = self._values.get(name)
+        if value is not None:
+            try:
+                re.compile(value)
+            except re.error as error:
+                raise BadRequest(f"{name} is not a valid regular expression: {error}")
+
+        return value
+
+    def word_id(self, db):
+        word_id = self.int("word_id")
+        if word_id is None:
+            word = self._values.get("word")
+            if word is None:
+                raise BadRequest("word or word_id is required")
+
+            search_result = db.execute(queries.WORD_NAME_TO_ID, (word.lower(),)).fetchone()
+            word_id = search_result[0] if search_result else None
+
+        return word_id
+
+
+class ConcordanceRequestHandler(BaseHTTPRequestHandler):
+
+    # Keep the connections open between requests, a request that started is read until the timeout
+    protocol_version = "HTTP/1.1"
+    timeout = KEEP_ALIVE_TIMEOUT
+
+    @property
+    def db(self):
+        return self.server.db
+
+    def handle(self):
+        # The connection holds a worker while it waits, so an idle connection is closed after a short time,
+        # instead of keeping the new connections waiting for the workers
+        self.close_connection = False
+        while not self.close_connection and self._wait_for_request():
+            self.handle_one_request()
+
+    def _wait_for_request(self):
+        self.connection.settimeout(IDLE_CONNECTION_TIMEOUT)
+        try:
+            # A pipelined request may already be buffered, then nothing is read from the socket
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        route = self.server.routes.get(url.path)
+        if route is None:
+            self._send_error(HTTPStatus.NOT_FOUND, f"Unknown path {url.path}")
+            return
+
+        self._response_started = False
+        try:
+            route(self, Query(url.query))
+        except BadRequest as error:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(error))
+        except Exception:
+            # After the headers the response can't become an error, the connection is closed instead
+            if self._response_started:
+                raise
+
+            self.server.handle_error(self.request, self.client_address)
+            self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, "Internal server error")
+
+    def _send_headers(self, status, content_type="application/json", length=None):
+        self._response_started = True
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if length is None:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.send_header("Content-Length", str(length))
+        self.end_headers()
+
+    def _send_json(self, value, status=HTTPStatus.OK):
+        body = json.dumps(value).encode("utf-8")
+        self._send_headers(status, length=len(body))
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send_json({"error": message}, status)
+
+    def _write_chunk(self, data):
+        if data:
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+    def _send_json_rows(self, batches):
+        # Stream the rows as a JSON array, one chunk per batch, without building the whole response
+        self._send_headers(HTTPStatus.OK)
+        separator = b"["
+        for batch in batches:
+            self._write_chunk(separator + b",".join(json.dumps(row).encode("utf-8") for row in batch))
+            separator = b","
+
+        self._write_chunk(b"[]" if separator == b"[" else b"]")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def words(self, query):
+        filters = {name: query.int(name) for name in WORD_FILTERS}
+        filters["name"] = query.pattern("name")
+        filters["name_regex"] = query.regex("name_regex")
+        order = WORD_ORDERS.get(query.pattern("order") or "appearances")
+        if order is None:
+            raise BadRequest(f"order must be one of {', '.join(WORD_ORDERS)}")
+
+        sql = DocumentDatabase.word_appearances_query(
+            cols=WORD_COLUMNS, tables={"word"}, unique_words=True,
+            order_by=f"{order} {'asc' if query.int('ascending') else 'desc'}",
+            **self.db.translate_word_filters(filters))
+        self._send_json_rows(self.db.stream(f"{sql} LIMIT {query.limit()}",
+                                            batch_size=STREAM_BATCH_SIZE))
+
+    def appearances(self, query):
+        filters = {name: query.int(name) for name in WORD_FILTERS if name != "group_id"}
+        sql = DocumentDatabase.word_appearances_query(cols=APPEARANCE_COLUMNS, word_id=query.word_id(self.db) or 0,
+                                                      **filters)
+        self._send_json_rows(self.db.stream(f"{sql} LIMIT {query.limit()}",
+                                            batch_size=STREAM_BATCH_SIZE))
+
+    def kwic(self, query):
+        word_id = query.word_id(self.db)
+        contexts = self.db.keyword_in_context(word_id, query.int("width", DocumentDatabase.KWIC_WIDTH),
+                                              query.limit()) if word_id else []
+        self._send_json_rows([contexts])
+
+    def phrase(self, query):
+        phrase_id = query.int("phrase_id")
+        if phrase_id is None:
+            raise BadRequest("phrase_id is required")
+
+        self._send_json_rows([self.db.find_phrase(phrase_id)])
+
+    def phrases(self, _query):
+        self._send_json_rows([self.db.all_phrases()])
+
+    def documents(self, _query):
+        self._send_json_rows([self.db.all_documents()])
+
+    def statistics(self, query):
+        self._send_json({
+            "general": self.db.statistics.general_statistics(),
+            "documents": self.db.document_statistics(query.int("document_id"))
+        })
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ConcordanceServer(HTTPServer):
+    """
+    Serves the queries of a database file as JSON. Every connection is handled by one of a fixed pool of
+    workers, and the database gives each of them a read-only connection from its pool.
+    """
+
+    def __init__(self, database_path, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=DEFAULT_WORKERS, verbose=False,
+                 read_only=False, analytics=False):
+        self.db = DocumentDatabase(db_path=database_path, read_connections=workers, read_only=read_only)
+
+        # The arrays take memory for every appearance, so by default the statistics are counted by the SQL
+        if analytics:
+            self.db.load_analytics()
+        self.verbose = verbose
+        self.routes = {
+            "/words": ConcordanceRequestHandler.words,
+            "/appearances": ConcordanceRequestHandler.appearances,
+            "/kwic": ConcordanceRequestHandler.kwic,
+            "/phrase": ConcordanceRequestHandler.phrase,
+            "/phrases": ConcordanceRequestHandler.phrases,
+            "/documents": ConcordanceRequestHandler.documents,
+            "/statistics": ConcordanceRequestHandler.statistics
+        }
+        self._workers = ThreadPoolExecutor(workers, thread_name_prefix="ConcordanceServer")
+        super().__init__((host, port), ConcordanceRequestHandler)
+
+    def process_request(self, request, client_address):
+        self._workers.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        # The workers that are still answering use the database, so they are joined before it's closed
+        self._workers.shutdown(wait=True, cancel_futures=True)
+        self.db.close()
@@ -1,6 +1,5 @@
 from datetime import datetime
 from enum import Enum, auto
-from os.path import splitext, split
 from subprocess import Popen
 
 import PySimpleGUI as sg
@@ -8,7 +7,7 @@ import PySimpleGUI as sg
 import UI.UI_defaults as sgh
 from BL.exceptions import NonUniqueError, CheckError
 from UI.headers.custom_header import CustomHeader
-from Helpers.document_parser import parse_document_file
+from Helpers.document_parser import default_document_name, parse_document_file
 from Helpers.constants import DATE_FORMAT
 from Helpers.utils import file_size_to_str
 
@@ -27,6 +26,7 @@ class DocumentHeader(CustomHeader):
         self.db.add_document_insert_callback(self._update_documents_table)
 
         self.filters = {}
+        self.ranking_query = ""
         self.selected_document_id = None
 
         self.layout([
@@ -72,7 +72,7 @@ class DocumentHeader(CustomHeader):
 
         row = []
         self.str_filters = []
-        for text, filter_name in ("Document Name", "title"), ("Author", "author"), ("Word Appearance", "value"):
+        for text, filter_name in ("Document Name", "title"), ("Author", "author"), ("Word Appearance", "name"):
             element = _create_filter_input()
             row += [sg.Text(f"{text}: ", pad=((20, 5), 10)), element]
             self.str_filters.append((filter_name, element))
@@ -134,7 +134,7 @@ class DocumentHeader(CustomHeader):
     def _load_file_input(self):
 
         path = self.file_input.get()
-        document_name = splitext(split(path)[-1])[0].replace('_', ' ').title()
+        document_name = default_document_name(path)
 
         try:
             name, author, date, size = parse_document_file(path)
@@ -186,6 +186,10 @@ class DocumentHeader(CustomHeader):
     def _update_documents_filter(self):
         for filter_name, element in self.str_filters:
             letters_filter = element.get()
+            if filter_name == "name":
+                # The words of a pattern aren't the words that are searched, so its documents aren't ranked
+                self.ranking_query = "" if any(wildcard in letters_filter for wildcard in "%_") else letters_filter
+
             if letters_filter:
                 letters_filter = letters_filter.replace("\"", "\"\"")
                 letters_filter = letters_filter.replace("\\", "\\\\")
@@ -199,12 +203,18 @@ class DocumentHeader(CustomHeader):
 
     def _get_documents_filter_tables(self):
         filter_tables = []
-        if self.filters["value"]:
-            filter_tables += ["word", "word_appearance"]
+        if self.filters["name"]:
+            filter_tables += ["word", "word_occurrence"]
         return filter_tables
 
     def _update_documents_table(self):
         documents = self.db.search_documents(tables=self._get_documents_filter_tables(), **self.filters)
+
+        # The most relevant documents to the searched words come first
+        if self.ranking_query:
+            ranks = {document_id: rank for rank, (document_id, _score)
+                     in enumerate(self.db.rank_documents(self.ranking_query))}
+            documents.sort(key=lambda document: ranks.get(document[0], len(ranks)))
         self.documents_table.update(values=[document[:5] + (file_size_to_str(document[5]),) for document in documents])
 
     def _select_documents(self):
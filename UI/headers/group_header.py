@@ -7,6 +7,7 @@ from BL.exceptions import NonUniqueError, CheckError
 from UI.headers.custom_header import CustomHeader
 
 INVALID_GROUP_NAMES = ["none", "all"]
+SUGGESTIONS_COUNT = 5
 
 
 class GroupHeader(CustomHeader):
@@ -17,6 +18,7 @@ class GroupHeader(CustomHeader):
         INSERT_WORD = auto()
         GROUPS_LIST = auto()
         WORDS_LIST = auto()
+        SUGGESTIONS_LIST = auto()
 
     def __init__(self, db):
         super().__init__(db, "Word Groups Pairs Browser", [[]])
@@ -28,6 +30,9 @@ class GroupHeader(CustomHeader):
         self.groups_list = []
         self.selected_group_id = None
 
+        # A word that isn't in the documents is only inserted when it is inserted again after the suggestions
+        self.suggested_word = None
+
         self.layout([
             [sg.Sizer(h_pixels=5), self._create_group_column(), sg.VerticalSeparator(), self._create_word_column()]
         ])
@@ -107,6 +112,16 @@ class GroupHeader(CustomHeader):
             auto_size_text=False
         )
 
+        self.suggestions_list = sg.Listbox(
+            values=[],
+            font=sgh.MEDIUM_FONT_SIZE,
+            size=(30, SUGGESTIONS_COUNT),
+            select_mode=sg.SELECT_MODE_SINGLE,
+            enable_events=True,
+            visible=False,
+            key=GroupHeader.EventKeys.SUGGESTIONS_LIST
+        )
+
         self.words_list = sg.Listbox(
             values=[""],
             auto_size_text=True,
@@ -123,6 +138,7 @@ class GroupHeader(CustomHeader):
                 [self.add_words_title],
                 [self.word_input, insert_word_button],
                 [self.words_error_text],
+                [self.suggestions_list],
                 [self.words_list]
             ],
             element_justification=sgh.CENTER
@@ -147,6 +163,7 @@ class GroupHeader(CustomHeader):
         return {
             GroupHeader.EventKeys.GROUP_INPUT: self._clear_group_error,
             GroupHeader.EventKeys.WORD_INPUT: self._clear_word_error,
+            GroupHeader.EventKeys.SUGGESTIONS_LIST: self._select_suggestion,
             GroupHeader.EventKeys.INSERT_GROUP: self._insert_group,
             GroupHeader.EventKeys.GROUPS_LIST: self._select_group,
             GroupHeader.EventKeys.INSERT_WORD: self._insert_word
@@ -192,12 +209,38 @@ class GroupHeader(CustomHeader):
 
     def _clear_word_error(self):
         self.words_error_text.update("")
+        self.suggestions_list.update(values=[], visible=False)
+
+    def _suggest_words(self, word):
+        # Returns whether there are words in the documents that the unknown word may be a typo of
+        if word == self.suggested_word or self.db.search_word_appearances(cols=["word_id"], tables={"word"},
+                                                                            name=word.lower().strip()):
+            return False
+
+        suggestions = [name for _word_id, name, _distance in self.db.similar_words(word, limit=SUGGESTIONS_COUNT)]
+        if not suggestions:
+            return False
+
+        self.suggested_word = word
+        self.words_error_text.update("Did you mean? Insert again to add it anyway.")
+        self.suggestions_list.update(values=suggestions, visible=True)
+        return True
+
+    def _select_suggestion(self):
+        selected = self.suggestions_list.get()
+        if selected:
+            self.word_input.update(selected[0])
+            self._insert_word()
 
     def _insert_word(self):
         if self.selected_group_id is not None:
             try:
+                if self._suggest_words(self.word_input.get()):
+                    return
+
                 self.db.insert_word_to_group(self.selected_group_id, self.word_input.get())
                 self.word_input.update("")
+                self._clear_word_error()
             except NonUniqueError:
                 self.words_error_text.update("Word already exists.")
             except CheckError:
@@ -2,7 +2,6 @@ from enum import Enum, auto
 
 import PySimpleGUI as sg
 
-import BL.sql_queries as queries
 import UI.UI_defaults as sgh
 from UI.headers.custom_header import CustomHeader
 from Helpers.utils import float_to_str, file_size_to_str
@@ -12,12 +11,13 @@ ALL_DOCUMENTS_FILTER = "> 0"
 
 class StatisticsHeader(CustomHeader):
 
+    # The titles of the statistics in the statistics store
     GENERAL_STATISTICS = (
-        ("Total Documents", queries.DOCUMENTS_COUNT),
-        ("Total Groups", queries.GROUPS_COUNT),
-        ("Average Words in Group", queries.AVG_WORDS_PER_GROUP),
-        ("Total Phrases", queries.PHRASES_COUNT),
-        ("Average Words in Phrase", queries.AVG_WORDS_PER_PHRASE)
+        ("Total Documents", "documents_count"),
+        ("Total Groups", "groups_count"),
+        ("Average Words in Group", "avg_words_per_group"),
+        ("Total Phrases", "phrases_count"),
+        ("Average Words in Phrase", "avg_words_per_phrase")
     )
 
     class EventKeys(Enum):
@@ -40,18 +40,18 @@ class StatisticsHeader(CustomHeader):
         )
 
     @staticmethod
-    def _create_elements(elements_list, title, query, font=sgh.MEDIUM_FONT_SIZE):
+    def _create_elements(elements_list, title, statistic, font=sgh.MEDIUM_FONT_SIZE):
         result_text = sg.Text(text="0", size=(10, 1), pad=(0, 5), font=font, text_color=sgh.INPUT_COLOR)
         title_text = sg.Text(text=title + ": ", size=(25, 1), font=font)
-        elements_list.append((title, result_text, query))
+        elements_list.append((title, result_text, statistic))
         return title_text, result_text
 
     def _create_general_statistics_frame(self):
         self.general_statistics = []
 
         statistic_lines = []
-        for title, query in StatisticsHeader.GENERAL_STATISTICS:
-            title, result_text = self._create_elements(self.general_statistics, title, query, sgh.BIG_FONT_SIZE)
+        for title, statistic in StatisticsHeader.GENERAL_STATISTICS:
+            title, result_text = self._create_elements(self.general_statistics, title, statistic, sgh.BIG_FONT_SIZE)
             statistic_lines.append([title, result_text])
 
         frame = sg.Frame(
@@ -88,17 +88,13 @@ class StatisticsHeader(CustomHeader):
     def _select_document(self):
         old_id = self.selected_document_id
 
-    @staticmethod
-    def _single_result_to_str(cursor):
-        result = cursor.fetchone()[0]
-        return float_to_str(result, ndigits=3)
-
     def _refresh_general_statistics(self, _updated_group=None):
-        for _text, element, query in self.general_statistics:
-            result = self.db.execute(query)
-            if query == queries.TOTAL_SIZE:
-                element.update(value=file_size_to_str(result.fetchone()[0]))
+        # The statistics store is updated on every insert, so reading it doesn't scan the tables
+        statistics = self.db.statistics.general_statistics()
+        for _text, element, statistic in self.general_statistics:
+            if statistic == "total_size":
+                element.update(value=file_size_to_str(statistics[statistic]))
             else:
-                element.update(value=self._single_result_to_str(result))
+                element.update(value=float_to_str(statistics[statistic], ndigits=3))
 
 
@@ -1,3 +1,4 @@
+import re
 from enum import Enum, auto
 from threading import Timer
 
@@ -26,10 +27,16 @@ class WordHeader(CustomHeader):
     SEARCH_SYNTAX_HELP_TEXT = "You can use this filter to search for specific words.\n" \
                               "\n" \
                               "Use  _  as a wildcard for any character.\n" \
-                              "Use  *   as a wildcard for 0 or more characters."
+                              "Use  *   as a wildcard for 0 or more characters.\n" \
+                              "\n" \
+                              "Check  Regex  to search with a regular expression instead,\n" \
+                              "which has to match the whole word (like  un.*able)."
 
     FILTER_UPDATE_SCHEDULE_TIME = 0.5
 
+    # Only the top of the list is shown
+    WORDS_LIST_LIMIT = 1000
+
     class EventKeys(Enum):
         UPDATE_FILTER = auto()
         SCHEDULE_UPDATE_FILTER = auto()
@@ -105,6 +112,14 @@ class WordHeader(CustomHeader):
             key=WordHeader.EventKeys.UPDATE_FILTER
         )
 
+        self.regex_checkbox = sg.Checkbox(
+            text="Regex",
+            default=False,
+            pad=(10, 1),
+            enable_events=True,
+            key=WordHeader.EventKeys.SCHEDULE_UPDATE_FILTER
+        )
+
         info_button = sg.Help("?", size=(3, 1), pad=(10, 1), key=WordHeader.EventKeys.REGEX_HELP)
 
         def _create_int_input():
@@ -171,7 +186,8 @@ class WordHeader(CustomHeader):
 
         frame_layout = [
             [col1, col2, col3, col4],
-            [info_button, sg.Text("Word:", pad=(10, 5)), self.letters_filter_input, clear_filter_button],
+            [info_button, sg.Text("Word:", pad=(10, 5)), self.letters_filter_input, self.regex_checkbox,
+             clear_filter_button],
             [sg.Sizer(h_pixels=10000)]
         ]
 
@@ -376,7 +392,8 @@ class WordHeader(CustomHeader):
                 WordHeader._get_int_input(element, self.words_filters.get(filter_name))
 
     def _clear_filter(self):
-        self.letters_filter_input.update("")
+        self.letters_filter_input.update("", background_color=sgh.GOOD_INPUT_BG_COLOR)
+        self.regex_checkbox.update(False)
         self.document_filter_dropdown.update("All")
         self.group_filter_dropdown.update("None")
 
@@ -394,11 +411,10 @@ class WordHeader(CustomHeader):
         self.words_filters["group_id"] = self.group_name_to_id.get(selected_group)
 
         letters_filter = self.letters_filter_input.get()
-        letters_filter = letters_filter.replace("\"", "\"\"")  # Escape all '"'
-        letters_filter = letters_filter.replace("\\", "\\\\")  # Escape all '\'
-        letters_filter = letters_filter.replace("%", "\\%")  # Escape all '%'
-        letters_filter = letters_filter.replace("*", "%")
-        self.words_filters["value"] = letters_filter
+        if self.regex_checkbox.get():
+            self._update_regex_filter(letters_filter)
+        else:
+            self._update_letters_filter(letters_filter)
 
         selected_document = self.document_filter_dropdown.get()
         self.word_appearance_filters["document_id"] = self.document_names_to_id.get(selected_document)
@@ -408,6 +424,29 @@ class WordHeader(CustomHeader):
             self._update_words_list()
             self.old_word_appearance_filters = self.word_appearance_filters.copy()
 
+    def _update_regex_filter(self, pattern):
+        # An invalid pattern keeps the last filter
+        try:
+            re.compile(pattern)
+            legal_pattern = True
+        except re.error:
+            legal_pattern = False
+
+        self.letters_filter_input.update(
+            background_color=sgh.GOOD_INPUT_BG_COLOR if legal_pattern else sgh.BAD_INPUT_BG_COLOR)
+        if legal_pattern:
+            self.words_filters["name"] = None
+            self.words_filters["name_regex"] = pattern
+
+    def _update_letters_filter(self, letters_filter):
+        self.letters_filter_input.update(background_color=sgh.GOOD_INPUT_BG_COLOR)
+        letters_filter = letters_filter.replace("\"", "\"\"")  # Escape all '"'
+        letters_filter = letters_filter.replace("\\", "\\\\")  # Escape all '\'
+        letters_filter = letters_filter.replace("%", "\\%")  # Escape all '%'
+        letters_filter = letters_filter.replace("*", "%")
+        self.words_filters["name"] = letters_filter
+        self.words_filters["name_regex"] = None
+
     @staticmethod
     def _get_int_input(input_element, default_value):
         int_input = default_value
@@ -441,22 +480,17 @@ class WordHeader(CustomHeader):
             if self.curr_words_direction != old_dir:
                 self._update_words_list()
 
-    def _get_words_filter_tables(self):
-        filter_tables = []
-        if self.words_filters.get("group_id") is not None:
-            filter_tables.append("word_in_group")
-        return filter_tables
-
     def _update_words_list(self):
-        self.words_list = self.db.search_word_appearances(
-            cols=["word_id", "length", "name", "COUNT(word_index)"],
-            tables=set(["word"] + self._get_words_filter_tables()),
-            unique_words=True,
-            order_by=self.curr_words_order + " " + self.curr_words_direction,
-            **self.words_filters,
-            **self.word_appearance_filters)
-
-        self.words_counter_text.update(f"{len(self.words_list):,} Result{'s' if len(self.words_list) != 1 else ''}.")
+        self.words_list = self.db.top_words(
+            WordHeader.WORDS_LIST_LIMIT,
+            {**self.words_filters, **self.word_appearance_filters},
+            order=self.curr_words_order,
+            descending=self.curr_words_direction == WordHeader.WORDS_SORT_DIRECTION["Decreasing"])
+
+        if len(self.words_list) == WordHeader.WORDS_LIST_LIMIT:
+            self.words_counter_text.update(f"Top {WordHeader.WORDS_LIST_LIMIT:,} Results.")
+        else:
+            self.words_counter_text.update(f"{len(self.words_list):,} Result{'s' if len(self.words_list) != 1 else ''}.")
         self.select_word_list.update(values=[f'{word[2]} ({word[3]:,})' for word in self.words_list])
         self._select_word()
 
@@ -6,16 +6,22 @@ CREATE TABLE IF NOT EXISTS document (
     file_path TEXT NOT NULL UNIQUE,
     file_size INTEGER NOT NULL,
     creation_date DATETIME DEFAULT CURRENT_TIMESTAMP,
+    content_hash TEXT,
+    file_mtime REAL,
     UNIQUE(title, author),
     CHECK(title <> ''),
     CHECK(author <> ''),
     CHECK(file_path <> '')
 );
 
+CREATE INDEX IF NOT EXISTS document_content_hash ON document(content_hash);
+
 CREATE TABLE IF NOT EXISTS word (
     word_id INTEGER NOT NULL PRIMARY KEY,
     name TEXT NOT NULL UNIQUE,
     length INTEGER DEFAULT 0,
+    reversed_name TEXT,
+    rhyme_key TEXT,
     CHECK(name <> '')
 );
 
@@ -27,20 +33,76 @@ BEGIN
    UPDATE word SET length = LENGTH(name) WHERE word_id = new.word_id;
 END;
 
-CREATE TABLE IF NOT EXISTS word_appearance (
-    word_index INTEGER NOT NULL,
+CREATE INDEX IF NOT EXISTS word_length ON word(length);
+
+-- REVERSE and RHYME_KEY are defined by the application on every connection
+CREATE TRIGGER IF NOT EXISTS word_ending_insertion
+   AFTER INSERT
+   ON word
+   FOR EACH ROW
+BEGIN
+   UPDATE word SET reversed_name = REVERSE(name), rhyme_key = RHYME_KEY(name) WHERE word_id = new.word_id;
+END;
+
+CREATE INDEX IF NOT EXISTS word_reversed_name ON word(reversed_name);
+CREATE INDEX IF NOT EXISTS word_rhyme_key ON word(rhyme_key);
+
+-- The appearances of the words, with the columns that can't be computed from the spans of their document
+CREATE TABLE IF NOT EXISTS word_occurrence (
     document_id INTEGER NOT NULL,
+    word_index INTEGER NOT NULL,
     word_id INTEGER NOT NULL,
-    paragraph INTEGER NOT NULL,
     line INTEGER NOT NULL,
-    line_index INTEGER NOT NULL,
     line_offset INTEGER NOT NULL,
     sentence INTEGER NOT NULL,
-    sentence_index INTEGER NOT NULL,
-    PRIMARY KEY(word_index, document_id, word_id),
+    PRIMARY KEY(document_id, word_index),
     FOREIGN KEY(document_id) REFERENCES document,
     FOREIGN KEY(word_id) REFERENCES word
-);
+) WITHOUT ROWID;
+
+-- The lines and sentences make the index cover the filters of the appearances of words by their positions
+CREATE INDEX IF NOT EXISTS word_occurrence_position ON word_occurrence(word_id, document_id, word_index, line, sentence);
+
+-- Sentences never cross paragraphs, and the words of a sentence, paragraph or line have consecutive word indexes
+CREATE TABLE IF NOT EXISTS sentence_span (
+    document_id INTEGER NOT NULL,
+    sentence INTEGER NOT NULL,
+    paragraph INTEGER NOT NULL,
+    first_word_index INTEGER NOT NULL,
+    last_word_index INTEGER NOT NULL,
+    start_line INTEGER NOT NULL,
+    start_line_offset INTEGER NOT NULL,
+    PRIMARY KEY(document_id, sentence),
+    FOREIGN KEY(document_id) REFERENCES document
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS paragraph_span (
+    document_id INTEGER NOT NULL,
+    paragraph INTEGER NOT NULL,
+    first_word_index INTEGER NOT NULL,
+    last_word_index INTEGER NOT NULL,
+    start_line INTEGER NOT NULL,
+    start_line_offset INTEGER NOT NULL,
+    PRIMARY KEY(document_id, paragraph),
+    FOREIGN KEY(document_id) REFERENCES document
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS line_span (
+    document_id INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    first_word_index INTEGER NOT NULL,
+    PRIMARY KEY(document_id, line),
+    FOREIGN KEY(document_id) REFERENCES document
+) WITHOUT ROWID;
+
+-- All of the columns of the appearances. A database from before word_occurrence has a word_appearance table
+-- instead, until it is migrated.
+CREATE VIEW IF NOT EXISTS word_appearance AS
+SELECT word_index, document_id, word_id, paragraph, line, word_index - line_span.first_word_index + 1 AS line_index,
+    line_offset, sentence, word_index - sentence_span.first_word_index + 1 AS sentence_index
+FROM word_occurrence
+    JOIN sentence_span USING (document_id, sentence)
+    JOIN line_span USING (document_id, line);
 
 CREATE TABLE IF NOT EXISTS words_group (
     group_id INTEGER NOT NULL PRIMARY KEY,
@@ -69,4 +131,82 @@ CREATE TABLE IF NOT EXISTS word_in_phrase (
     PRIMARY KEY(phrase_id, word_id, phrase_index),
     FOREIGN KEY(phrase_id) REFERENCES phrase,
     FOREIGN KEY(word_id) REFERENCES word
-);
\ No newline at end of file
+);
+
+CREATE TABLE IF NOT EXISTS document_term (
+    word_id INTEGER NOT NULL,
+    document_id INTEGER NOT NULL,
+    frequency INTEGER NOT NULL,
+    PRIMARY KEY(word_id, document_id),
+    FOREIGN KEY(word_id) REFERENCES word,
+    FOREIGN KEY(document_id) REFERENCES document
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS document_term_document ON document_term(document_id, frequency);
+
+CREATE TABLE IF NOT EXISTS document_length (
+    document_id INTEGER NOT NULL PRIMARY KEY,
+    words_count INTEGER NOT NULL,
+    FOREIGN KEY(document_id) REFERENCES document
+);
+
+CREATE TABLE IF NOT EXISTS word_frequency (
+    word_id INTEGER NOT NULL PRIMARY KEY,
+    frequency INTEGER NOT NULL,
+    FOREIGN KEY(word_id) REFERENCES word
+);
+
+CREATE INDEX IF NOT EXISTS word_frequency_order ON word_frequency(frequency);
+
+-- The frequencies are added and subtracted for a whole document at once by the application. Databases from before
+-- that updated them with a trigger for every row of document_term, which made the ingest slower.
+DROP TRIGGER IF EXISTS document_term_insertion;
+DROP TRIGGER IF EXISTS document_term_deletion;
+
+CREATE TABLE IF NOT EXISTS ngram (
+    ngram_id INTEGER NOT NULL PRIMARY KEY,
+    first_word_id INTEGER NOT NULL,
+    second_word_id INTEGER NOT NULL,
+    third_word_id INTEGER NOT NULL DEFAULT 0,
+    frequency INTEGER NOT NULL DEFAULT 0,
+    UNIQUE(first_word_id, second_word_id, third_word_id),
+    FOREIGN KEY(first_word_id) REFERENCES word,
+    FOREIGN KEY(second_word_id) REFERENCES word
+);
+
+CREATE INDEX IF NOT EXISTS ngram_frequency ON ngram(frequency);
+
+CREATE TABLE IF NOT EXISTS ngram_appearance (
+    ngram_id INTEGER NOT NULL,
+    document_id INTEGER NOT NULL,
+    word_index INTEGER NOT NULL,
+    PRIMARY KEY(ngram_id, document_id, word_index),
+    FOREIGN KEY(ngram_id) REFERENCES ngram,
+    FOREIGN KEY(document_id) REFERENCES document
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS ngram_document (
+    document_id INTEGER NOT NULL PRIMARY KEY,
+    FOREIGN KEY(document_id) REFERENCES document
+);
+
+CREATE TABLE IF NOT EXISTS word_cooccurrence (
+    word_id INTEGER NOT NULL,
+    other_word_id INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY(word_id, other_word_id),
+    FOREIGN KEY(word_id) REFERENCES word,
+    FOREIGN KEY(other_word_id) REFERENCES word
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS cooccurrence_word (
+    word_id INTEGER NOT NULL PRIMARY KEY,
+    count INTEGER NOT NULL,
+    FOREIGN KEY(word_id) REFERENCES word
+);
+
+CREATE TABLE IF NOT EXISTS cooccurrence_document (
+    document_id INTEGER NOT NULL PRIMARY KEY,
+    window INTEGER NOT NULL,
+    FOREIGN KEY(document_id) REFERENCES document
+);
@@ -1,12 +1,18 @@
 -- This file contains the search_phrase query, to find the appearances of phrases inside of document sentences.
+-- The words of a sentence have consecutive word indexes, so the phrases are found by their word indexes,
+-- and converted to the indexes inside of their sentences at the end.
 
-SELECT document_id, sentence, sentence_index AS start_index, sentence_index + words_count - 1 AS end_index
-FROM phrase NATURAL JOIN word_in_phrase NATURAL JOIN
-    (SELECT phrase_id, document_id, sentence, sentence_index, word_id,
-        sentence_index - ROW_NUMBER() OVER (PARTITION BY sentence ORDER BY sentence_index) AS consecutive_phrase_words
-    FROM word_appearance NATURAL JOIN word_in_phrase
-    WHERE phrase_id == ?
-	GROUP BY document_id, sentence, sentence_index)
-GROUP BY document_id, sentence, consecutive_phrase_words, phrase_index - sentence_index
-HAVING COUNT(sentence_index) == words_count
-ORDER BY document_id, sentence, sentence_index
\ No newline at end of file
+SELECT document_id, sentence, start_word_index - first_word_index + 1 AS start_index,
+    start_word_index - first_word_index + words_count AS end_index
+FROM
+    (SELECT document_id, sentence, MIN(word_index) AS start_word_index, words_count
+    FROM phrase NATURAL JOIN word_in_phrase NATURAL JOIN
+        (SELECT phrase_id, document_id, sentence, word_index, word_id,
+            word_index - ROW_NUMBER() OVER (PARTITION BY document_id, sentence ORDER BY word_index) AS consecutive_phrase_words
+        FROM word_occurrence NATURAL JOIN word_in_phrase
+        WHERE phrase_id == ?
+        GROUP BY document_id, sentence, word_index)
+    GROUP BY document_id, sentence, consecutive_phrase_words, phrase_index - word_index
+    HAVING COUNT(word_index) == words_count)
+    NATURAL JOIN sentence_span
+ORDER BY document_id, sentence, start_index
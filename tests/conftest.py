@@ -0,0 +1,35 @@
+import os
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from Benchmarks.corpus import generate_corpus  # noqa: E402
+
+CORPUS_SIZE = 256 * 1024
+
+
+@pytest.fixture(autouse=True)
+def root_dir(monkeypatch):
+    # The SQL scripts are read relative to the root of the repository
+    monkeypatch.chdir(ROOT_DIR)
+
+
+@pytest.fixture(scope="session")
+def corpus_dir(tmp_path_factory):
+    directory = str(tmp_path_factory.mktemp("corpus"))
+    generate_corpus(directory, CORPUS_SIZE)
+    return directory
+
+
+@pytest.fixture
+def write_document(tmp_path):
+
+    def _write_document(name, text):
+        path = tmp_path / name
+        path.write_text(text, encoding="utf-8")
+        return str(path)
+
+    return _write_document
@@ -0,0 +1,40 @@
+import math
+
+import pytest
+
+from BL.Documents_db import DocumentDatabase
+
+
+@pytest.fixture
+def db(corpus_dir):
+    db = DocumentDatabase()
+    db.add_documents_directory(corpus_dir)
+    yield db
+    db.close()
+
+
+def _assert_same_statistics(statistics, expected_statistics):
+    assert list(statistics) == list(expected_statistics)
+    for name, expected in expected_statistics.items():
+        if expected is None or statistics[name] is None:
+            assert statistics[name] is expected
+        else:
+            assert math.isclose(statistics[name], expected)
+
+
+def test_analytics_match_the_sql(db):
+    document_ids = [document_id for document_id, in db.execute("SELECT document_id FROM document")]
+    keys = document_ids + [None, max(document_ids) + 1]
+    expected_statistics = {key: db.document_statistics(key) for key in keys}
+
+    db.load_analytics()
+    assert db.analytics is not None
+    for key in keys:
+        _assert_same_statistics(db.document_statistics(key), expected_statistics[key])
+
+
+def test_analytics_are_dropped_on_insert(db, write_document):
+    db.load_analytics()
+    db.add_document("new document", "author", write_document("new.txt", "some new words\n"), None)
+
+    assert db.analytics is None
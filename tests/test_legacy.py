@@ -0,0 +1,89 @@
+import shutil
+import sqlite3
+
+import pytest
+
+from BL.Documents_db import DocumentDatabase
+
+# Turns a database back to the schema from before word_occurrence and the frequency tables
+LEGACY_SCHEMA = """
+CREATE TABLE legacy_appearance (
+    word_index INTEGER NOT NULL,
+    document_id INTEGER NOT NULL,
+    word_id INTEGER NOT NULL,
+    paragraph INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    line_index INTEGER NOT NULL,
+    line_offset INTEGER NOT NULL,
+    sentence INTEGER NOT NULL,
+    sentence_index INTEGER NOT NULL,
+    PRIMARY KEY(word_index, document_id, word_id)
+);
+
+INSERT INTO legacy_appearance
+SELECT word_index, document_id, word_id, paragraph, line, line_index, line_offset, sentence, sentence_index
+FROM word_appearance;
+
+DROP VIEW word_appearance;
+DROP TABLE word_occurrence;
+DROP TABLE sentence_span;
+DROP TABLE paragraph_span;
+DROP TABLE line_span;
+DROP TABLE document_term;
+DROP TABLE document_length;
+DROP TABLE word_frequency;
+
+ALTER TABLE legacy_appearance RENAME TO word_appearance;
+"""
+
+
+@pytest.fixture
+def legacy_path(corpus_dir, tmp_path):
+    path = str(tmp_path / "legacy.db")
+    db = DocumentDatabase(db_path=path)
+    db.add_documents_directory(corpus_dir)
+    db.close()
+
+    connection = sqlite3.connect(path)
+    connection.executescript(LEGACY_SCHEMA)
+    connection.close()
+    return path
+
+
+@pytest.fixture
+def migrated_path(legacy_path, tmp_path):
+    path = str(tmp_path / "migrated.db")
+    shutil.copy(legacy_path, path)
+    DocumentDatabase(db_path=path).close()
+    return path
+
+
+def _frequency_results(db):
+    # Words with the same frequency have no order, so the top words are compared as sets
+    word = db.top_words(1)[0][2]
+    return {
+        "top_words": sorted(db.top_words(100000)),
+        "document_top_words": sorted(db.top_words(100000, {"document_id": 1})),
+        "name_top_words": sorted(db.top_words(100000, {"name": "b%"})),
+        "top_documents": db.top_documents_for_word(word, 10),
+        "rank": db.rank_documents(word)
+    }
+
+
+def test_migration_counts_the_frequencies(migrated_path):
+    db = DocumentDatabase(db_path=migrated_path)
+    for table in ("word_occurrence", "document_term", "document_length", "word_frequency"):
+        assert db.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] > 0
+
+    assert db.execute("SELECT SUM(frequency) FROM word_frequency").fetchone() == \
+        db.execute("SELECT COUNT(*) FROM word_occurrence").fetchone()
+    db.close()
+
+
+def test_read_only_legacy_database_counts_the_frequencies(legacy_path, migrated_path):
+    legacy_db = DocumentDatabase(db_path=legacy_path, read_only=True)
+    migrated_db = DocumentDatabase(db_path=migrated_path, read_only=True)
+
+    assert _frequency_results(legacy_db) == _frequency_results(migrated_db)
+    legacy_db.close()
+    migrated_db.close()
@@ -0,0 +1,88 @@
+import pytest
+
+from BL.Documents_db import DocumentDatabase
+
+OLD_TEXT = "The cat sat on the mat. The cat ran away.\n" * 3
+NEW_TEXT = "A dog sat on a log. The dog ran far away from the log.\n" * 4
+OTHER_TEXT = "The bird sang on the tree. The bird flew away.\n" * 2
+
+COOCCURRENCE_PAIRS = "SELECT word.name, other_word.name, count " \
+                     "FROM word_cooccurrence " \
+                     "JOIN word ON word.word_id == word_cooccurrence.word_id " \
+                     "JOIN word AS other_word ON other_word.word_id == other_word_id " \
+                     "WHERE count != 0"
+
+COOCCURRENCE_WORDS = "SELECT name, count " \
+                     "FROM cooccurrence_word NATURAL JOIN word " \
+                     "WHERE count != 0"
+
+
+def _indexed_database(path):
+    return DocumentDatabase(db_path=path, ngram_index=True, cooccurrence_window=3)
+
+
+def _add_documents(db, changed_path, other_path):
+    db.add_document("changed document", "author", changed_path, None)
+    db.add_document("other document", "author", other_path, None)
+
+
+@pytest.fixture
+def refreshed_path(tmp_path, write_document):
+    # The documents are indexed, and the changed document is refreshed by a database opened without the indexes
+    changed_path = write_document("changed.txt", OLD_TEXT)
+    other_path = write_document("other.txt", OTHER_TEXT)
+    path = str(tmp_path / "refreshed.db")
+
+    db = _indexed_database(path)
+    _add_documents(db, changed_path, other_path)
+    db.close()
+
+    write_document("changed.txt", NEW_TEXT)
+    db = DocumentDatabase(db_path=path)
+    assert db.refresh_documents() == [1]
+    db.close()
+    return path
+
+
+@pytest.fixture
+def expected_path(tmp_path, write_document):
+    # The same documents, indexed from their new content
+    changed_path = write_document("expected_changed.txt", NEW_TEXT)
+    other_path = write_document("expected_other.txt", OTHER_TEXT)
+    path = str(tmp_path / "expected.db")
+
+    db = _indexed_database(path)
+    _add_documents(db, changed_path, other_path)
+    db.close()
+    return path
+
+
+def test_refresh_without_the_ngram_index(refreshed_path, expected_path):
+    refreshed_db = _indexed_database(refreshed_path)
+    expected_db = _indexed_database(expected_path)
+
+    assert sorted(refreshed_db.top_ngrams(1000)) == sorted(expected_db.top_ngrams(1000))
+    assert refreshed_db.find_phrase(refreshed_db.add_phrase("the cat")) == []
+    assert refreshed_db.find_phrase(refreshed_db.add_phrase("the dog")) == \
+        expected_db.find_phrase(expected_db.add_phrase("the dog"))
+    refreshed_db.close()
+    expected_db.close()
+
+
+def _cooccurrences(db):
+    # By the names of the words, which are numbered differently in the two databases
+    return {
+        "pairs": sorted(db.execute(COOCCURRENCE_PAIRS).fetchall()),
+        "words": sorted(db.execute(COOCCURRENCE_WORDS).fetchall()),
+        "documents": db.execute("SELECT document_id, window FROM cooccurrence_document ORDER BY document_id").fetchall()
+    }
+
+
+def test_refresh_without_the_cooccurrence_index(refreshed_path, expected_path):
+    refreshed_db = _indexed_database(refreshed_path)
+    expected_db = _indexed_database(expected_path)
+
+    assert _cooccurrences(refreshed_db) == _cooccurrences(expected_db)
+    assert refreshed_db.associated_words("dog") == expected_db.associated_words("dog")
+    refreshed_db.close()
+    expected_db.close()
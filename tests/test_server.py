@@ -0,0 +1,74 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from BL.Documents_db import DocumentDatabase
+from Server.server import ConcordanceServer
+
+
+@pytest.fixture(scope="module")
+def db_path(corpus_dir, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("server") / "server.db")
+    db = DocumentDatabase(db_path=path)
+    db.add_documents_directory(corpus_dir)
+    db.close()
+    return path
+
+
+@pytest.fixture
+def server(db_path):
+    server = ConcordanceServer(db_path, port=0, workers=2)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+
+def _get(server, path):
+    with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}{path}") as response:
+        return json.load(response)
+
+
+@pytest.mark.parametrize("path", ["/words", "/appearances?word_id=1", "/kwic?word_id=1"])
+@pytest.mark.parametrize("limit", [0, -1])
+def test_limit_has_to_be_positive(server, path, limit):
+    separator = "&" if "?" in path else "?"
+    with pytest.raises(urllib.error.HTTPError) as error:
+        _get(server, f"{path}{separator}limit={limit}")
+
+    assert error.value.code == 400
+
+
+def test_limit(server):
+    assert len(_get(server, "/words?limit=5")) == 5
+
+
+def test_workers_end_before_the_database_closes(db_path):
+    server = ConcordanceServer(db_path, port=0, workers=1)
+    answered = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def _slow_request():
+        started.set()
+        release.wait()
+        answered.append(server.db.execute("SELECT COUNT(*) FROM word").fetchone()[0])
+
+    server._workers.submit(_slow_request)
+    started.wait()
+    closing = threading.Thread(target=server.server_close)
+    closing.start()
+    try:
+        # The server waits for the worker, which still reads from the database
+        closing.join(timeout=0.5)
+        assert closing.is_alive()
+    finally:
+        release.set()
+        closing.join()
+
+    assert answered and answered[0] > 0
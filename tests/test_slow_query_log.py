@@ -0,0 +1,56 @@
+import pytest
+
+from BL.Documents_db import DocumentDatabase
+from BL.slow_query_log import SlowQueryLog, read_log
+
+WORDS_QUERY = "SELECT word_id, name FROM word ORDER BY word_id"
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    return str(tmp_path / "slow_queries.log")
+
+
+@pytest.fixture
+def db(corpus_dir, log_path):
+    # Every statement is slow enough to be logged
+    slow_query_log = SlowQueryLog(log_path, threshold_ms=0)
+    db = DocumentDatabase(slow_query_log=slow_query_log)
+    db.add_documents_directory(corpus_dir)
+    yield db
+    db.close()
+    slow_query_log.close()
+
+
+def _logged(log_path, sql):
+    return [entry for entry in read_log(log_path) if entry["sql"] == sql]
+
+
+def test_rows_are_fetched_when_asked_for(db, log_path):
+    words_count = db.execute("SELECT COUNT(*) FROM word").fetchone()[0]
+
+    cursor = db.execute(WORDS_QUERY)
+    assert _logged(log_path, WORDS_QUERY) == []
+    assert len(cursor.fetchmany(10)) == 10
+    assert _logged(log_path, WORDS_QUERY) == []
+
+    assert sum(1 for _row in cursor) == words_count - 10
+    entry, = _logged(log_path, WORDS_QUERY)
+    assert entry["rows"] == words_count
+    assert entry["plan"]
+
+
+def test_discarded_cursor_is_logged_once(db, log_path):
+    sql = "SELECT name FROM word WHERE word_id == ?"
+    assert db.execute(sql, (1,)).fetchone()
+
+    entry, = _logged(log_path, sql)
+    assert entry["rows"] == 1
+
+
+def test_named_parameters_are_logged_with_their_values(db, log_path):
+    sql = "SELECT name FROM word WHERE word_id == :word_id"
+    db.execute(sql, {"word_id": 1}).fetchall()
+
+    entry, = _logged(log_path, sql)
+    assert entry["parameters"] == {"word_id": "1"}
@@ -0,0 +1,42 @@
+import os
+import string
+
+from BL.Documents_db import DocumentDatabase
+
+MEMORY_LIMIT = 256 * 1024
+
+
+def test_in_memory_database_spills_while_adding_documents(corpus_dir):
+    db = DocumentDatabase(memory_limit=MEMORY_LIMIT)
+
+    # Like the UI, the documents are added one by one and nothing else commits them
+    for letter, name in zip(string.ascii_lowercase, sorted(os.listdir(corpus_dir))):
+        db.add_document(f"document {letter}", "author", os.path.join(corpus_dir, name), None)
+        if db.spilled:
+            break
+
+    assert db.spilled
+    assert db.memory_size() > MEMORY_LIMIT
+    assert db.execute("SELECT COUNT(*) FROM document").fetchone()[0] >= 1
+    db.close()
+
+
+def test_added_directory_is_kept_after_spilling(corpus_dir):
+    db = DocumentDatabase(memory_limit=MEMORY_LIMIT)
+    added_ids = db.add_documents_directory(corpus_dir)
+
+    assert db.spilled
+    assert db.execute("SELECT COUNT(*) FROM document").fetchone()[0] == len(added_ids) == len(os.listdir(corpus_dir))
+    db.close()
+
+
+def test_spill_waits_for_the_transaction():
+    db = DocumentDatabase()
+    with db.transaction():
+        db.insert_words_group("group")
+        db.memory_limit = 1
+        db.insert_words_group("other")
+        assert not db.spilled
+
+    assert db.spilled
+    db.close()
@@ -0,0 +1,79 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from BL.async_db import AsyncDocumentDatabase
+from BL.connection_pool import ReadConnectionPool
+from BL.Documents_db import DocumentDatabase
+
+WORDS_QUERY = "SELECT word_id, name FROM word ORDER BY word_id"
+READ_CONNECTIONS = 2
+
+
+@pytest.fixture
+def db_path(corpus_dir, tmp_path):
+    path = str(tmp_path / "stream.db")
+    db = DocumentDatabase(db_path=path)
+    db.add_documents_directory(corpus_dir)
+    db.close()
+    return path
+
+
+def test_open_streams_leave_the_pool_to_other_readers(db_path):
+    db = DocumentDatabase(db_path=db_path, read_connections=READ_CONNECTIONS)
+    db._read_pool.acquire_timeout = 1
+    words_count = db.execute("SELECT COUNT(*) FROM word").fetchone()[0]
+
+    # More streams than pooled connections, each stopped after its first batch
+    streams = [db.stream(WORDS_QUERY, batch_size=10) for _ in range(READ_CONNECTIONS * 2)]
+    for stream in streams:
+        assert len(next(stream)) == 10
+
+    assert db.execute("SELECT COUNT(*) FROM word").fetchone()[0] == words_count
+    assert sum(len(rows) for rows in streams[0]) == words_count - 10
+
+    for stream in streams:
+        stream.close()
+    db.close()
+
+
+def test_abandoned_stream_ends_its_read_transaction(db_path):
+    db = DocumentDatabase(db_path=db_path)
+    stream = db.stream(WORDS_QUERY, batch_size=10)
+    next(stream)
+    stream.close()
+
+    # The connection of the stream is reused, and sees the writes that were made after the stream started
+    db.insert_words_group("new group")
+    db.commit()
+    assert [name for _id, name in next(db.stream("SELECT group_id, name FROM words_group"))] == ["New Group"]
+    db.close()
+
+
+def test_async_streams_that_are_not_closed(db_path):
+
+    async def _read():
+        async with AsyncDocumentDatabase(db_path=db_path, max_workers=READ_CONNECTIONS) as async_db:
+            # More open streams than workers and pooled connections
+            streams = [async_db.stream(WORDS_QUERY, batch_size=10) for _ in range(READ_CONNECTIONS * 2)]
+            first_rows = [await stream.__anext__() for stream in streams]
+            words = await async_db.all_words()
+
+            for stream in streams:
+                await stream.aclose()
+            return first_rows, words
+
+    first_rows, words = asyncio.run(_read())
+    assert first_rows == [first_rows[0]] * (READ_CONNECTIONS * 2)
+    assert words
+
+
+def test_pool_acquisition_times_out(db_path):
+    pool = ReadConnectionPool(db_path, size=1, acquire_timeout=0.1)
+    with pool.connection():
+        with pytest.raises(sqlite3.OperationalError):
+            with pool.connection():
+                pass
+
+    pool.close()
@@ -0,0 +1,12 @@
+import os
+
+from Benchmarks.tokenizer import EDGE_CASES_TEXT, compare_tokenizers
+
+
+def test_parse_document_matches_the_reference_tokenizer(corpus_dir, write_document):
+    paths = [write_document("edge_cases.txt", EDGE_CASES_TEXT)] + \
+            [os.path.join(corpus_dir, name) for name in sorted(os.listdir(corpus_dir))]
+
+    comparison = compare_tokenizers(paths)
+    assert comparison["tokens"] > 0
+    assert comparison["mismatches"] == []
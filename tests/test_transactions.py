@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+
+from BL.Documents_db import DocumentDatabase
+
+
+def _group_names(db):
+    return [name for name, in db.execute("SELECT name FROM words_group ORDER BY group_id")]
+
+
+def test_nested_rollback_keeps_the_enclosing_writes():
+    db = DocumentDatabase()
+    with db.transaction():
+        db.insert_words_group("outer")
+        with pytest.raises(KeyError):
+            with db.transaction():
+                db.insert_words_group("inner")
+                raise KeyError
+
+        # The enclosing transaction is still open
+        assert db.owns_transaction()
+
+    assert _group_names(db) == ["Outer"]
+    db.close()
+
+
+def test_outer_rollback_undoes_the_nested_writes():
+    db = DocumentDatabase()
+    with pytest.raises(KeyError):
+        with db.transaction():
+            db.insert_words_group("outer")
+            with db.transaction():
+                db.insert_words_group("inner")
+            raise KeyError
+
+    assert _group_names(db) == []
+    db.close()
+
+
+def test_transaction_releases_the_writer():
+    db = DocumentDatabase()
+    with db.transaction():
+        db.insert_words_group("first")
+        with db.transaction():
+            db.insert_words_group("second")
+
+    def _write():
+        db.insert_words_group("third")
+        db.commit()
+
+    writer = threading.Thread(target=_write)
+    writer.start()
+    writer.join(timeout=5)
+
+    assert not writer.is_alive()
+    assert _group_names(db) == ["First", "Second", "Third"]
+    db.close()